@@ -0,0 +1,364 @@
+# agent_server.py
+#
+# Hosts many agent conversations in one long-running process, behind a small
+# local HTTP API or JSON lines over stdin/stdout.
+# Usage: python agent_server.py [--http HOST:PORT | --stdio] [--workers N] [--queue N] [--workspace DIR]
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google.genai import types
+
+import main
+
+
+class ServerBusy(Exception):
+    """Raised when the work queue (or the session table) is full; the client should retry later."""
+
+
+class SessionBusy(Exception):
+    """Raised when a session already has a message being answered."""
+
+
+class UnknownSession(LookupError):
+    pass
+
+
+class Session:
+    def __init__(self, session_id, working_directory):
+        self.session_id = session_id
+        self.working_directory = working_directory
+        self.messages = [] # User requests and final answers, as types.Content
+        self.busy = False
+        self.created = time.time()
+        self.last_used = self.created
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "working_directory": self.working_directory,
+            "busy": self.busy,
+            "messages": [{"role": message.role, "text": message.parts[0].text} for message in self.messages],
+        }
+
+
+class AgentServer:
+    """
+    Runs agent queries for many sessions on a bounded worker pool.
+
+    Each session has its own message history and working directory, and
+    answers one message at a time. At most max_workers queries run at once
+    and at most max_queue more wait for a worker; beyond that send_message
+    raises ServerBusy straight away instead of queueing without bound.
+
+    Working directories are resolved inside workspace, so a client cannot
+    point the tools outside it. When max_sessions sessions exist, creating
+    another evicts the least recently used one that isn't answering a
+    message; only when every session is busy is the new one refused.
+
+    Args:
+        workspace (str): Directory that session working directories live in.
+        default_directory (str): Working directory of sessions that don't name one, relative to workspace.
+        max_workers (int): Queries run concurrently.
+        max_queue (int): Queries allowed to wait for a worker.
+        max_sessions (int): Sessions kept at once before idle ones are evicted.
+    """
+
+    def __init__(self, workspace=".", default_directory=main.WORKING_DIRECTORY, max_workers=4, max_queue=16, max_sessions=1000):
+        self.workspace = os.path.abspath(workspace)
+        self.default_directory = default_directory
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_sessions = max_sessions
+        self.rejected = 0
+        self.evicted = 0
+        self._sessions = {}
+        self._pending = 0 # Queries running or waiting for a worker
+        self._running = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+
+    def _resolve_directory(self, directory):
+        path = os.path.abspath(os.path.join(self.workspace, directory or self.default_directory))
+        if os.path.commonpath([self.workspace, path]) != self.workspace:
+            raise ValueError(f'Working directory "{directory}" is outside the server workspace')
+        if not os.path.isdir(path):
+            raise ValueError(f'Working directory "{directory}" does not exist')
+        return path
+
+    def create_session(self, working_directory=None):
+        path = self._resolve_directory(working_directory)
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                idle = [session for session in self._sessions.values() if not session.busy]
+                if not idle:
+                    self.rejected += 1
+                    raise ServerBusy("Too many sessions")
+                del self._sessions[min(idle, key=lambda session: session.last_used).session_id]
+                self.evicted += 1
+            session = Session(uuid.uuid4().hex, path)
+            self._sessions[session.session_id] = session
+        return session
+
+    def get_session(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise UnknownSession(session_id)
+        return session
+
+    def delete_session(self, session_id):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                raise UnknownSession(session_id)
+
+    def send_message(self, session_id, prompt):
+        """
+        Queues prompt for the session and returns a Future of the answer text.
+        Raises ServerBusy, SessionBusy or UnknownSession without queueing anything.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise UnknownSession(session_id)
+            if session.busy:
+                raise SessionBusy(session_id)
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ServerBusy("Work queue is full")
+            session.busy = True
+            session.last_used = time.time()
+            self._pending += 1
+        return self._pool.submit(self._answer, session, prompt)
+
+    def _answer(self, session, prompt):
+        with self._lock:
+            self._running += 1
+        try:
+            text = main.run_ai_query(prompt, False, session.messages, working_directory=session.working_directory)
+            with self._lock:
+                session.messages = session.messages + [
+                    types.Content(role="user", parts=[types.Part(text=prompt)]),
+                    types.Content(role="model", parts=[types.Part(text=text)]),
+                ]
+            return text
+        finally:
+            with self._lock:
+                session.busy = False
+                session.last_used = time.time()
+                self._running -= 1
+                self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "rejected": self.rejected,
+                "evicted": self.evicted,
+            }
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def _error_status(error):
+    if isinstance(error, UnknownSession):
+        return HTTPStatus.NOT_FOUND
+    if isinstance(error, SessionBusy):
+        return HTTPStatus.CONFLICT
+    if isinstance(error, ServerBusy):
+        return HTTPStatus.SERVICE_UNAVAILABLE
+    if isinstance(error, ValueError):
+        return HTTPStatus.BAD_REQUEST
+    return HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+def _error_message(error):
+    if isinstance(error, UnknownSession):
+        return f"Unknown session: {error.args[0]}"
+    if isinstance(error, SessionBusy):
+        return "Session is already answering a message"
+    return str(error)
+
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API over an AgentServer (self.server.agent):
+      POST   /sessions                   {"working_directory": ...} -> {"session_id", ...}
+      GET    /sessions/<id>              -> the session and its messages
+      DELETE /sessions/<id>
+      POST   /sessions/<id>/messages     {"prompt": ...} -> {"text": ...}
+      GET    /stats
+    Errors are {"error": message} with 400, 404, 409 (session busy), 503
+    (queue full) or 500 (anything else, also logged to stderr).
+    """
+
+    def _send(self, status, body=None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            self.send_header("Retry-After", "1")
+        if payload:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+
+    def _route(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        agent = self.server.agent
+        if self.command == "GET" and parts == ["stats"]:
+            return HTTPStatus.OK, agent.stats()
+        if parts[:1] != ["sessions"]:
+            return HTTPStatus.NOT_FOUND, {"error": f"No route for {self.command} {self.path}"}
+        if self.command == "POST" and len(parts) == 1:
+            session = agent.create_session(self._read_json().get("working_directory"))
+            return HTTPStatus.CREATED, session.to_dict()
+        if self.command == "GET" and len(parts) == 2:
+            return HTTPStatus.OK, agent.get_session(parts[1]).to_dict()
+        if self.command == "DELETE" and len(parts) == 2:
+            agent.delete_session(parts[1])
+            return HTTPStatus.NO_CONTENT, None
+        if self.command == "POST" and len(parts) == 3 and parts[2] == "messages":
+            prompt = self._read_json().get("prompt")
+            if not isinstance(prompt, str) or not prompt.strip():
+                raise ValueError('"prompt" must be a non-empty string')
+            return HTTPStatus.OK, {"text": agent.send_message(parts[1], prompt).result()}
+        return HTTPStatus.NOT_FOUND, {"error": f"No route for {self.command} {self.path}"}
+
+    def _handle(self):
+        try:
+            status, body = self._route()
+        except (UnknownSession, SessionBusy, ServerBusy, ValueError) as e:
+            status, body = _error_status(e), {"error": _error_message(e)}
+        except Exception as e:
+            # E.g. the agent run itself failed; the client still gets an answer
+            print(f"Error handling {self.command} {self.path}:", file=sys.stderr)
+            traceback.print_exc()
+            status, body = _error_status(e), {"error": _error_message(e)}
+        self._send(status, body)
+
+    do_GET = do_POST = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_http(agent, host="127.0.0.1", port=8765):
+    """Returns a ThreadingHTTPServer for agent; call serve_forever() on it."""
+    server = ThreadingHTTPServer((host, port), AgentRequestHandler)
+    server.daemon_threads = True
+    server.agent = agent
+    return server
+
+
+def serve_stdio(agent, stdin, stdout):
+    """
+    JSON lines protocol: each request {"id", "method", "params"} gets one
+    response line {"id", "result"} or {"id", "error": {"code", "message"}},
+    where code is the HTTP status the same error would get. Methods are
+    create_session, get_session, delete_session, send_message and stats.
+    send_message answers arrive when ready, so responses may come out of
+    order; match them by id.
+    """
+    write_lock = threading.Lock()
+
+    def respond(request_id, result=None, error=None):
+        message = {"id": request_id}
+        if error is not None:
+            message["error"] = {"code": int(_error_status(error)), "message": _error_message(error)}
+        else:
+            message["result"] = result
+        with write_lock:
+            stdout.write(json.dumps(message) + "\n")
+            stdout.flush()
+
+    def respond_when_done(request_id, future):
+        def done(future):
+            if future.exception() is not None:
+                respond(request_id, error=future.exception())
+            else:
+                respond(request_id, {"text": future.result()})
+        future.add_done_callback(done)
+
+    for line in stdin:
+        if not line.strip():
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            method = request.get("method")
+            params = request.get("params") or {}
+            if method == "create_session":
+                respond(request_id, agent.create_session(params.get("working_directory")).to_dict())
+            elif method == "get_session":
+                respond(request_id, agent.get_session(params["session_id"]).to_dict())
+            elif method == "delete_session":
+                agent.delete_session(params["session_id"])
+                respond(request_id, {})
+            elif method == "send_message":
+                respond_when_done(request_id, agent.send_message(params["session_id"], params["prompt"]))
+            elif method == "stats":
+                respond(request_id, agent.stats())
+            else:
+                raise ValueError(f"Unknown method: {method}")
+        except (UnknownSession, SessionBusy, ServerBusy, ValueError) as e:
+            respond(request_id, error=e)
+        except (KeyError, TypeError, AttributeError) as e:
+            respond(request_id, error=ValueError(f"Invalid request: {e}"))
+        except Exception as e:
+            traceback.print_exc()
+            respond(request_id, error=e)
+
+
+def run_server():
+    parser = argparse.ArgumentParser(description="Serve many agent conversations over local HTTP or stdio.")
+    parser.add_argument("--http", default="127.0.0.1:8765", help="HOST:PORT to listen on (default %(default)s).")
+    parser.add_argument("--stdio", action="store_true", help="Speak JSON lines on stdin/stdout instead of HTTP.")
+    parser.add_argument("--workers", type=int, default=4, help="Queries answered at once.")
+    parser.add_argument("--queue", type=int, default=16, help="Queries allowed to wait before new ones are rejected.")
+    parser.add_argument("--workspace", default=".", help="Directory session working directories must be inside.")
+    args = parser.parse_args()
+
+    agent = AgentServer(args.workspace, max_workers=args.workers, max_queue=args.queue)
+    if args.stdio:
+        protocol_out = sys.stdout
+        sys.stdout = sys.stderr # Tool progress prints must not corrupt the protocol stream
+        serve_stdio(agent, sys.stdin, protocol_out)
+        agent.close()
+        return
+
+    host, _, port = args.http.rpartition(":")
+    server = serve_http(agent, host or "127.0.0.1", int(port))
+    print(f"Serving agent sessions on http://{server.server_address[0]}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        agent.close()
+
+
+if __name__ == "__main__":
+    run_server()
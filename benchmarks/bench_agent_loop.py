@@ -0,0 +1,151 @@
+# benchmarks/bench_agent_loop.py
+#
+# Measures the agent loop's own overhead, with the model replaced by a
+# ScriptedBackend so no network time is included: token counting, tool
+# dispatch, context compaction, and whole run_ai_query conversations at
+# several history lengths. Results can be saved as JSON and compared against
+# an earlier run; a case more than --threshold slower than the baseline is
+# reported as a regression and makes the script exit with status 1.
+# Usage: python benchmarks/bench_agent_loop.py [--repeats N] [--save results.json] [--compare baseline.json]
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from google.genai import types
+
+import main
+from conversation_history import ConversationHistory
+from scripted_backend import ScriptedBackend
+from token_ledger import TokenLedger
+from tool_dispatch import dispatch_function_calls
+
+HISTORY_LENGTHS = (0, 50, 200)
+
+SCRIPT = [
+    [("get_files_info", {"directory": "."}), ("get_file_content", {"file_path": "main.py"})],
+    [("get_file_content", {"file_path": "pkg/calculator.py"}), ("get_file_content", {"file_path": "pkg/render.py"})],
+    "The calculator evaluates infix expressions and renders the result in a box.",
+]
+
+
+def _history(length):
+    """A prior conversation of length messages: user questions, tool exchanges and answers."""
+    messages = []
+    while len(messages) < length:
+        i = len(messages)
+        messages.append(types.Content(role="user", parts=[types.Part(text=f"Question {i}: what does module {i} do?")]))
+        messages.append(types.Content(role="model", parts=[types.Part.from_function_call(name="get_file_content", args={"file_path": f"pkg/module{i}.py"})]))
+        messages.append(types.Content(role="tool", parts=[types.Part.from_function_response(name="get_file_content", response={"result": "def f(x):\n    return x\n" * 40})]))
+        messages.append(types.Content(role="model", parts=[types.Part(text=f"Module {i} defines f, which returns its argument unchanged.")]))
+    return messages[:length]
+
+
+def _measure(fn, repeats, setup=None):
+    times = []
+    for _ in range(repeats):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        fn(state) if setup else fn()
+        times.append(time.perf_counter() - start)
+    return {"median_ms": statistics.median(times) * 1000, "best_ms": min(times) * 1000, "repeats": repeats}
+
+
+def _cases():
+    cases = {}
+
+    for length in (50, 200):
+        messages = _history(length)
+        cases[f"count_tokens/{length}"] = (lambda messages=messages: main.count_tokens(messages), None)
+        cases[f"ledger_append/{length}"] = (
+            lambda ledger, message=messages[-1]: ledger.append(message),
+            lambda messages=messages: TokenLedger(main.count_message_tokens, messages),
+        )
+
+    calls = [types.FunctionCall(name="get_file_content", args={"file_path": f"file{i}.py"}) for i in range(8)]
+    calls.append(types.FunctionCall(name="write_file", args={"file_path": "file0.py", "content": ""}))
+    cases["dispatch/9_calls"] = (lambda: dispatch_function_calls(calls, lambda call: call.name, max_workers=4), None)
+
+    for length in (50, 200):
+        messages = _history(length)
+        budget = main.count_tokens(messages) // 3
+        cases[f"compact/{length}"] = (
+            lambda history, budget=budget: history.compact(budget),
+            lambda messages=messages: ConversationHistory(main.count_message_tokens, messages),
+        )
+
+    for length in HISTORY_LENGTHS:
+        messages = _history(length)
+        cases[f"run_ai_query/{length}"] = (lambda messages=messages: main.run_ai_query("Explain the calculator.", False, messages), None)
+        cases[f"stream_ai_query/{length}"] = (lambda messages=messages: list(main.stream_ai_query("Explain the calculator.", False, messages)), None)
+
+    return cases
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT).stdout.strip()
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(), "time": time.time()}
+
+
+def _compare(results, baseline_path, threshold):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    print(f"\ncompared with {baseline_path}:")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        # Best-of-N is far less noisy than the median on a busy machine
+        ratio = result["best_ms"] / baseline[name]["best_ms"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<24} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmark the agent loop against a scripted model backend.")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--save", help="Write results to this JSON file.")
+    parser.add_argument("--compare", help="Compare against results saved earlier with --save.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown reported as a regression (0.10 = 10%%).")
+    args = parser.parse_args()
+
+    main.set_model_backend(ScriptedBackend(SCRIPT))
+    main.MEMOIZE_TOOL_RESULTS = False # Time the tools themselves, not memo hits
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, (fn, setup) in _cases().items():
+            results[name] = _measure(fn, args.repeats, setup)
+
+    print(f"{'case':<24} {'median':>10} {'best':>10}")
+    for name, result in results.items():
+        print(f"{name:<24} {result['median_ms']:8.3f}ms {result['best_ms']:8.3f}ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"metadata": _metadata(), "results": results}, f, indent=2)
+        print(f"\nsaved to {args.save}")
+
+    if args.compare and _compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_benchmark()
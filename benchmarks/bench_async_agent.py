@@ -0,0 +1,77 @@
+# benchmarks/bench_async_agent.py
+#
+# Measures conversation throughput of the blocking agent loop against the
+# asyncio loop at several concurrency limits, using a local fake model with a
+# fixed per-request latency. Each conversation makes one tool-calling turn and
+# one answering turn, so it costs two model round-trips plus a real tool call.
+# Usage: python benchmarks/bench_async_agent.py [conversations] [latency_ms]
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from google.genai import types
+
+import main
+
+
+def _respond(contents):
+    if contents[-1].role == "tool":
+        part = types.Part(text="The calculator package has two modules.")
+    else:
+        part = types.Part.from_function_call(name="get_files_info", args={"directory": "pkg"})
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))]
+    )
+
+
+class FakeClient:
+    """Answers like the real client after a fixed delay, for both the blocking and aio APIs."""
+
+    def __init__(self, latency):
+        latency_seconds = latency
+
+        class Models:
+            def generate_content(self, model, contents, config):
+                time.sleep(latency_seconds)
+                return _respond(contents)
+
+        class AsyncModels:
+            async def generate_content(self, model, contents, config):
+                await asyncio.sleep(latency_seconds)
+                return _respond(contents)
+
+        self.models = Models()
+        self.aio = type("Aio", (), {"models": AsyncModels()})()
+
+
+def main_benchmark():
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 100) / 1000
+    main.client = FakeClient(latency)
+    prompts = [f"What is in pkg? ({i})" for i in range(conversations)]
+    print(f"{conversations} conversations, {latency * 1000:.0f} ms fake model latency")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for prompt in prompts:
+            main.run_ai_query(prompt, False, [])
+        results = [("sync, sequential", time.perf_counter() - start)]
+
+        for limit in (1, 10, 50):
+            start = time.perf_counter()
+            asyncio.run(main.run_many_ai_queries(prompts, max_concurrency=limit))
+            results.append((f"async, limit {limit}", time.perf_counter() - start))
+
+    for label, seconds in results:
+        print(f"{label:<18} {seconds:7.2f} s  {conversations / seconds:8.1f} conversations/s")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,111 @@
+# benchmarks/bench_calculator.py
+#
+# Times Calculator.evaluate on a small set of expression templates: parsing
+# every call (the compile cache disabled), evaluate() hitting the cache, and
+# running an already compiled program directly with new variable bindings.
+# Then compares a Python loop over evaluate() with one evaluate_many() pass
+# over columns (NumPy when installed, array.array otherwise), and finally
+# tokenization throughput on long generated expressions: the single-pass
+# scanner against the old str.split() path (bare, and with the float() /
+# operator classification the old parser did per token), plus a full
+# compile of the same expression.
+# Usage: python benchmarks/bench_calculator.py [evaluations]
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "calculator"))
+
+from pkg import calculator as calculator_module
+from pkg.calculator import Calculator
+
+TEMPLATES = [
+    "x * 2 + y",
+    "2 * x - 8 / 2 + y",
+    "x / y - 3 * x + 7 - y * 2",
+]
+
+
+def _best_of(repeats, fn):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _split_tokens(expression):
+    # The pre-scanner tokenizer: split on whitespace, then classify each token
+    operators = {"+", "-", "*", "/"}
+    tokens = []
+    for token in expression.split():
+        if token in operators:
+            tokens.append(("operator", token))
+        else:
+            try:
+                tokens.append(("number", float(token)))
+            except ValueError:
+                tokens.append(("name", token))
+    return tokens
+
+
+def _generate_expression(operands, rng):
+    parts = [str(rng.randint(1, 999))]
+    for _ in range(operands - 1):
+        parts.append(rng.choice("+-*/"))
+        parts.append(rng.choice([str(rng.randint(1, 999)), f"{rng.random():.4f}", "x", "y"]))
+    return " ".join(parts)
+
+
+def _bench_tokenize(calculator):
+    rng = random.Random(0)
+    print("\ntokenization throughput")
+    for operands in (1000, 100000):
+        expression = _generate_expression(operands, rng)
+        tokens = 2 * operands - 1
+        cases = (
+            ("str.split()", expression.split),
+            ("split+classify", lambda: _split_tokens(expression)),
+            ("scanner", lambda: calculator.tokenize(expression)),
+            ("full compile", lambda: calculator._compile_infix(expression, calculator.tokenize(expression))),
+        )
+        for label, fn in cases:
+            seconds = _best_of(3, fn)
+            print(f"  {operands:>6} operands  {label:<14} {tokens / seconds / 1e6:6.2f} M tokens/s  {len(expression) / seconds / 1e6:6.1f} MB/s")
+
+
+def main():
+    evaluations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    bindings = [{"x": float(i % 97 + 1), "y": float(i % 13 + 1)} for i in range(evaluations)]
+    uncached = Calculator(cache_size=0)
+    cached = Calculator()
+    print(f"{evaluations} evaluations per template")
+
+    for template in TEMPLATES:
+        program = cached.compile(template)
+        results = {
+            "re-parse": _best_of(3, lambda: [uncached.evaluate(template, b) for b in bindings]),
+            "evaluate (cached)": _best_of(3, lambda: [cached.evaluate(template, b) for b in bindings]),
+            "compiled program": _best_of(3, lambda: [program.evaluate(b) for b in bindings]),
+        }
+        baseline = results["re-parse"]
+        print(f"\n{template}")
+        for label, seconds in results.items():
+            print(f"  {label:<18} {seconds * 1e9 / evaluations:8.0f} ns/eval  ({baseline / seconds:4.1f}x)")
+
+    backend = "numpy" if calculator_module.np is not None else "array.array"
+    columns = {"x": [b["x"] for b in bindings], "y": [b["y"] for b in bindings]}
+    print(f"\nevaluate_many ({backend}) vs a loop over evaluate()")
+    for template in TEMPLATES:
+        loop = _best_of(3, lambda: [cached.evaluate(template, b) for b in bindings])
+        batch = _best_of(3, lambda: cached.evaluate_many(template, columns))
+        print(f"  {template:<28} loop {loop * 1e9 / evaluations:7.0f} ns/row  batch {batch * 1e9 / evaluations:7.0f} ns/row  ({loop / batch:5.1f}x)")
+
+    _bench_tokenize(cached)
+
+
+if __name__ == "__main__":
+    main()
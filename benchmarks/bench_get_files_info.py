@@ -0,0 +1,77 @@
+# benchmarks/bench_get_files_info.py
+#
+# Times directory listings on a generated tree with tens of thousands of files:
+# the old listdir + isdir + getsize approach, the scandir rewrite with a cold
+# cache, and repeated listings served from the mtime-keyed cache.
+# Usage: python benchmarks/bench_get_files_info.py [dirs] [files_per_dir]
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions import config
+from functions.get_files_info import get_files_info, invalidate_listing_cache
+
+
+def _listdir_walk(target_dir):
+    # The pre-scandir implementation, applied at every level
+    files_info = []
+    for filename in os.listdir(target_dir):
+        filepath = os.path.join(target_dir, filename)
+        is_dir = os.path.isdir(filepath)
+        file_size = os.path.getsize(filepath)
+        files_info.append(f"- {filename}: file_size={file_size} bytes, is_dir={is_dir}")
+        if is_dir:
+            files_info.extend(_listdir_walk(filepath))
+    return files_info
+
+
+def _make_tree(root, dirs, files_per_dir):
+    for d in range(dirs):
+        directory = os.path.join(root, f"dir{d // 20}", f"sub{d}")
+        os.makedirs(directory)
+        for f in range(files_per_dir):
+            with open(os.path.join(directory, f"file{f}.py"), "w") as fh:
+                fh.write("x" * (f % 50))
+
+
+def _best_of(repeats, fn):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    dirs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    files_per_dir = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    config.MAX_LISTING_ENTRIES = 10 ** 9  # Measure the walk, not the truncation
+
+    with tempfile.TemporaryDirectory() as root:
+        _make_tree(root, dirs, files_per_dir)
+        print(f"tree: {dirs * files_per_dir} files in {dirs} directories")
+
+        def cold():
+            invalidate_listing_cache()
+            get_files_info(root, recursive=True)
+
+        results = {
+            "listdir+stat": _best_of(3, lambda: _listdir_walk(root)),
+            "scandir (cold)": _best_of(3, cold),
+        }
+        get_files_info(root, recursive=True)
+        results["scandir (cached)"] = _best_of(5, lambda: get_files_info(root, recursive=True))
+        results["cached, *.py glob"] = _best_of(5, lambda: get_files_info(root, recursive=True, pattern="file1*.py"))
+
+        baseline = results["listdir+stat"]
+        for label, seconds in results.items():
+            print(f"{label:<20} {seconds * 1000:8.1f} ms  ({baseline / seconds:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
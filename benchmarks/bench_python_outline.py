@@ -0,0 +1,70 @@
+# benchmarks/bench_python_outline.py
+#
+# Times get_python_outline over a generated tree of Python modules: a cold
+# parse in this process, a cold parse spread over a process pool, and a warm
+# call served from the per-file cache. Then compares the characters returned
+# by get_symbol_source for one method with reading its whole file through
+# get_file_content.
+# The pool case reports its worker count; get_symbols skips the pool when
+# there is only one worker, so pass a worker count to time it anyway.
+# Usage: python benchmarks/bench_python_outline.py [files] [workers]
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions import config, python_outline
+from functions.get_files_info import get_file_content, get_python_outline, get_symbol_source
+
+
+def _make_tree(root, files):
+    for i in range(files):
+        directory = os.path.join(root, f"pkg{i // 100}")
+        os.makedirs(directory, exist_ok=True)
+        methods = "".join(
+            f"\n    def method_{m}(self, value, *, scale=1.0):\n"
+            f"        total = value * scale + {m}\n"
+            f"        for step in range({m}):\n            total += step\n        return total\n"
+            for m in range(30)
+        )
+        with open(os.path.join(directory, f"module{i}.py"), "w") as f:
+            f.write(f"import math\n\n\nclass Model{i}:\n    \"\"\"Generated model {i}.\"\"\"\n{methods}\n\ndef helper_{i}(x):\n    return math.sqrt(x)\n")
+
+
+def _cold(root, threshold):
+    with python_outline._outline_cache_lock:
+        python_outline._outline_cache.clear()
+    config.OUTLINE_PARALLEL_THRESHOLD = threshold
+    get_python_outline(root)
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    if len(sys.argv) > 2:
+        config.OUTLINE_WORKERS = int(sys.argv[2])
+    workers = python_outline.worker_count()
+    config.MAX_FILE_READ_CHARS = 10 ** 9 # Measure parsing, not the truncation
+
+    with tempfile.TemporaryDirectory() as root:
+        _make_tree(root, files)
+        print(f"tree: {files} modules, {os.cpu_count()} CPUs")
+        pool_label = f"cold, pool of {workers}" if workers > 1 else "cold, 1 worker (serial)"
+        for label, threshold in (("cold, serial", 10 ** 9), (pool_label, 1)):
+            start = time.perf_counter()
+            _cold(root, threshold)
+            print(f"  {label:<24} {(time.perf_counter() - start) * 1000:8.1f} ms")
+        start = time.perf_counter()
+        get_python_outline(root)
+        print(f"  {'warm (cached)':<24} {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        config.MAX_FILE_READ_CHARS = 10000
+        symbol = get_symbol_source(root, "Model7.method_12", "pkg0/module7.py")
+        whole = get_file_content(root, "pkg0/module7.py")
+        print(f"  one method: {len(symbol)} chars vs {len(whole)} chars for the file ({len(whole) / len(symbol):.0f}x less)")
+
+
+if __name__ == "__main__":
+    main()
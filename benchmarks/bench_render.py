@@ -0,0 +1,67 @@
+# benchmarks/bench_render.py
+#
+# Times rendering thousands of results: the original per-call render (list
+# of concatenated lines, widths from len()), the current render with cached
+# border strings and display-width measurement, render_many building one
+# buffer, and the compact one-line format.
+# Usage: python benchmarks/bench_render.py [results]
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "calculator"))
+
+from pkg.render import render, render_many
+
+
+def _original_render(expression, result):
+    if isinstance(result, float) and result.is_integer():
+        result_str = str(int(result))
+    else:
+        result_str = str(result)
+
+    box_width = max(len(expression), len(result_str)) + 4
+
+    box = []
+    box.append("┌" + "─" * box_width + "┐")
+    box.append(
+        "│" + " " * 2 + expression + " " * (box_width - len(expression) - 2) + "│"
+    )
+    box.append("│" + " " * box_width + "│")
+    box.append("│" + " " * 2 + "=" + " " * (box_width - 3) + "│")
+    box.append("│" + " " * box_width + "│")
+    box.append(
+        "│" + " " * 2 + result_str + " " * (box_width - len(result_str) - 2) + "│"
+    )
+    box.append("└" + "─" * box_width + "┘")
+    return "\n".join(box)
+
+
+def _best_of(repeats, fn):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    pairs = [(f"{i} * {i % 7 + 1} - {i % 13}", float(i * (i % 7 + 1) - i % 13)) for i in range(count)]
+    print(f"{count} results")
+
+    results = {
+        "original render": _best_of(5, lambda: "\n".join(_original_render(e, r) for e, r in pairs)),
+        "render": _best_of(5, lambda: "\n".join(render(e, r) for e, r in pairs)),
+        "render_many": _best_of(5, lambda: render_many(pairs)),
+        "render_many compact": _best_of(5, lambda: render_many(pairs, compact=True)),
+    }
+    baseline = results["original render"]
+    for label, seconds in results.items():
+        print(f"{label:<20} {seconds * 1e9 / count:7.0f} ns/result  ({baseline / seconds:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
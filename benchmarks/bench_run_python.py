@@ -0,0 +1,60 @@
+# benchmarks/bench_run_python.py
+#
+# Compares cold-spawn run_python_file latency against the warm interpreter pool.
+# Usage: python benchmarks/bench_run_python.py [runs]
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions import config
+from functions.run_python import get_interpreter_pool, run_python_file
+
+WORKING_DIRECTORY = os.path.join(ROOT, "calculator")
+SCRIPTS = [("tests.py", []), ("main.py", ["3 + 5"])]
+
+
+def _time_runs(runs):
+    timings = {}
+    for script, args in SCRIPTS:
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            run_python_file(WORKING_DIRECTORY, script, args)
+            samples.append(time.perf_counter() - start)
+        timings[script] = samples
+    return timings
+
+
+def _report(label, timings):
+    for script, samples in timings.items():
+        print(
+            f"{label:<7} {script:<10} "
+            f"median={statistics.median(samples) * 1000:7.2f} ms  "
+            f"min={min(samples) * 1000:7.2f} ms  "
+            f"max={max(samples) * 1000:7.2f} ms"
+        )
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    config.USE_INTERPRETER_POOL = False
+    cold = _time_runs(runs)
+
+    config.USE_INTERPRETER_POOL = True
+    get_interpreter_pool(WORKING_DIRECTORY)  # Start the workers outside the timed region
+    pooled = _time_runs(runs)
+
+    _report("cold", cold)
+    _report("pooled", pooled)
+    for script in cold:
+        speedup = statistics.median(cold[script]) / statistics.median(pooled[script])
+        print(f"speedup {script:<10} {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_search_files.py
+#
+# Times search_files on a generated tree of small Python modules: building
+# the trigram index from scratch, loading the saved index in a new process
+# (simulated by a fresh TrigramIndex), a no-change refresh, and literal and
+# regex queries against the index versus a brute-force walk that reads and
+# searches every file. The last cases time the agent's edit -> run -> search
+# loop: the first search after a file write and mark_indexes_stale(), both
+# straight away and after a pause like a model round trip, during which the
+# background refresh runs.
+# Usage: python benchmarks/bench_search_files.py [files]
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from functions import config
+from functions.get_files_info import write_file
+from functions.search_index import TrigramIndex, get_search_index, mark_indexes_stale, save_indexes
+
+WORDS = ["alpha", "beta", "gamma", "delta", "value", "result", "total", "count", "parse", "render", "token", "cache"]
+
+QUERIES = [
+    ("rare literal", "def handler_4242(", False),
+    ("common literal", "return result", False),
+    ("regex", r"def \w+_4242\(", True),
+    ("regex, no literals", r"\d{6}", True),
+]
+
+
+def _make_tree(root, files):
+    for i in range(files):
+        directory = os.path.join(root, f"pkg{i // 1000}", f"mod{i // 50}")
+        os.makedirs(directory, exist_ok=True)
+        a, b = WORDS[i % len(WORDS)], WORDS[(i * 7) % len(WORDS)]
+        with open(os.path.join(directory, f"m{i}.py"), "w") as f:
+            f.write(
+                f"import os\n\n\ndef handler_{i}({a}, {b}):\n"
+                f"    result = {a} + {b} * {i % 97}\n"
+                f"    return result\n\n\nclass {a.title()}{i}:\n    {b} = {i}\n"
+            )
+
+
+def _brute_force(root, query, regex):
+    compiled = re.compile(query if regex else re.escape(query))
+    matches = 0
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            with open(os.path.join(dirpath, filename), "r", encoding="utf-8", errors="replace") as f:
+                matches += len(compiled.findall(f.read()))
+    return matches
+
+
+def _first_matches(index, query, regex, limit=config.SEARCH_MAX_RESULTS):
+    found = 0
+    for _, _, matches in index.search(query, regex):
+        found += len(matches)
+        if found >= limit:
+            break
+    return found
+
+
+def _best_of(repeats, fn):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    config.SEARCH_INDEX_RECHECK_SECONDS = float("inf") # Time queries, not the periodic re-check
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "tree")
+        index_path = os.path.join(tmp, "index.json")
+        _make_tree(root, files)
+        print(f"tree: {files} files")
+
+        start = time.perf_counter()
+        index = TrigramIndex(root, index_path)
+        index.refresh()
+        index.save()
+        print(f"  build + save index     {time.perf_counter() - start:8.2f} s")
+        start = time.perf_counter()
+        reloaded = TrigramIndex(root, index_path)
+        print(f"  load saved index       {time.perf_counter() - start:8.2f} s")
+        print(f"  no-change refresh      {_best_of(3, reloaded.refresh) * 1000:8.1f} ms")
+
+        for label, query, regex in QUERIES:
+            indexed = _best_of(5, lambda: _first_matches(index, query, regex))
+            brute = _best_of(1, lambda: _brute_force(root, query, regex))
+            print(f"  {label:<20} index {indexed * 1000:8.2f} ms  brute force {brute * 1000:8.1f} ms  ({brute / indexed:6.1f}x)")
+
+        # The shared index search_files uses, saved under the temporary directory
+        config.SEARCH_INDEX_DIR = os.path.join(tmp, "indexes")
+        shared = get_search_index(root)
+        start = time.perf_counter()
+        _first_matches(shared, "def handler_4242(", False)
+        print(f"  first search, no saved index {time.perf_counter() - start:8.2f} s")
+        for label, pause in (("straight away", 0), ("after 1 s", 1)):
+            write_file(root, "pkg0/mod0/m0.py", f"def edited_{pause}():\n    pass\n")
+            mark_indexes_stale() # As run_python_file does
+            time.sleep(pause)
+            start = time.perf_counter()
+            _first_matches(shared, "def handler_4242(", False)
+            print(f"  search after write + script run, {label:<14} {(time.perf_counter() - start) * 1000:8.1f} ms")
+        start = time.perf_counter()
+        save_indexes()
+        print(f"  background save (off the search path) {time.perf_counter() - start:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
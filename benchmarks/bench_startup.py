@@ -0,0 +1,71 @@
+# benchmarks/bench_startup.py
+#
+# Measures how long `import main` takes in a fresh interpreter, and what the
+# first token count and the first client construction add on top now that
+# both are deferred. Each step runs in its own subprocess so nothing is
+# already imported; the best of several runs is reported. With -X importtime
+# the slowest modules behind `import main` are listed as well.
+# Usage: python benchmarks/bench_startup.py [repeats] [--importtime]
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STEPS = {
+    "import main": "import main",
+    "+ first count_tokens": (
+        "import main\n"
+        "from google.genai import types\n"
+        "main.count_tokens([types.Content(role='user', parts=[types.Part(text='hello')])])"
+    ),
+    "+ get_client()": "import main\nmain.get_client()",
+}
+
+TIMER = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "{code}\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def _time_in_subprocess(code):
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "benchmark"))
+    result = subprocess.run(
+        [sys.executable, "-c", TIMER.format(code=code)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _slowest_imports(count=10):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    repeats = int(args[0]) if args else 5
+
+    for label, code in STEPS.items():
+        best = min(_time_in_subprocess(code) for _ in range(repeats))
+        print(f"{label:<22} {best * 1000:8.1f} ms")
+
+    if "--importtime" in sys.argv:
+        print("\nslowest imports (cumulative):")
+        for microseconds, name in _slowest_imports():
+            print(f"{microseconds / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,109 @@
-print(3 + 7 * 2)
\ No newline at end of file
+# main.py
+
+import argparse
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from pkg.calculator import Calculator
+from pkg.render import format_result, render, render_compact
+
+# Lines evaluated per batch; with --jobs, at most 2 * jobs batches are in flight
+BATCH_LINES = 1000
+
+# One per process, so each worker keeps its own compiled-expression cache
+_calculator = Calculator()
+
+
+def evaluate_lines(lines, output_format="raw"):
+    """
+    Evaluates one expression per line and returns (output, error_count).
+    output has one entry per non-blank line: the result, its rendered box,
+    "expression = result" (compact), or "error: ..." for a line that failed.
+    """
+    output = []
+    errors = 0
+    for line in lines:
+        expression = line.strip()
+        if not expression:
+            if output_format == "raw":
+                output.append("\n")
+            continue
+        try:
+            result = _calculator.evaluate(expression)
+        except (ValueError, ArithmeticError) as e:
+            output.append(f"error: {e}\n")
+            errors += 1
+            continue
+        if output_format == "box":
+            output.append(render(expression, result) + "\n")
+        elif output_format == "compact":
+            output.append(render_compact(expression, result) + "\n")
+        else:
+            output.append(format_result(result) + "\n")
+    return "".join(output), errors
+
+
+def _batches(lines):
+    while True:
+        batch = list(islice(lines, BATCH_LINES))
+        if not batch:
+            return
+        yield batch
+
+
+def stream(lines, out, output_format="raw", jobs=1):
+    """
+    Evaluates lines in batches and writes the results to out in input
+    order, keeping only a bounded number of batches in memory. Returns the
+    number of lines that failed.
+    """
+    errors = 0
+    if jobs <= 1:
+        for batch in _batches(lines):
+            text, batch_errors = evaluate_lines(batch, output_format)
+            out.write(text)
+            errors += batch_errors
+        return errors
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for batch in _batches(lines):
+            pending.append(pool.submit(evaluate_lines, batch, output_format))
+            if len(pending) >= 2 * jobs:
+                text, batch_errors = pending.popleft().result()
+                out.write(text)
+                errors += batch_errors
+        while pending:
+            text, batch_errors = pending.popleft().result()
+            out.write(text)
+            errors += batch_errors
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate arithmetic expressions.")
+    parser.add_argument("expression", nargs="*", help="An expression to evaluate, e.g. \"3 + 5\".")
+    parser.add_argument("--file", help="Evaluate one expression per line of this file ('-' for stdin).")
+    parser.add_argument("--format", choices=["raw", "compact", "box"], help="Print bare results, one-line \"expression = result\" or boxed renderings (default: box for an expression argument, raw for --file).")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes for --file input.")
+    args = parser.parse_args()
+
+    if args.file is None and not args.expression:
+        parser.print_usage()
+        sys.exit(2)
+
+    if args.file is None:
+        text, errors = evaluate_lines([" ".join(args.expression)], args.format or "box")
+        sys.stdout.write(text)
+    elif args.file == "-":
+        errors = stream(sys.stdin, sys.stdout, args.format or "raw", args.jobs)
+    else:
+        with open(args.file, "r", encoding="utf-8") as f:
+            errors = stream(f, sys.stdout, args.format or "raw", args.jobs)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
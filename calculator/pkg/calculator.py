@@ -1,61 +1,349 @@
 # calculator.py
 
+import math
+import re
+from array import array
+from collections import OrderedDict
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Instruction kinds of a compiled program
+CONST = 0
+VAR = 1
+BINARY = 2
+UNARY = 3
+
+# What evaluate_many does when a divisor is zero: raise ZeroDivisionError,
+# give NaN, or follow IEEE 754 (+/-inf, and NaN for 0 / 0)
+ZERO_DIVISION_POLICIES = ("raise", "nan", "inf")
+
+
+class ExpressionError(ValueError):
+    """
+    A malformed expression. position is the character offset of the
+    offending token in the expression.
+    """
+
+    def __init__(self, message, position):
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
+
+def _negate(a):
+    return -a
+
+
+def _ieee_divide(divide):
+    def divide_or_inf(a, b):
+        if b:
+            return divide(a, b)
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return divide_or_inf
+
+
+def _nan_divide(divide):
+    return lambda a, b: divide(a, b) if b else math.nan
+
+
+class CompiledExpression:
+    """
+    An expression compiled to reverse Polish notation, ready to be evaluated
+    repeatedly with different variable bindings.
+
+    code is a tuple of (kind, argument) instructions: CONST pushes a number,
+    VAR pushes the value bound to a name, BINARY pops two values and pushes
+    the result of applying its operator function to them, and UNARY does the
+    same with one value.
+    """
+
+    __slots__ = ("expression", "code", "variables")
+
+    def __init__(self, expression, code):
+        self.expression = expression
+        self.code = code
+        self.variables = tuple(sorted({argument for kind, argument in code if kind == VAR}))
+
+    def __repr__(self):
+        return f"CompiledExpression({self.expression!r})"
+
+    def evaluate(self, variables=None):
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        for kind, argument in self.code:
+            if kind == CONST:
+                push(argument)
+            elif kind == BINARY:
+                b = pop()
+                push(argument(pop(), b))
+            elif kind == UNARY:
+                push(argument(pop()))
+            else:
+                try:
+                    push(variables[argument])
+                except (KeyError, TypeError):
+                    raise ValueError(f"unbound variable: {argument}")
+        return stack[0]
+
+
 class Calculator:
-    def __init__(self):
+    def __init__(self, cache_size=256, zero_division="raise"):
         self.operators = {
             "+": lambda a, b: a + b,
             "-": lambda a, b: a - b,
             "*": lambda a, b: a * b,
             "/": lambda a, b: a / b,
+            "**": lambda a, b: a ** b,
         }
         self.precedence = {
             "+": 3,
             "-": 1,
             "*": 2,
             "/": 2,
+            "**": 5,
         }
+        self.right_associative = {"**"}
+        # Unary minus binds tighter than every binary operator except "**",
+        # so -2 ** 2 is -(2 ** 2)
+        self.unary_precedence = 4
+        # Compiled programs by expression, least recently used first
+        self.cache_size = cache_size
+        self._compiled = OrderedDict()
+        self.zero_division = zero_division
+        self._scanner_cache = None
 
-    def evaluate(self, expression):
+    def evaluate(self, expression, variables=None):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
-
-    def _evaluate_infix(self, tokens):
-        values = []
-        operators = []
-
-        for token in tokens:
-            if token in self.operators:
-                while (
-                    operators
-                    and operators[-1] in self.operators
-                    and self.precedence[operators[-1]] >= self.precedence[token]
-                ):
-                    self._apply_operator(operators, values)
-                operators.append(token)
+        return self.compile(expression).evaluate(variables)
+
+    def compile(self, expression):
+        """
+        Returns the CompiledExpression for expression, from the cache when it
+        was compiled recently. Names in the expression (e.g. the x in "x * 2")
+        are variables bound at evaluation time.
+        """
+        compiled = self._compiled.get(expression)
+        if compiled is not None:
+            self._compiled.move_to_end(expression)
+            return compiled
+
+        compiled = CompiledExpression(expression, self._compile_infix(expression, self.tokenize(expression)))
+        if self.cache_size > 0:
+            self._compiled[expression] = compiled
+            if len(self._compiled) > self.cache_size:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def evaluate_many(self, expression, columns, zero_division=None):
+        """
+        Evaluates expression once per row of columns, a mapping of variable
+        name to a sequence of numbers, all of the same length. Each operator
+        is applied to whole columns at a time: as NumPy arrays when NumPy is
+        installed (the result is an ndarray), otherwise as array.array("d")
+        buffers (the result is an array.array).
+
+        zero_division overrides the calculator's zero_division policy for
+        this call; see ZERO_DIVISION_POLICIES.
+        """
+        zero_division = zero_division or self.zero_division
+        if zero_division not in ZERO_DIVISION_POLICIES:
+            raise ValueError(f"invalid zero_division policy: {zero_division}")
+
+        program = self.compile(expression)
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("columns must all have the same length")
+        length = lengths.pop() if lengths else 1
+        for name in program.variables:
+            if name not in columns:
+                raise ValueError(f"unbound variable: {name}")
+
+        if np is not None:
+            return self._evaluate_numpy(program, columns, length, zero_division)
+        return self._evaluate_arrays(program, columns, length, zero_division)
+
+    def _evaluate_numpy(self, program, columns, length, zero_division):
+        divide = self.operators.get("/")
+        stack = []
+        for kind, argument in program.code:
+            if kind == CONST:
+                stack.append(argument)
+            elif kind == VAR:
+                stack.append(np.asarray(columns[argument], dtype=float))
+            elif kind == UNARY:
+                stack.append(argument(stack.pop()))
             else:
-                try:
-                    values.append(float(token))
-                except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                b = stack.pop()
+                a = stack.pop()
+                if argument is not divide:
+                    stack.append(argument(a, b))
+                    continue
+                zero = np.equal(b, 0)
+                if zero_division == "raise" and np.any(zero):
+                    raise ZeroDivisionError("division by zero")
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    result = argument(np.asarray(a, dtype=float), b)
+                if zero_division == "nan":
+                    result = np.where(zero, np.nan, result)
+                stack.append(result)
+        return np.broadcast_to(np.asarray(stack[0], dtype=float), (length,)).copy()
+
+    def _evaluate_arrays(self, program, columns, length, zero_division):
+        divide = self.operators.get("/")
+        checked_divide = {"raise": divide, "nan": _nan_divide(divide), "inf": _ieee_divide(divide)}[zero_division]
+        stack = []
+        for kind, argument in program.code:
+            if kind == CONST:
+                stack.append(argument)
+            elif kind == VAR:
+                column = columns[argument]
+                stack.append(column if isinstance(column, array) and column.typecode == "d" else array("d", column))
+            elif kind == UNARY:
+                a = stack.pop()
+                stack.append(array("d", map(argument, a)) if isinstance(a, array) else argument(a))
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                function = checked_divide if argument is divide else argument
+                if isinstance(a, array) or isinstance(b, array):
+                    stack.append(array("d", map(
+                        function,
+                        a if isinstance(a, array) else repeat(a),
+                        b if isinstance(b, array) else repeat(b),
+                    )))
+                else:
+                    stack.append(function(a, b))
+        result = stack[0]
+        return result if isinstance(result, array) else array("d", [result]) * length
+
+    def clear_cache(self):
+        """Forgets compiled expressions; needed after changing operators or precedence."""
+        self._compiled.clear()
+
+    def tokenize(self, expression):
+        """
+        Splits expression into token strings in one regex pass. Whitespace
+        between tokens is optional. A character that starts no valid token
+        comes back as a token of its own and is rejected when compiling.
+        """
+        return self._scanner().findall(expression)
+
+    def _scanner(self):
+        # Rebuilt only when the set of operators changes
+        operators = tuple(sorted(self.operators, key=len, reverse=True))
+        if self._scanner_cache is None or self._scanner_cache[0] != operators:
+            pattern = re.compile(
+                r"\s*("
+                r"(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?" # Numbers, including scientific notation
+                r"|[^\W\d]\w*" # Variable names
+                + "".join(f"|{re.escape(operator)}" for operator in operators)
+                + r"|[()]|\S)"
+            )
+            self._scanner_cache = (operators, pattern)
+        return self._scanner_cache[1]
+
+    def _error(self, message, expression, index):
+        # Token positions are only worked out when there is an error to report
+        for i, match in enumerate(self._scanner().finditer(expression)):
+            if i == index:
+                return ExpressionError(message, match.start(1))
+        return ExpressionError(message, len(expression))
+
+    def _compile_infix(self, expression, tokens):
+        code = []
+        depth = 0 # Values on the stack when the program runs
+        operators = [] # (operator, token index); unary minus is "neg", a parenthesis "("
+        expect_operand = True
+
+        for index, token in enumerate(tokens):
+            first = token[0]
+            if expect_operand:
+                if first.isdigit() or first == ".":
+                    code.append((CONST, float(token)))
+                elif first.isalpha() or first == "_":
+                    code.append((VAR, token))
+                elif token == "(":
+                    operators.append(("(", index))
+                    continue
+                elif token == "-":
+                    operators.append(("neg", index))
+                    continue
+                elif token in self.operators:
+                    raise self._error(f"not enough operands for operator {token}", expression, index)
+                elif token == ")":
+                    raise self._error("expected an operand before ')'", expression, index)
+                else:
+                    raise self._error(f"invalid token {token!r}", expression, index)
+                depth += 1
+                expect_operand = False
+            elif token in self.operators:
+                right_associative = token in self.right_associative
+                while operators and operators[-1][0] != "(":
+                    top = self._precedence_of(operators[-1][0])
+                    if top < self.precedence[token] or (top == self.precedence[token] and right_associative):
+                        break
+                    depth = self._emit(operators.pop()[0], code, depth)
+                operators.append((token, index))
+                expect_operand = True
+            elif token == ")":
+                while operators and operators[-1][0] != "(":
+                    depth = self._emit(operators.pop()[0], code, depth)
+                if not operators:
+                    raise self._error("unmatched ')'", expression, index)
+                operators.pop()
+            elif first.isdigit() or first == "." or first.isalpha() or first == "_" or token == "(":
+                raise self._error(f"expected an operator before {token!r}", expression, index)
+            else:
+                raise self._error(f"invalid token {token!r}", expression, index)
+
+        if expect_operand and tokens:
+            # The expression ends right after an operator or "("
+            operator, index = operators[-1]
+            if operator == "(":
+                raise self._error("unmatched '('", expression, index)
+            raise self._error(f"not enough operands for operator {tokens[index]}", expression, index)
 
         while operators:
-            self._apply_operator(operators, values)
+            operator, index = operators.pop()
+            if operator == "(":
+                raise self._error("unmatched '('", expression, index)
+            depth = self._emit(operator, code, depth)
 
-        if len(values) != 1:
-            raise ValueError("invalid expression")
+        if depth != 1:
+            raise ExpressionError("invalid expression", 0)
 
-        return values[0]
+        return tuple(code)
 
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
+    def _precedence_of(self, operator):
+        return self.unary_precedence if operator == "neg" else self.precedence[operator]
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
+    def _emit(self, operator, code, depth):
+        if operator == "neg":
+            # Fold negated constants at compile time
+            if code[-1][0] == CONST:
+                code[-1] = (CONST, -code[-1][1])
+            else:
+                code.append((UNARY, _negate))
+            return depth
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
\ No newline at end of file
+        function = self.operators[operator]
+        # Fold operations on two constants at compile time; a division by zero
+        # is left for evaluation time, where evaluate_many applies its policy
+        if code[-1][0] == CONST and code[-2][0] == CONST:
+            try:
+                folded = function(code[-2][1], code[-1][1])
+            except ZeroDivisionError:
+                code.append((BINARY, function))
+            else:
+                del code[-2:]
+                code.append((CONST, folded))
+        else:
+            code.append((BINARY, function))
+        return depth - 1
@@ -1,23 +1,72 @@
 # render.py
 
-def render(expression, result):
+import unicodedata
+from functools import lru_cache
+
+
+def format_result(result):
     if isinstance(result, float) and result.is_integer():
-        result_str = str(int(result))
-    else:
-        result_str = str(result)
+        return str(int(result))
+    return str(result)
 
-    box_width = max(len(expression), len(result_str)) + 4
 
-    box = []
-    box.append("┌" + "─" * box_width + "┐")
-    box.append(
-        "│" + " " * 2 + expression + " " * (box_width - len(expression) - 2) + "│"
-    )
-    box.append("│" + " " * box_width + "│")
-    box.append("│" + " " * 2 + "=" + " " * (box_width - 3) + "│")
-    box.append("│" + " " * box_width + "│")
-    box.append(
-        "│" + " " * 2 + result_str + " " * (box_width - len(result_str) - 2) + "│"
+def display_width(text):
+    """
+    Returns the number of terminal columns text takes: wide and fullwidth
+    characters (e.g. CJK) count as two, combining marks and zero-width
+    format characters as none.
+    """
+    if text.isascii():
+        return len(text)
+    width = 0
+    for char in text:
+        if unicodedata.combining(char) or unicodedata.category(char) in ("Me", "Cf"):
+            continue
+        width += 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+    return width
+
+
+@lru_cache(maxsize=256)
+def _box_lines(box_width):
+    # The lines of a box that only depend on its width
+    return (
+        "┌" + "─" * box_width + "┐",
+        "│" + " " * box_width + "│",
+        "│" + " " * 2 + "=" + " " * (box_width - 3) + "│",
+        "└" + "─" * box_width + "┘",
     )
-    box.append("└" + "─" * box_width + "┘")
-    return "\n".join(box)
\ No newline at end of file
+
+
+def _render_box(expression, result_str):
+    expression_width = display_width(expression)
+    result_width = display_width(result_str)
+    box_width = max(expression_width, result_width) + 4
+    top, blank, equals, bottom = _box_lines(box_width)
+    return "\n".join((
+        top,
+        "│  " + expression + " " * (box_width - expression_width - 2) + "│",
+        blank,
+        equals,
+        blank,
+        "│  " + result_str + " " * (box_width - result_width - 2) + "│",
+        bottom,
+    ))
+
+
+def render(expression, result):
+    return _render_box(expression, format_result(result))
+
+
+def render_compact(expression, result):
+    """One-line rendering for bulk output: "expression = result"."""
+    return f"{expression} = {format_result(result)}"
+
+
+def render_many(results, compact=False):
+    """
+    Renders (expression, result) pairs into a single string, one rendering
+    per line (compact) or one box after another, built with a single join.
+    """
+    if compact:
+        return "\n".join([f"{expression} = {format_result(result)}" for expression, result in results])
+    return "\n".join([_render_box(expression, format_result(result)) for expression, result in results])
@@ -1,7 +1,14 @@
 # tests.py
 
+import io
+import math
 import unittest
-from pkg.calculator import Calculator
+from unittest import mock
+
+from pkg import calculator as calculator_module
+import main
+from pkg.calculator import Calculator, ExpressionError
+from pkg.render import display_width, render, render_compact, render_many
 
 
 class TestCalculator(unittest.TestCase):
@@ -44,6 +51,165 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_variables(self):
+        result = self.calculator.evaluate("x * 2 - y", {"x": 4, "y": 3})
+        self.assertEqual(result, 5)
+
+    def test_unbound_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("x * 2")
+
+    def test_compiled_expression_reused(self):
+        program = self.calculator.compile("x / 2 - 1")
+        self.assertIs(self.calculator.compile("x / 2 - 1"), program)
+        self.assertEqual(program.variables, ("x",))
+        self.assertEqual([program.evaluate({"x": x}) for x in (2, 4, 6)], [0, 1, 2])
+
+    def test_constants_are_folded(self):
+        program = self.calculator.compile("2 * 3 - 8 / 2")
+        self.assertEqual(len(program.code), 1)
+
+    def test_cache_is_bounded(self):
+        calculator = Calculator(cache_size=2)
+        first = calculator.compile("1 - x")
+        calculator.compile("2 - x")
+        calculator.compile("3 - x")
+        self.assertIsNot(calculator.compile("1 - x"), first)
+
+    def test_no_whitespace_needed(self):
+        self.assertEqual(self.calculator.evaluate("3*4-5"), 7)
+
+    def test_parentheses(self):
+        self.assertEqual(self.calculator.evaluate("3 * (4 - 5)"), -3)
+        self.assertEqual(self.calculator.evaluate("((2))"), 2)
+
+    def test_unary_minus(self):
+        self.assertEqual(self.calculator.evaluate("-2 * 3"), -6)
+        self.assertEqual(self.calculator.evaluate("3 * -x", {"x": 2}), -6)
+        self.assertEqual(self.calculator.evaluate("-(1 - 4)"), 3)
+
+    def test_exponentiation(self):
+        self.assertEqual(self.calculator.evaluate("2 ** 3 ** 2"), 512)
+        self.assertEqual(self.calculator.evaluate("-2 ** 2"), -4)
+        self.assertEqual(self.calculator.evaluate("2 ** -1"), 0.5)
+
+    def test_scientific_notation(self):
+        self.assertEqual(self.calculator.evaluate("1.5e3 / 3"), 500)
+        self.assertEqual(self.calculator.evaluate(".5E-1 * 100"), 5)
+
+    def test_error_positions(self):
+        cases = {
+            "3 * $": 4,
+            "(1 - 2": 0,
+            "1 - 2)": 5,
+            "3 4": 2,
+            "2 *": 2,
+        }
+        for expression, position in cases.items():
+            with self.assertRaises(ExpressionError) as caught:
+                self.calculator.evaluate(expression)
+            self.assertEqual(caught.exception.position, position, expression)
+
+
+class TestEvaluateMany(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+        self.columns = {"x": [1.0, 2.0, 3.0, 4.0], "y": [4.0, 0.0, 2.0, 1.0]}
+
+    def _evaluate_many(self, *args, **kwargs):
+        return list(self.calculator.evaluate_many(*args, **kwargs))
+
+    def _check_both_backends(self, check):
+        check()
+        if calculator_module.np is not None:
+            with mock.patch.object(calculator_module, "np", None):
+                check()
+
+    def test_matches_scalar_evaluate(self):
+        def check():
+            expression = "-x * 2 - (y / 2) ** 2 + 1"
+            expected = [
+                self.calculator.evaluate(expression, {"x": x, "y": y})
+                for x, y in zip(self.columns["x"], self.columns["y"])
+            ]
+            self.assertEqual(self._evaluate_many(expression, self.columns), expected)
+        self._check_both_backends(check)
+
+    def test_constant_expression_is_repeated(self):
+        self._check_both_backends(lambda: self.assertEqual(self._evaluate_many("2 * 3", self.columns), [6.0] * 4))
+
+    def test_zero_division_policies(self):
+        def check():
+            with self.assertRaises(ZeroDivisionError):
+                self._evaluate_many("x / y", self.columns)
+            self.assertTrue(math.isnan(self._evaluate_many("x / y", self.columns, zero_division="nan")[1]))
+            self.assertEqual(self._evaluate_many("x / y", self.columns, zero_division="inf")[1], math.inf)
+            self.assertTrue(math.isnan(self._evaluate_many("0 / y", self.columns, zero_division="inf")[1]))
+        self._check_both_backends(check)
+
+    def test_invalid_columns(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_many("x + y", {"x": [1.0], "y": [1.0, 2.0]})
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_many("x + z", self.columns)
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_many("x + y", self.columns, zero_division="ignore")
+
+
+class TestRender(unittest.TestCase):
+    def test_box(self):
+        self.assertEqual(
+            render("3 + 5", 8.0),
+            "┌─────────┐\n"
+            "│  3 + 5  │\n"
+            "│         │\n"
+            "│  =      │\n"
+            "│         │\n"
+            "│  8      │\n"
+            "└─────────┘",
+        )
+
+    def test_display_width(self):
+        self.assertEqual(display_width("x + 1"), 5)
+        self.assertEqual(display_width("二 * 三"), 7)
+        self.assertEqual(display_width("e\u0301"), 1)
+
+    def test_wide_characters_stay_aligned(self):
+        widths = {display_width(line) for line in render("二 * 三", 6.0).splitlines()}
+        self.assertEqual(len(widths), 1)
+
+    def test_compact_and_many(self):
+        self.assertEqual(render_compact("1 / 4", 0.25), "1 / 4 = 0.25")
+        pairs = [("1 * 2", 2.0), ("3 - 1", 2.0)]
+        self.assertEqual(render_many(pairs), "\n".join(render(*pair) for pair in pairs))
+        self.assertEqual(render_many(pairs, compact=True), "1 * 2 = 2\n3 - 1 = 2")
+
+
+class TestStreamingCli(unittest.TestCase):
+    LINES = ["1 * 2\n", "\n", "x * 2\n", "2 ** 10\n", "(1 * 4\n"]
+
+    def _stream(self, lines, **kwargs):
+        out = io.StringIO()
+        errors = main.stream(iter(lines), out, **kwargs)
+        return out.getvalue(), errors
+
+    def test_raw_output_keeps_line_alignment(self):
+        text, errors = self._stream(self.LINES)
+        self.assertEqual(text.splitlines()[:4], ["2", "", "error: unbound variable: x", "1024"])
+        self.assertTrue(text.splitlines()[4].startswith("error: unmatched '('"))
+        self.assertEqual(errors, 2)
+
+    def test_box_output(self):
+        text, _ = self._stream(["3 * 3\n"], output_format="box")
+        self.assertIn("│  9", text)
+
+    def test_jobs_preserve_order(self):
+        lines = [f"{i} * 2\n" for i in range(2500)]
+        with mock.patch.object(main, "BATCH_LINES", 100):
+            text, errors = self._stream(lines, jobs=2)
+        self.assertEqual(text.split(), [str(i * 2) for i in range(2500)])
+        self.assertEqual(errors, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
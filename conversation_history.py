@@ -0,0 +1,182 @@
+# conversation_history.py
+import json
+from collections import deque
+
+from token_ledger import TokenLedger
+
+
+def _function_calls(message):
+    return [part.function_call for part in message.parts or [] if part.function_call]
+
+
+def _function_responses(message):
+    return [part for part in message.parts or [] if part.function_response]
+
+
+def _is_user_turn(message):
+    return message.role == "user" and any(part.text for part in message.parts or [])
+
+
+class ConversationHistory:
+    """
+    The messages of one agent run with their token counts, and the
+    compaction applied before each model call.
+
+    compact() keeps the request valid and under budget without dropping what
+    matters most. The first and the latest user turn and the most recent
+    tool exchanges are pinned. Everything else is reduced in stages, and the
+    next stage only runs if the history is still over budget:
+      1. An earlier get_file_content result is replaced by a short marker
+         when the same read was repeated later. This stage always runs.
+      2. Other large tool outputs are cut to a short head plus a note of how
+         much was omitted.
+      3. The oldest unpinned messages are dropped. A function_call is always
+         dropped together with its function_response.
+
+    Args:
+        count_message (callable): Returns the token count of a single message.
+        messages (list): Optional initial messages.
+        keep_tool_exchanges (int): Number of most recent tool exchanges left untouched.
+        digest_chars (int): Characters of a large tool output kept by stage 2.
+            Only outputs longer than twice this are cut.
+        token_counts (list): Already known token counts of messages.
+    """
+
+    def __init__(self, count_message, messages=None, keep_tool_exchanges=2, digest_chars=500, token_counts=None):
+        self.keep_tool_exchanges = keep_tool_exchanges
+        self.digest_chars = digest_chars
+        self._messages = deque(messages or [])
+        self._ledger = TokenLedger(count_message, self._messages, token_counts)
+
+    def __len__(self):
+        return len(self._messages)
+
+    @property
+    def total(self):
+        return self._ledger.total
+
+    def append(self, message):
+        """Adds a message to the end of the history and returns the new token total."""
+        self._messages.append(message)
+        return self._ledger.append(message)
+
+    def as_list(self):
+        return list(self._messages)
+
+    def _units(self):
+        """
+        Splits the history into the spans that can be dropped independently.
+        Each span is a (start, stop, is_tool_exchange) tuple. A model message
+        with function calls and the tool message answering it form one span.
+        """
+        units = []
+        i = 0
+        while i < len(self._messages):
+            if (_function_calls(self._messages[i]) and i + 1 < len(self._messages)
+                    and _function_responses(self._messages[i + 1])):
+                units.append((i, i + 2, True))
+                i += 2
+            else:
+                units.append((i, i + 1, False))
+                i += 1
+        return units
+
+    def _pinned(self, units):
+        user_turns = [i for i, message in enumerate(self._messages) if _is_user_turn(message)]
+        pinned = set(user_turns[:1] + user_turns[-1:])
+        exchanges = [unit for unit in units if unit[2]]
+        recent = exchanges[-self.keep_tool_exchanges:] if self.keep_tool_exchanges > 0 else []
+        for start, stop, _ in recent:
+            pinned.update(range(start, stop))
+        return pinned
+
+    def _replace_responses(self, index, responses):
+        message = self._messages[index]
+        parts = list(message.parts)
+        position = 0
+        for part_index, part in enumerate(parts):
+            if part.function_response:
+                parts[part_index] = part.model_copy(update={
+                    "function_response": part.function_response.model_copy(update={"response": responses[position]}),
+                })
+                position += 1
+        self._messages[index] = message.model_copy(update={"parts": parts})
+        self._ledger.replace(index, self._messages[index])
+
+    def _digest(self, text):
+        omitted = len(text) - self.digest_chars
+        return f"{text[:self.digest_chars]}\n... [compacted: {omitted} more characters omitted]"
+
+    def _collapse_tool_outputs(self, units, pinned, superseded_only):
+        collapsed = 0
+        later_reads = set()
+        for start, stop, is_tool_exchange in reversed(units):
+            if not is_tool_exchange:
+                continue
+            calls = _function_calls(self._messages[start])
+            parts = _function_responses(self._messages[start + 1])
+            responses = [part.function_response.response for part in parts]
+            changed = False
+            for position, call in enumerate(calls[:len(responses)]):
+                response = responses[position] or {}
+                read = None
+                if call.name == "get_file_content":
+                    read = json.dumps(dict(call.args or {}), sort_keys=True, default=str)
+                if start not in pinned:
+                    if read is not None and read in later_reads:
+                        file_path = (call.args or {}).get("file_path")
+                        responses[position] = {"result": f"[compacted: {file_path} was read again later in the conversation]"}
+                        changed = True
+                    elif not superseded_only:
+                        digested = {
+                            key: self._digest(value) if isinstance(value, str) and len(value) > 2 * self.digest_chars else value
+                            for key, value in response.items()
+                        }
+                        if digested != response:
+                            responses[position] = digested
+                            changed = True
+                if read is not None:
+                    later_reads.add(read)
+            if changed:
+                self._replace_responses(start + 1, responses)
+                collapsed += 1
+        return collapsed
+
+    def compact(self, max_tokens):
+        """
+        Shrinks the history towards max_tokens and returns notes describing what was done.
+        """
+        notes = []
+        units = self._units()
+        pinned = self._pinned(units)
+
+        collapsed = self._collapse_tool_outputs(units, pinned, superseded_only=True)
+        if collapsed:
+            notes.append(f"Collapsed {collapsed} superseded file read(s). New token count: {self.total}")
+        if self.total <= max_tokens:
+            return notes
+
+        collapsed = self._collapse_tool_outputs(units, pinned, superseded_only=False)
+        if collapsed:
+            notes.append(f"Digested {collapsed} old tool output(s). New token count: {self.total}")
+
+        dropped = 0
+        for start, stop, _ in units:
+            if self.total <= max_tokens:
+                break
+            if pinned.intersection(range(start, stop)):
+                continue
+            for _ in range(stop - start):
+                index = start - dropped
+                if index == 0:
+                    self._messages.popleft()
+                    self._ledger.popleft()
+                else:
+                    del self._messages[index]
+                    self._ledger.remove(index)
+            dropped += stop - start
+        if dropped:
+            notes.append(f"Dropped {dropped} old message(s). New token count: {self.total}")
+        if self.total > max_tokens:
+            notes.append("Warning: Cannot trim messages further, context window exceeded.")
+        return notes
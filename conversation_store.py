@@ -0,0 +1,158 @@
+# conversation_store.py
+import sqlite3
+import threading
+import time
+import uuid
+
+from google.genai import types
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    turns INTEGER NOT NULL DEFAULT 0,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    messages INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    turn INTEGER NOT NULL,
+    role TEXT,
+    tokens INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS messages_by_turn ON messages (session_id, turn);
+"""
+
+
+def _starts_turn(message):
+    return message.role == "user" and any(part.text for part in message.parts or [])
+
+
+class ConversationStore:
+    """
+    An append-only SQLite store of agent conversations, so a session can be
+    resumed by id after a restart.
+
+    Messages are stored as serialized types.Content, function calls and
+    responses included, next to the token count they were given when they
+    were first appended. Reloading a session therefore never re-tokenizes it.
+    Messages are grouped into turns, each starting at a user text message, and
+    are read back a range of turns at a time (load_turns) or as the newest
+    turns that fit in a token budget (load_recent).
+
+    One connection is shared between threads behind a lock.
+
+    Args:
+        path (str): Database file, or ":memory:".
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def create_session(self, session_id=None):
+        """Starts a new, empty session and returns its id."""
+        session_id = session_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO sessions (session_id, created, updated) VALUES (?, ?, ?)",
+                (session_id, now, now),
+            )
+        return session_id
+
+    def get_session(self, session_id):
+        """Returns the session's summary (created, updated, turns, tokens, messages), or None if it doesn't exist."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT session_id, created, updated, turns, tokens, messages FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        return self._session_dict(row) if row else None
+
+    def sessions(self):
+        """Returns the summaries of every session, most recently updated first."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT session_id, created, updated, turns, tokens, messages FROM sessions ORDER BY updated DESC"
+            ).fetchall()
+        return [self._session_dict(row) for row in rows]
+
+    @staticmethod
+    def _session_dict(row):
+        return dict(zip(("session_id", "created", "updated", "turns", "tokens", "messages"), row))
+
+    def append(self, session_id, messages, token_counts):
+        """
+        Appends messages, with their token counts, to the end of the session
+        in one transaction. The session is created if it doesn't exist yet.
+        """
+        if len(messages) != len(token_counts):
+            raise ValueError("messages and token_counts must have the same length")
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, created, updated) VALUES (?, ?, ?)",
+                (session_id, now, now),
+            )
+            turns, seq = self._connection.execute(
+                "SELECT turns, messages FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            rows = []
+            for message, token_count in zip(messages, token_counts):
+                if _starts_turn(message):
+                    turns += 1
+                rows.append((session_id, seq, max(turns - 1, 0), message.role, token_count, message.model_dump_json(exclude_none=True)))
+                seq += 1
+            self._connection.executemany(
+                "INSERT INTO messages (session_id, seq, turn, role, tokens, content) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self._connection.execute(
+                "UPDATE sessions SET updated = ?, turns = ?, messages = ?, tokens = tokens + ? WHERE session_id = ?",
+                (now, turns, seq, sum(token_counts), session_id),
+            )
+
+    def load_turns(self, session_id, start=0, stop=None):
+        """
+        Returns (messages, token_counts) for turns start up to, not including,
+        stop (the end of the session when None).
+        """
+        query = "SELECT content, tokens FROM messages WHERE session_id = ? AND turn >= ?"
+        params = [session_id, start]
+        if stop is not None:
+            query += " AND turn < ?"
+            params.append(stop)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY seq", params).fetchall()
+        return [types.Content.model_validate_json(content) for content, _ in rows], [tokens for _, tokens in rows]
+
+    def load_recent(self, session_id, max_tokens):
+        """
+        Returns (messages, token_counts) for the newest whole turns whose
+        cached token counts add up to at most max_tokens, and always at least
+        the last turn. Only those turns are read and deserialized.
+        """
+        with self._lock:
+            turn_tokens = self._connection.execute(
+                "SELECT turn, SUM(tokens) FROM messages WHERE session_id = ? GROUP BY turn ORDER BY turn DESC",
+                (session_id,),
+            ).fetchall()
+        if not turn_tokens:
+            return [], []
+        start, total = turn_tokens[0][0], turn_tokens[0][1]
+        for turn, tokens in turn_tokens[1:]:
+            if total + tokens > max_tokens:
+                break
+            start, total = turn, total + tokens
+        return self.load_turns(session_id, start)
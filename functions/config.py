@@ -1 +1,37 @@
-MAX_FILE_READ_CHARS = 10000
\ No newline at end of file
+import os
+
+MAX_FILE_READ_CHARS = 10000
+
+# Opt-in pool of warm interpreters for run_python_file (see functions/interpreter_pool.py)
+USE_INTERPRETER_POOL = False
+INTERPRETER_POOL_SIZE = 2
+INTERPRETER_POOL_MAX_RUNS = 50
+
+# Files at least this large are memory-mapped when paging through them with get_file_content
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+
+# Directory listings are cached per directory and reused while its mtime is unchanged
+CACHE_DIRECTORY_LISTINGS = True
+LISTING_CACHE_MAX_DIRS = 4096
+MAX_LISTING_ENTRIES = 1000
+
+# Limits on scripts started by run_python_file
+RUN_PYTHON_TIMEOUT = 30 # Seconds of wall-clock time before the script is killed
+RUN_PYTHON_CPU_SECONDS = 60 # RLIMIT_CPU; None leaves a limit unset
+RUN_PYTHON_MEMORY_BYTES = 1024 * 1024 * 1024 # RLIMIT_AS
+RUN_PYTHON_MAX_OPEN_FILES = 256 # RLIMIT_NOFILE
+# Only this much of the start and end of stdout and stderr is kept; the rest is counted
+RUN_PYTHON_OUTPUT_HEAD_BYTES = 4096
+RUN_PYTHON_OUTPUT_TAIL_BYTES = 4096
+
+# search_files keeps a trigram index per working directory, saved here (None keeps it in memory only)
+SEARCH_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".simpleai", "search_index")
+SEARCH_INDEX_RECHECK_SECONDS = 10 # How often a search re-checks file mtimes for edits made outside the tools
+SEARCH_INDEX_SAVE_DELAY = 5 # Seconds after a change before the index is written, in the background
+SEARCH_MAX_FILE_BYTES = 1024 * 1024 # Larger files aren't indexed or searched
+SEARCH_SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv", ".mypy_cache", ".pytest_cache"}
+SEARCH_MAX_RESULTS = 50
+
+# get_python_outline and get_symbol_source parse files in a process pool once this many need parsing
+OUTLINE_PARALLEL_THRESHOLD = 200
+OUTLINE_WORKERS = None # Defaults to the number of CPUs; with one, files are parsed in this process
@@ -1,32 +1,149 @@
+import codecs
+import fnmatch
+import mmap
 import os
+import re
+import tempfile
+import threading
+import tokenize
 from functions import config
+from functions.python_outline import close_matches, get_symbols, python_files
+from functions.search_index import get_search_index, notify_file_changed
 from google.genai import types
 
-def get_files_info(working_directory, directory="."):
+# Directory listings keyed by absolute path, reused while the directory's mtime is
+# unchanged. Adding or removing entries bumps the mtime; rewriting a file doesn't,
+# so write_file and run_python_file invalidate it explicitly.
+_listing_cache = {}
+_listing_cache_lock = threading.Lock()
+
+def invalidate_listing_cache(directory=None):
+    """
+    Drops the cached listing of one absolute directory path, or of every directory when none is given.
+    """
+    with _listing_cache_lock:
+        if directory is None:
+            _listing_cache.clear()
+        else:
+            _listing_cache.pop(os.path.abspath(directory), None)
+
+def _scan_directory(path):
+    """
+    Returns a sorted list of (name, file_size, is_dir, is_symlink) for a directory,
+    using the stat data os.scandir already has instead of stat-ing each entry again.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    if config.CACHE_DIRECTORY_LISTINGS:
+        with _listing_cache_lock:
+            cached = _listing_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                file_size = entry.stat().st_size
+            except OSError:
+                file_size = 0 # e.g. a dangling symlink
+            entries.append((entry.name, file_size, entry.is_dir(), entry.is_symlink()))
+    entries.sort()
+
+    if config.CACHE_DIRECTORY_LISTINGS:
+        with _listing_cache_lock:
+            if len(_listing_cache) >= config.LISTING_CACHE_MAX_DIRS:
+                _listing_cache.pop(next(iter(_listing_cache)))
+            _listing_cache[path] = (mtime, entries)
+    return entries
+
+def _walk(target_dir, max_depth):
+    """
+    Yields (relative_path, file_size, is_dir) for everything under target_dir,
+    descending at most max_depth levels (None for no limit). Symlinked
+    directories are listed but not followed.
+    """
+    stack = [(target_dir, "", 1)]
+    while stack:
+        path, prefix, depth = stack.pop()
+        subdirs = []
+        for name, file_size, is_dir, is_symlink in _scan_directory(path):
+            relative_path = prefix + name
+            yield relative_path, file_size, is_dir
+            if is_dir and not is_symlink and (max_depth is None or depth < max_depth):
+                subdirs.append((os.path.join(path, name), relative_path + "/", depth + 1))
+        stack.extend(reversed(subdirs))
+
+def get_files_info(working_directory, directory=".", recursive=False, max_depth=None, pattern=None):
     abs_working_dir = os.path.abspath(working_directory)
     target_dir = os.path.abspath(os.path.join(working_directory, directory))
     if not target_dir.startswith(abs_working_dir):
         return f'Error: Cannot list "{directory}" as it is outside the permitted working directory'
     if not os.path.isdir(target_dir):
         return f'Error: "{directory}" is not a directory'
+
+    if max_depth is not None:
+        max_depth = int(max_depth)
+        if max_depth < 1:
+            return 'Error: max_depth must be at least 1'
+    elif not recursive:
+        max_depth = 1
+
     try:
         files_info = []
-        for filename in os.listdir(target_dir):
-            filepath = os.path.join(target_dir, filename)
-            file_size = 0
-            is_dir = os.path.isdir(filepath)
-            file_size = os.path.getsize(filepath)
+        for relative_path, file_size, is_dir in _walk(target_dir, max_depth):
+            # Patterns with a slash match the whole relative path, others just the name
+            subject = relative_path if pattern and "/" in pattern else os.path.basename(relative_path)
+            if pattern and not fnmatch.fnmatch(subject, pattern):
+                continue
+            if len(files_info) == config.MAX_LISTING_ENTRIES:
+                files_info.append(f"[...Listing truncated at {config.MAX_LISTING_ENTRIES} entries]")
+                break
             files_info.append(
-                f"- {filename}: file_size={file_size} bytes, is_dir={is_dir}"
+                f"- {relative_path}: file_size={file_size} bytes, is_dir={is_dir}"
             )
         return "\n".join(files_info)
     except Exception as e:
         return f"Error listing files: {e}"
     
-def get_file_content(working_directory, file_path):
+def _read_text_window(f, file_size, offset, max_chars):
+    """
+    Decodes at most max_chars characters of UTF-8 text starting at byte offset,
+    touching only the bytes needed for them. Large files are memory-mapped so
+    paging deep into them doesn't read everything before the offset.
+
+    Returns:
+        tuple: (text, next_offset), where next_offset is None once the end of the file is reached.
+    """
+    # A UTF-8 character is at most 4 bytes; one spare character tells us whether there is more.
+    window_size = (max_chars + 2) * 4
+    if file_size >= config.MMAP_THRESHOLD_BYTES:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            raw = mm[offset:offset + window_size]
+    else:
+        f.seek(offset)
+        raw = f.read(window_size)
+
+    # Don't start in the middle of a multi-byte character.
+    skipped = 0
+    while skipped < len(raw) and raw[skipped] & 0xC0 == 0x80:
+        skipped += 1
+    raw = raw[skipped:]
+    offset += skipped
+
+    at_eof = offset + len(raw) >= file_size
+    text = codecs.getincrementaldecoder("utf-8")().decode(raw, final=at_eof)
+    if len(text) <= max_chars and at_eof:
+        return text, None
+    text = text[:max_chars]
+    return text, offset + len(text.encode("utf-8"))
+
+def get_file_content(working_directory, file_path, offset=0, length=None):
     """
     Reads the content of a file located within the specified working directory,
     with security checks and basic error handling.
+
+    At most config.MAX_FILE_READ_CHARS characters are read per call; `offset`
+    (in bytes) and `length` (in characters) page through larger files.
     """
     abs_working_dir = os.path.abspath(working_directory)
     full_file_path = os.path.abspath(os.path.join(working_directory, file_path))
@@ -39,17 +156,28 @@ def get_file_content(working_directory, file_path):
     if not os.path.isfile(full_file_path):
         return f'Error: File not found or is not a regular file: "{file_path}"'
 
-    content = ""
+    offset = int(offset or 0)
+    max_chars = config.MAX_FILE_READ_CHARS
+    if length is not None:
+        max_chars = min(int(length), max_chars)
+    if offset < 0 or max_chars < 0:
+        return 'Error: offset and length must not be negative'
+
     try:
-        with open(full_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        with open(full_file_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if offset > file_size:
+                return f'Error: offset {offset} is beyond the end of "{file_path}" ({file_size} bytes)'
+            content, next_offset = _read_text_window(f, file_size, offset, max_chars)
 
-        # Truncate if content is longer than the defined limit
-        if len(content) > config.MAX_FILE_READ_CHARS:
-            content = content[:config.MAX_FILE_READ_CHARS] + \
-                      f'[...File "{file_path}" truncated at {config.MAX_FILE_READ_CHARS} characters]'
+        # Match text-mode reads, which translate Windows and old Mac line endings
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+
+        # Note where the content was cut so the model can page on from there
+        if next_offset is not None:
+            content += f'[...File "{file_path}" truncated at {max_chars} characters; read on with offset={next_offset}]'
         return content
-    
+
     except FileNotFoundError:
         # This case should be largely prevented by the os.path.isfile check above,
         # but included for extreme robustness (e.g., file deleted between checks).
@@ -81,9 +209,8 @@ def write_file(working_directory, file_path, content):
         # preventing FileExistsError.
         os.makedirs(os.path.dirname(abs_file_path), exist_ok=True)
     
-        # 3. Overwrite the contents of the file
-        with open(abs_file_path, 'w') as f:
-            f.write(content)
+        # 3. Overwrite the contents of the file, atomically so readers never see a partial write
+        _atomic_write(abs_file_path, content)
     
         return f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
     
@@ -94,9 +221,341 @@ def write_file(working_directory, file_path, content):
             # Catch any other unexpected errors
         return f"Error: An unexpected error occurred while writing to \"{file_path}\": {e}"
 
+# Permissions given to newly created files, as open() would under the current umask.
+# Reading the umask means briefly setting it, so it is read once, under a lock.
+_new_file_mode = None
+_new_file_mode_lock = threading.Lock()
+
+def _get_new_file_mode():
+    global _new_file_mode
+    with _new_file_mode_lock:
+        if _new_file_mode is None:
+            umask = os.umask(0o077)
+            os.umask(umask)
+            _new_file_mode = 0o666 & ~umask
+        return _new_file_mode
+
+def _atomic_write(abs_file_path, content, encoding=None, newline=None):
+    """
+    Writes content to a temporary file next to abs_file_path and moves it into
+    place with os.replace, so concurrent readers see either the old or the new
+    file and never a half-written one.
+    """
+    directory = os.path.dirname(abs_file_path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(abs_file_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline=newline) as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            mode = os.stat(abs_file_path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = _get_new_file_mode()
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, abs_file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    invalidate_listing_cache(directory)
+    notify_file_changed(abs_file_path)
+
+class PatchError(Exception):
+    """Raised when a patch is malformed or doesn't match the file it is applied to."""
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+def _parse_unified_diff(patch):
+    """
+    Parses unified-diff hunks into (old_start, old_lines, new_lines) tuples.
+    File headers (---/+++) and other lines outside hunks are ignored.
+    """
+    hunks = []
+    current = None
+    for line in patch.splitlines():
+        header = _HUNK_HEADER.match(line)
+        if header:
+            current = (int(header.group(1)), [], [])
+            hunks.append(current)
+        elif current is None or line.startswith("\\"):
+            continue # Preamble, or "\ No newline at end of file"
+        elif line.startswith("-"):
+            current[1].append(line[1:])
+        elif line.startswith("+"):
+            current[2].append(line[1:])
+        else:
+            # Context line; some tools drop the leading space on blank lines
+            text = line[1:] if line.startswith(" ") else line
+            current[1].append(text)
+            current[2].append(text)
+    if not hunks:
+        raise PatchError("no hunks found; expected unified diff '@@' hunks or SEARCH/REPLACE blocks")
+    return hunks
+
+def _find_block(lines, block, expected, start):
+    """
+    Returns the index at or after start where block occurs in lines, preferring
+    the occurrence closest to the expected index. Falls back to ignoring
+    trailing whitespace when there is no exact match.
+    """
+    if not block:
+        # Insert before the empty string split() leaves after a final newline
+        end = len(lines) - 1 if lines and lines[-1] == "" else len(lines)
+        return max(start, min(expected, end))
+    for normalize in (lambda line: line, str.rstrip):
+        wanted = [normalize(line) for line in block]
+        first = wanted[0]
+        matches = [
+            i for i in range(start, len(lines) - len(block) + 1)
+            if normalize(lines[i]) == first and [normalize(line) for line in lines[i:i + len(block)]] == wanted
+        ]
+        if matches:
+            return min(matches, key=lambda i: abs(i - expected))
+    return None
+
+def _apply_unified_diff(content, patch):
+    lines = content.split("\n")
+    offset = 0 # How far earlier hunks have shifted line numbers
+    start = 0
+    hunks = _parse_unified_diff(patch)
+    for number, (old_start, old_lines, new_lines) in enumerate(hunks, 1):
+        # A pure insertion's old start is the line it goes after, not the first line replaced
+        expected = (old_start if not old_lines else max(old_start - 1, 0)) + offset
+        index = _find_block(lines, old_lines, expected, start)
+        if index is None:
+            raise PatchError(f"hunk {number} (@@ -{old_start}) does not match the file")
+        lines[index:index + len(old_lines)] = new_lines
+        offset += len(new_lines) - len(old_lines)
+        start = index + len(new_lines)
+    return "\n".join(lines), len(hunks)
+
+_SEARCH_REPLACE_BLOCK = re.compile(
+    r"^<{7} SEARCH\n(.*?)^={7}\n(.*?)^>{7} REPLACE$", re.DOTALL | re.MULTILINE
+)
+
+def _apply_search_replace(content, patch):
+    blocks = _SEARCH_REPLACE_BLOCK.findall(patch.replace("\r\n", "\n"))
+    if not blocks:
+        raise PatchError("no SEARCH/REPLACE blocks found; expected '<<<<<<< SEARCH', '=======' and '>>>>>>> REPLACE' lines")
+    for number, (search, replace) in enumerate(blocks, 1):
+        occurrences = content.count(search)
+        if occurrences != 1:
+            found = "not found" if occurrences == 0 else f"found {occurrences} times"
+            raise PatchError(f"SEARCH block {number} must match exactly once but was {found}")
+        content = content.replace(search, replace, 1)
+    return content, len(blocks)
+
+def apply_patch(working_directory, file_path, patch):
+    """
+    Edits an existing file in place from unified-diff hunks or SEARCH/REPLACE
+    blocks, so only the changed lines need to be sent instead of the whole file.
+    The result is written atomically and keeps the file's line endings.
+    """
+    abs_working_dir = os.path.abspath(working_directory)
+    abs_file_path = os.path.abspath(os.path.join(abs_working_dir, file_path))
+    if not abs_file_path.startswith(abs_working_dir):
+        return f'Error: Cannot patch "{file_path}" as it is outside the permitted working directory'
+    if not os.path.isfile(abs_file_path):
+        return f'Error: File not found or is not a regular file: "{file_path}"'
+
+    try:
+        with open(abs_file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+            newline = f.newlines if isinstance(f.newlines, str) else None
+
+        if "<<<<<<< SEARCH" in patch:
+            content, applied = _apply_search_replace(content, patch)
+        else:
+            content, applied = _apply_unified_diff(content, patch)
+
+        _atomic_write(abs_file_path, content, encoding='utf-8', newline=newline)
+        return f'Successfully patched "{file_path}" ({applied} hunks applied, {len(content)} characters now in file)'
+
+    except PatchError as e:
+        return f'Error: Could not apply patch to "{file_path}": {e}'
+    except UnicodeDecodeError:
+        return f"Error: Could not decode file '{file_path}'. It might not be a text file or uses an unsupported encoding."
+    except OSError as e:
+        return f"Error: An OS error occurred while patching \"{file_path}\": {e}"
+
+def _format_matches(relative_path, text, matches, context, budget):
+    """
+    Formats matches grep-style: "path:line: text" for matching lines and
+    "path-line- text" for context lines, with "--" between separate groups.
+    Returns (lines, matches_shown), stopping after budget matches.
+    """
+    # Split on "\n" only, as the line numbers below are counted; splitlines()
+    # would also split on form feeds, lone "\r" and other separators
+    lines = [line[:-1] if line.endswith("\r") else line for line in text.split("\n")]
+    if lines[-1] == "":
+        lines.pop()
+    match_lines = []
+    line_number, position = 1, 0
+    for match in matches[:budget]:
+        line_number += text.count("\n", position, match.start())
+        position = match.start()
+        if not match_lines or match_lines[-1] != line_number:
+            match_lines.append(line_number)
+
+    output = []
+    last_shown = 0
+    wanted = set(match_lines)
+    for line_number in match_lines:
+        first = max(line_number - context, last_shown + 1)
+        if output and first > last_shown + 1:
+            output.append("--")
+        for shown in range(first, min(line_number + context, len(lines)) + 1):
+            if shown <= last_shown:
+                continue
+            separator = ":" if shown in wanted else "-"
+            output.append(f"{relative_path}{separator}{shown}{separator} {lines[shown - 1]}")
+            last_shown = shown
+    return output, min(len(matches), budget)
+
+def search_files(working_directory, query, regex=False, case_sensitive=True, directory=".", pattern=None, context=2, max_results=None):
+    """
+    Searches the text files under the working directory for a literal string
+    or a regular expression and returns file:line matches with context.
+
+    Files are found through a trigram index of the working directory (see
+    functions/search_index.py), so only files that can contain the query are
+    read. The index follows file mtimes and is updated straight away by
+    write_file and apply_patch.
+    """
+    abs_working_dir = os.path.abspath(working_directory)
+    target_dir = os.path.abspath(os.path.join(working_directory, directory))
+    if not target_dir.startswith(abs_working_dir):
+        return f'Error: Cannot search "{directory}" as it is outside the permitted working directory'
+    if not os.path.isdir(target_dir):
+        return f'Error: "{directory}" is not a directory'
+    if not query:
+        return 'Error: query must not be empty'
+
+    context = max(int(context or 0), 0)
+    max_results = min(int(max_results or config.SEARCH_MAX_RESULTS), config.SEARCH_MAX_RESULTS)
+    prefix = os.path.relpath(target_dir, abs_working_dir).replace(os.sep, "/") + "/"
+    if prefix == "./":
+        prefix = ""
+
+    def include(relative_path):
+        if not relative_path.startswith(prefix):
+            return False
+        if not pattern:
+            return True
+        subject = relative_path[len(prefix):] if "/" in pattern else relative_path.rsplit("/", 1)[-1]
+        return fnmatch.fnmatch(subject, pattern)
+
+    try:
+        results = get_search_index(abs_working_dir).search(query, bool(regex), bool(case_sensitive), include)
+        output, found, chars = [], 0, 0
+        for relative_path, text, matches in results:
+            lines, shown = _format_matches(relative_path, text, matches, context, max_results - found)
+            found += shown
+            chars += sum(len(line) + 1 for line in lines)
+            if output:
+                output.append("--")
+            output.extend(lines)
+            if found >= max_results or chars >= config.MAX_FILE_READ_CHARS:
+                output.append(f"[...Search stopped after {found} matches; narrow it with directory or pattern]")
+                break
+        if not output:
+            return f'No matches found for "{query}".'
+        return "\n".join(output)
+    except re.error as e:
+        return f"Error: Invalid regular expression: {e}"
+    except Exception as e:
+        return f"Error searching files: {e}"
+
+def _relative(abs_working_dir, abs_path):
+    return os.path.relpath(abs_path, abs_working_dir).replace(os.sep, "/")
+
+def get_python_outline(working_directory, file_path="."):
+    """
+    Lists the classes, functions and methods of a Python file, or of every
+    Python file under a directory, with their signatures and line ranges,
+    without returning their bodies.
+    """
+    abs_working_dir = os.path.abspath(working_directory)
+    target = os.path.abspath(os.path.join(working_directory, file_path))
+    if not target.startswith(abs_working_dir):
+        return f'Error: Cannot outline "{file_path}" as it is outside the permitted working directory'
+    if os.path.isdir(target):
+        paths = list(python_files(target))
+    elif os.path.isfile(target) and target.endswith(".py"):
+        paths = [target]
+    else:
+        return f'Error: "{file_path}" is not a Python file or a directory'
+
+    try:
+        symbols_by_path = get_symbols(paths)
+        output, chars = [], 0
+        for abs_path in paths:
+            symbols = symbols_by_path[abs_path]
+            lines = [_relative(abs_working_dir, abs_path)]
+            if isinstance(symbols, str):
+                lines.append(f"  {symbols}")
+            for _, signature, start, end, depth in symbols if not isinstance(symbols, str) else []:
+                lines.append(f"{'  ' * (depth + 1)}{signature}  [lines {start}-{end}]")
+            chars += sum(len(line) + 1 for line in lines)
+            if chars > config.MAX_FILE_READ_CHARS and output:
+                output.append(f"[...Outline truncated; {len(paths) - len(output)} more files. Outline a subdirectory or a single file]")
+                break
+            output.append("\n".join(lines))
+        return "\n".join(output) if output else f'No Python files found in "{file_path}".'
+    except Exception as e:
+        return f"Error outlining \"{file_path}\": {e}"
+
+def get_symbol_source(working_directory, symbol, file_path=None):
+    """
+    Returns the source of one class, function or method, named by its
+    qualified name (e.g. "Calculator.evaluate") or just its own name. Without
+    file_path every Python file in the working directory is looked at.
+    """
+    abs_working_dir = os.path.abspath(working_directory)
+    target = os.path.abspath(os.path.join(working_directory, file_path or "."))
+    if not target.startswith(abs_working_dir):
+        return f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
+    if file_path and not (os.path.isfile(target) and target.endswith(".py")):
+        return f'Error: "{file_path}" is not a Python file'
+
+    try:
+        paths = [target] if file_path else list(python_files(abs_working_dir))
+        symbols_by_path = get_symbols(paths)
+        everything, found = [], []
+        for abs_path in paths:
+            symbols = symbols_by_path[abs_path]
+            if isinstance(symbols, str):
+                continue
+            everything.extend(symbols)
+            exact = [entry for entry in symbols if entry[0] == symbol]
+            found += [(abs_path, entry) for entry in exact or [entry for entry in symbols if entry[0].endswith("." + symbol)]]
+
+        if not found:
+            hint = close_matches(symbol, everything)
+            suffix = f" Did you mean: {', '.join(hint)}?" if hint else ""
+            return f'Error: No class or function named "{symbol}" found.{suffix}'
+        if len(found) > 1:
+            places = [f"- {name} in {_relative(abs_working_dir, abs_path)} [lines {start}-{end}]" for abs_path, (name, _, start, end, _) in found]
+            return f'"{symbol}" matches {len(found)} definitions; pass file_path or a qualified name:\n' + "\n".join(places)
+
+        abs_path, (name, _, start, end, _) = found[0]
+        with tokenize.open(abs_path) as f: # Decodes as Python does, honoring a BOM or coding declaration
+            source = "".join(f.readlines()[start - 1:end])
+        header = f"{_relative(abs_working_dir, abs_path)} lines {start}-{end} ({name}):\n"
+        if len(source) > config.MAX_FILE_READ_CHARS:
+            members = [entry[0] for entry in everything if entry[0].startswith(name + ".")][:20]
+            more = f" Members: {', '.join(members)}" if members else ""
+            source = source[:config.MAX_FILE_READ_CHARS] + f"[...Symbol truncated at {config.MAX_FILE_READ_CHARS} characters.{more}]"
+        return header + source
+    except Exception as e:
+        return f'Error reading symbol "{symbol}": {e}'
+
 schema_get_files_info = types.FunctionDeclaration(
     name="get_files_info",
-    description="Lists files in the specified directory along with their sizes, constrained to the working directory.",
+    description="Lists files in the specified directory along with their sizes, optionally recursively and filtered by a glob pattern, constrained to the working directory.",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
@@ -104,6 +563,18 @@ schema_get_files_info = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
             ),
+            "recursive": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Optional: Also list the contents of subdirectories, with paths relative to the listed directory. Defaults to false.",
+            ),
+            "max_depth": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional: How many directory levels to list, where 1 is just the directory itself. Implies a recursive listing.",
+            ),
+            "pattern": types.Schema(
+                type=types.Type.STRING,
+                description="Optional: Glob pattern such as '*.py' that listed names must match. Patterns containing '/' match the relative path instead.",
+            ),
         },
     ),
 )
@@ -119,6 +590,14 @@ schema_get_file_content = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="The path to the file to read, relative to the working directory. Must be a regular file.",
             ),
+            "offset": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional: Byte offset to start reading from. Use the offset given in a truncation notice to read the next page of a large file. Defaults to 0.",
+            ),
+            "length": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional: Maximum number of characters to return, capped at the per-read limit.",
+            ),
         },
         required=["file_path"],
     ),
@@ -163,4 +642,99 @@ schema_write_file = types.FunctionDeclaration(
         },
         required=["file_path", "content"],
     ),
-)
\ No newline at end of file
+)
+
+# --- Schema for apply_patch ---
+schema_apply_patch = types.FunctionDeclaration(
+    name="apply_patch",
+    description="Edits an existing file within the working directory by applying a patch, without resending the whole file. Accepts unified-diff hunks ('@@ -12,3 +12,4 @@' followed by ' ', '-' and '+' lines) or one or more SEARCH/REPLACE blocks ('<<<<<<< SEARCH', the exact text to find, '=======', the replacement, '>>>>>>> REPLACE'). Each SEARCH text must occur exactly once. Prefer this over write_file for small changes.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file_path": types.Schema(
+                type=types.Type.STRING,
+                description="The path to the file to edit, relative to the working directory.",
+            ),
+            "patch": types.Schema(
+                type=types.Type.STRING,
+                description="Unified-diff hunks or SEARCH/REPLACE blocks describing the change.",
+            ),
+        },
+        required=["file_path", "patch"],
+    ),
+)
+
+# --- Schema for search_files ---
+schema_search_files = types.FunctionDeclaration(
+    name="search_files",
+    description="Searches the contents of text files in the working directory for a literal string or a regular expression, using an index, and returns matching lines as 'path:line: text' with a few lines of context. Use this to find where something is defined or used instead of reading files one by one.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "query": types.Schema(
+                type=types.Type.STRING,
+                description="The text to find, or a Python regular expression when regex is true.",
+            ),
+            "regex": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Optional: Treat query as a regular expression. Defaults to false.",
+            ),
+            "case_sensitive": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Optional: Match case exactly. Defaults to true.",
+            ),
+            "directory": types.Schema(
+                type=types.Type.STRING,
+                description="Optional: Only search under this directory, relative to the working directory.",
+            ),
+            "pattern": types.Schema(
+                type=types.Type.STRING,
+                description="Optional: Glob pattern such as '*.py' that file names must match. Patterns containing '/' match the path relative to directory.",
+            ),
+            "context": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional: Lines of context shown around each match. Defaults to 2.",
+            ),
+            "max_results": types.Schema(
+                type=types.Type.INTEGER,
+                description="Optional: Maximum number of matches returned.",
+            ),
+        },
+        required=["query"],
+    ),
+)
+
+# --- Schema for get_python_outline ---
+schema_get_python_outline = types.FunctionDeclaration(
+    name="get_python_outline",
+    description="Lists the classes, functions and methods defined in a Python file, or in every Python file under a directory, with their signatures and line ranges but not their bodies. Use this to find your way around code before fetching single definitions with get_symbol_source.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file_path": types.Schema(
+                type=types.Type.STRING,
+                description="Optional: A .py file or a directory, relative to the working directory. Defaults to the whole working directory.",
+            ),
+        },
+    ),
+)
+
+# --- Schema for get_symbol_source ---
+schema_get_symbol_source = types.FunctionDeclaration(
+    name="get_symbol_source",
+    description="Returns the source code of a single Python class, function or method, with its file and line range, instead of the whole file.",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "symbol": types.Schema(
+                type=types.Type.STRING,
+                description="Qualified name such as 'Calculator.evaluate', or just the name of the class or function.",
+            ),
+            "file_path": types.Schema(
+                type=types.Type.STRING,
+                description="Optional: The .py file defining the symbol, relative to the working directory. If omitted, every Python file is looked at.",
+            ),
+        },
+        required=["symbol"],
+    ),
+)
@@ -0,0 +1,166 @@
+# functions/interpreter_pool.py
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+
+from functions.output_capture import HeadTailBuffer
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+
+class WorkerCrashed(Exception):
+    """Raised when a worker dies without answering, e.g. a script called os._exit()."""
+
+    def __init__(self, returncode):
+        super().__init__(f"worker exited with code {returncode}")
+        self.returncode = returncode
+
+
+class _Worker:
+    def __init__(self, working_directory, preload):
+        self.runs = 0
+        self.ready = False
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT] + list(preload),
+            cwd=working_directory,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        )
+        # A reader thread lets replies be awaited with a timeout on every platform.
+        self.replies = queue.Queue()
+        threading.Thread(target=self._read_replies, daemon=True).start()
+
+    def _read_replies(self):
+        for line in self.process.stdout:
+            self.replies.put(json.loads(line))
+        self.replies.put(None)
+
+    def wait_ready(self, timeout):
+        if self.ready:
+            return
+        try:
+            reply = self.replies.get(timeout=timeout)
+        except queue.Empty:
+            raise subprocess.TimeoutExpired(WORKER_SCRIPT, timeout)
+        if reply is None:
+            raise WorkerCrashed(self.process.wait())
+        self.ready = True
+
+    def run(self, request, timeout):
+        self.runs += 1
+        self.process.stdin.write(json.dumps(request) + "\n")
+        self.process.stdin.flush()
+        try:
+            reply = self.replies.get(timeout=timeout)
+        except queue.Empty:
+            raise subprocess.TimeoutExpired(request["path"], timeout)
+        if reply is None:
+            raise WorkerCrashed(self.process.wait())
+        return reply["returncode"]
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+class InterpreterPool:
+    """
+    A pool of pre-started Python interpreters that run scripts inside one working directory.
+
+    Each run behaves like `python script.py args...` started in the working
+    directory: argv, sys.path[0] and cwd are set for the script, its stdout and
+    stderr are captured at the file descriptor level, and modules it imported
+    are dropped afterwards so edited files are picked up on the next run.
+    Workers are replaced after `max_runs` scripts, after a crash, or after a timeout.
+
+    Args:
+        working_directory (str): Directory the workers run in.
+        size (int): Number of workers kept warm.
+        max_runs (int): Scripts a worker runs before it is recycled.
+        preload (list): Module names imported once at worker start-up.
+    """
+
+    def __init__(self, working_directory, size=2, max_runs=50, preload=("unittest",)):
+        self.working_directory = os.path.abspath(working_directory)
+        self.max_runs = max_runs
+        self.preload = tuple(preload)
+        self._idle = queue.Queue()
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self):
+        return _Worker(self.working_directory, self.preload)
+
+    def run(self, script_path, args=(), timeout=30, head_bytes=None, tail_bytes=0):
+        """
+        Runs a script on a warm worker.
+
+        Returns:
+            tuple: (stdout, stderr, returncode), like a finished subprocess.
+            When head_bytes is given, stdout and stderr are HeadTailBuffers
+            holding only their first head_bytes and last tail_bytes.
+
+        Raises:
+            subprocess.TimeoutExpired: If the script runs longer than `timeout` seconds.
+        """
+        if self._closed:
+            raise RuntimeError("interpreter pool is closed")
+
+        worker = self._idle.get()
+        stdout_file = tempfile.NamedTemporaryFile(prefix="pool-stdout-", delete=False)
+        stderr_file = tempfile.NamedTemporaryFile(prefix="pool-stderr-", delete=False)
+        stdout_file.close()
+        stderr_file.close()
+        keep_worker = False
+        try:
+            worker.wait_ready(timeout)
+            request = {
+                "path": os.path.abspath(script_path),
+                "args": [str(arg) for arg in args],
+                "cwd": self.working_directory,
+                "stdout": stdout_file.name,
+                "stderr": stderr_file.name,
+            }
+            try:
+                returncode = worker.run(request, timeout)
+                keep_worker = worker.runs < self.max_runs
+            except WorkerCrashed as e:
+                returncode = e.returncode
+            if head_bytes is not None:
+                return (
+                    HeadTailBuffer.from_file(stdout_file.name, head_bytes, tail_bytes),
+                    HeadTailBuffer.from_file(stderr_file.name, head_bytes, tail_bytes),
+                    returncode,
+                )
+            # Read as text the same way subprocess.run(text=True) would decode it.
+            with open(stdout_file.name, "r") as f:
+                stdout = f.read()
+            with open(stderr_file.name, "r") as f:
+                stderr = f.read()
+            return stdout, stderr, returncode
+        finally:
+            os.unlink(stdout_file.name)
+            os.unlink(stderr_file.name)
+            if keep_worker:
+                self._idle.put(worker)
+            else:
+                worker.kill()
+                if not self._closed:
+                    self._idle.put(self._start_worker())
+
+    def close(self):
+        """Stops all idle workers."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
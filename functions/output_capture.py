@@ -0,0 +1,56 @@
+# functions/output_capture.py
+import os
+
+
+class HeadTailBuffer:
+    """
+    Keeps the first head_bytes and the last tail_bytes written to it, and
+    counts everything, so capturing a process's output takes constant memory
+    however much it prints.
+
+    Args:
+        head_bytes (int): Bytes kept from the start of the output.
+        tail_bytes (int): Bytes kept from the end of the output.
+    """
+
+    def __init__(self, head_bytes, tail_bytes):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    @classmethod
+    def from_file(cls, path, head_bytes, tail_bytes):
+        """Reads only the head and tail of a file."""
+        buffer = cls(head_bytes, tail_bytes)
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            buffer.write(f.read(head_bytes))
+            f.seek(max(head_bytes, size - tail_bytes))
+            buffer.write(f.read())
+        buffer.total_bytes = size
+        return buffer
+
+    @property
+    def omitted_bytes(self):
+        return self.total_bytes - len(self.head) - len(self.tail)
+
+    def write(self, data):
+        self.total_bytes += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data and self.tail_bytes > 0:
+            self.tail += data
+            if len(self.tail) > self.tail_bytes:
+                del self.tail[:len(self.tail) - self.tail_bytes]
+
+    def text(self):
+        """The kept output as text, with a marker where bytes were left out."""
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if self.omitted_bytes:
+            head += f"\n... [{self.omitted_bytes} bytes omitted] ...\n"
+        return (head + tail).replace("\r\n", "\n")
@@ -0,0 +1,157 @@
+# functions/python_outline.py
+import ast
+import difflib
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functions import config
+
+# Parsed symbols by absolute path: (stat key, content hash, symbols or error message)
+_outline_cache = {}
+_outline_cache_lock = threading.Lock()
+
+# Worker processes for parsing many files at once, shared by every call
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _signature(node):
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases] + [ast.unparse(keyword) for keyword in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _collect(body, prefix, depth, symbols):
+    # Classes and functions at module level and inside classes; a function's own helpers are left out
+    for node in body:
+        if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        qualified_name = prefix + node.name
+        symbols.append((qualified_name, _signature(node), start, node.end_lineno, depth))
+        if isinstance(node, ast.ClassDef):
+            _collect(node.body, qualified_name + ".", depth + 1, symbols)
+
+
+def parse_symbols(source):
+    """
+    Returns the classes and functions defined in Python source as
+    (qualified_name, signature, first_line, last_line, depth) tuples in
+    source order. Line ranges include decorators.
+    """
+    symbols = []
+    _collect(ast.parse(source).body, "", 0, symbols)
+    return symbols
+
+
+def _parse_file(data):
+    # Runs in worker processes too, so it takes and returns plain data. The
+    # bytes go to ast.parse as they are so a BOM or coding declaration is honored
+    try:
+        return parse_symbols(data)
+    except (SyntaxError, ValueError, UnicodeDecodeError) as e:
+        return f"Could not parse: {e}"
+
+
+def worker_count():
+    """Processes used to parse many files at once: config.OUTLINE_WORKERS, or the CPU count."""
+    return config.OUTLINE_WORKERS or os.cpu_count() or 1
+
+
+def _get_pool():
+    # Started on first use. Tools run on many threads, and forking a
+    # multithreaded process can deadlock the child, so workers come from a
+    # fork server, or are spawned where there is none.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=worker_count(), mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _parse_all(datas):
+    global _pool
+    # With a single worker the pool only adds pickling and process start-up
+    if len(datas) < config.OUTLINE_PARALLEL_THRESHOLD or worker_count() <= 1:
+        return [_parse_file(data) for data in datas]
+    pool = _get_pool()
+    try:
+        return list(pool.map(_parse_file, datas, chunksize=32))
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None # Start a new pool next time
+        return [_parse_file(data) for data in datas]
+
+
+def _stat_key(stat):
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def get_symbols(abs_paths):
+    """
+    Returns {abs_path: symbols or error message} for Python files, reusing
+    cached results for files whose stat is unchanged, or whose content hash
+    is unchanged when only the stat changed (e.g. a touch). Files that need
+    parsing are parsed in a shared process pool when there are at least
+    config.OUTLINE_PARALLEL_THRESHOLD of them and more than one worker.
+    """
+    results = {}
+    to_parse = [] # (abs_path, stat key, hash, data)
+    for abs_path in abs_paths:
+        try:
+            stat_key = _stat_key(os.stat(abs_path))
+        except OSError as e:
+            results[abs_path] = f"Could not read: {e}"
+            continue
+        with _outline_cache_lock:
+            cached = _outline_cache.get(abs_path)
+        if cached is not None and cached[0] == stat_key:
+            results[abs_path] = cached[2]
+            continue
+        try:
+            with open(abs_path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            results[abs_path] = f"Could not read: {e}"
+            continue
+        digest = hashlib.sha1(data).hexdigest()
+        if cached is not None and cached[1] == digest:
+            results[abs_path] = cached[2]
+            with _outline_cache_lock:
+                _outline_cache[abs_path] = (stat_key, digest, cached[2])
+            continue
+        to_parse.append((abs_path, stat_key, digest, data))
+
+    parsed = _parse_all([data for _, _, _, data in to_parse])
+
+    with _outline_cache_lock:
+        for (abs_path, stat_key, digest, _), symbols in zip(to_parse, parsed):
+            _outline_cache[abs_path] = (stat_key, digest, symbols)
+            results[abs_path] = symbols
+    return results
+
+
+def python_files(target):
+    """Yields the .py files under a directory in sorted order, skipping config.SEARCH_SKIP_DIRS."""
+    for dirpath, dirnames, filenames in os.walk(target):
+        dirnames[:] = sorted(name for name in dirnames if name not in config.SEARCH_SKIP_DIRS)
+        for filename in sorted(filenames):
+            if filename.endswith(".py"):
+                yield os.path.join(dirpath, filename)
+
+
+def close_matches(name, symbols, limit=5):
+    """Qualified names among symbols that look like name, for a did-you-mean hint."""
+    names = [symbol[0] for symbol in symbols]
+    short = {qualified_name.rsplit(".", 1)[-1]: qualified_name for qualified_name in names}
+    matches = difflib.get_close_matches(name, names, n=limit, cutoff=0.6)
+    matches += [short[match] for match in difflib.get_close_matches(name.rsplit(".", 1)[-1], list(short), n=limit, cutoff=0.6)]
+    return list(dict.fromkeys(matches))[:limit]
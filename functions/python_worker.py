@@ -0,0 +1,95 @@
+# functions/python_worker.py
+#
+# Long-lived interpreter started by functions/interpreter_pool.py.
+# Reads one JSON request per line, runs the requested script with runpy as if
+# it were a fresh `python script.py args...`, and answers with its exit code.
+# The script's stdout/stderr go straight to the files named in the request,
+# at the file descriptor level, so even output from os.write or a hard crash
+# is kept.
+import json
+import os
+import runpy
+import sys
+import traceback
+
+# Protocol streams are moved off fds 0/1 so scripts can't read or corrupt them.
+_requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+_replies = os.fdopen(os.dup(1), "w", encoding="utf-8")
+_devnull = os.open(os.devnull, os.O_RDONLY)
+os.dup2(_devnull, 0)
+
+
+def _exit_code(exit_exc):
+    code = exit_exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _run(request):
+    script = request["path"]
+    saved_modules = set(sys.modules)
+    saved_path = list(sys.path)
+    saved_argv = list(sys.argv)
+    saved_environ = dict(os.environ)
+    saved_cwd = os.getcwd()
+    saved_fds = (os.dup(1), os.dup(2))
+
+    stdout_fd = os.open(request["stdout"], os.O_WRONLY | os.O_TRUNC)
+    stderr_fd = os.open(request["stderr"], os.O_WRONLY | os.O_TRUNC)
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    os.close(stdout_fd)
+    os.close(stderr_fd)
+
+    sys.argv = [script] + list(request["args"])
+    sys.path[0] = os.path.dirname(script)
+    os.chdir(request["cwd"])
+    try:
+        runpy.run_path(script, run_name="__main__")
+        returncode = 0
+    except SystemExit as e:
+        returncode = _exit_code(e)
+    except BaseException:
+        traceback.print_exc()
+        returncode = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        os.close(saved_fds[0])
+        os.close(saved_fds[1])
+
+        # Forget everything the script imported so edited modules are reloaded next run.
+        for name in set(sys.modules) - saved_modules:
+            del sys.modules[name]
+        sys.path[:] = saved_path
+        sys.argv = saved_argv
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        os.chdir(saved_cwd)
+    return returncode
+
+
+def main():
+    for module_name in sys.argv[1:]:
+        __import__(module_name)
+    _replies.write(json.dumps({"ready": True}) + "\n")
+    _replies.flush()
+
+    for line in _requests:
+        returncode = _run(json.loads(line))
+        _replies.write(json.dumps({"returncode": returncode}) + "\n")
+        _replies.flush()
+
+
+if __name__ == "__main__":
+    main()
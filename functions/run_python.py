@@ -1,21 +1,169 @@
 # functions/run_python.py
 import os
+import signal
 import subprocess
 import sys # To get the Python executable path
+import threading
+from functions import config
+from functions.get_files_info import invalidate_listing_cache
+from functions.interpreter_pool import InterpreterPool
+from functions.output_capture import HeadTailBuffer
+from functions.search_index import mark_indexes_stale
 
-def run_python_file(working_directory, file_path, args=[]):
+try:
+    import resource # POSIX only
+except ImportError:
+    resource = None
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_interpreter_pool(working_directory):
+    """
+    Returns the shared warm interpreter pool for a working directory, starting it on first use.
+    """
+    abs_working_dir = os.path.abspath(working_directory)
+    with _pools_lock:
+        if abs_working_dir not in _pools:
+            _pools[abs_working_dir] = InterpreterPool(
+                abs_working_dir,
+                size=config.INTERPRETER_POOL_SIZE,
+                max_runs=config.INTERPRETER_POOL_MAX_RUNS,
+            )
+        return _pools[abs_working_dir]
+
+def _format_stream(name, capture):
+    if capture.omitted_bytes:
+        return f"{name} ({capture.total_bytes} bytes, {capture.omitted_bytes} omitted):\n{capture.text()}"
+    return f"{name}:\n{capture.text()}"
+
+def _format_output(stdout, stderr, returncode):
+    output_parts = []
+
+    if stdout.total_bytes:
+        output_parts.append(_format_stream("STDOUT", stdout))
+
+    if stderr.total_bytes:
+        output_parts.append(_format_stream("STDERR", stderr))
+
+    if returncode != 0:
+        if returncode == -getattr(signal, "SIGXCPU", 0):
+            output_parts.append(f"Process exited with code {returncode} (CPU time limit of {config.RUN_PYTHON_CPU_SECONDS} seconds exceeded)")
+        else:
+            output_parts.append(f"Process exited with code {returncode}")
+
+    if not output_parts: # If both stdout and stderr are empty and exit code is 0
+        return "No output produced."
+    else:
+        return "\n".join(output_parts)
+
+def _resource_limits():
+    # (resource, value) pairs for the configured limits that this platform supports
+    if resource is None:
+        return []
+    limits = [
+        ("RLIMIT_CPU", config.RUN_PYTHON_CPU_SECONDS),
+        ("RLIMIT_AS", config.RUN_PYTHON_MEMORY_BYTES),
+        ("RLIMIT_NOFILE", config.RUN_PYTHON_MAX_OPEN_FILES),
+    ]
+    return [(getattr(resource, name), value) for name, value in limits if value is not None and hasattr(resource, name)]
+
+def _capped(limit, value):
+    # A limit can only be lowered, never raised above the current hard limit
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    return (value, value)
+
+def _set_own_limits():
+    # preexec_fn fallback for platforms without prlimit; runs in the child before exec
+    for limit, value in _resource_limits():
+        resource.setrlimit(limit, _capped(limit, value))
+
+def _start_limited(command, cwd):
+    """
+    Starts command with stdout and stderr piped and the configured resource
+    limits applied. prlimit sets them on the new process straight after it
+    is started, which unlike preexec_fn is safe while other threads run.
+    """
+    use_prlimit = hasattr(resource, "prlimit")
+    process = subprocess.Popen(
+        command,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=os.name == "posix", # So a timeout can kill the script's children too
+        preexec_fn=None if use_prlimit or resource is None else _set_own_limits,
+    )
+    if use_prlimit:
+        try:
+            for limit, value in _resource_limits():
+                resource.prlimit(process.pid, limit, _capped(limit, value))
+        except ProcessLookupError:
+            pass # Already exited
+    return process
+
+def _drain(pipe, buffer):
+    with pipe:
+        for chunk in iter(lambda: pipe.read1(65536), b""):
+            buffer.write(chunk)
+
+def _kill(process):
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+def _run_streaming(command, cwd, timeout):
+    """
+    Runs command and returns (stdout, stderr, returncode) with stdout and
+    stderr read as they are produced into HeadTailBuffers, so memory use
+    stays constant however much the script prints.
+    """
+    process = _start_limited(command, cwd)
+    stdout = HeadTailBuffer(config.RUN_PYTHON_OUTPUT_HEAD_BYTES, config.RUN_PYTHON_OUTPUT_TAIL_BYTES)
+    stderr = HeadTailBuffer(config.RUN_PYTHON_OUTPUT_HEAD_BYTES, config.RUN_PYTHON_OUTPUT_TAIL_BYTES)
+    readers = [
+        threading.Thread(target=_drain, args=(process.stdout, stdout), daemon=True),
+        threading.Thread(target=_drain, args=(process.stderr, stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    try:
+        returncode = process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill(process)
+        process.wait()
+        raise
+    finally:
+        for reader in readers:
+            reader.join(timeout=1) # A process the script left behind may still hold the pipes
+    return stdout, stderr, returncode
+
+def run_python_file(working_directory, file_path, args=[], timeout=None):
     """
     Performs initial validation checks before executing a Python file
-    and then executes it using subprocess.run.
+    and then executes it in a subprocess, or on a warm interpreter
+    when config.USE_INTERPRETER_POOL is enabled.
+
+    The subprocess runs under the CPU, memory and open file limits in config,
+    and only the head and tail of its stdout and stderr are kept.
 
     Args:
         working_directory (str): The base directory where file operations are permitted.
         file_path (str): The path to the Python script relative to the working_directory.
         args (list): A list of command-line arguments to pass to the Python script.
+        timeout (float): Seconds before the script is killed, config.RUN_PYTHON_TIMEOUT by default.
 
     Returns:
         str: A formatted string containing the script's output, errors, or an error message.
     """
+    timeout = timeout or config.RUN_PYTHON_TIMEOUT
+
     # Initial validation checks from the previous step
     abs_working_dir = os.path.abspath(working_directory)
     full_file_path = os.path.join(abs_working_dir, file_path)
@@ -32,44 +180,37 @@ def run_python_file(working_directory, file_path, args=[]):
 
     # --- Subprocess execution ---
     try:
+        if config.USE_INTERPRETER_POOL:
+            try:
+                stdout, stderr, returncode = get_interpreter_pool(abs_working_dir).run(
+                    abs_file_path,
+                    args,
+                    timeout=timeout,
+                    head_bytes=config.RUN_PYTHON_OUTPUT_HEAD_BYTES,
+                    tail_bytes=config.RUN_PYTHON_OUTPUT_TAIL_BYTES,
+                )
+            finally:
+                invalidate_listing_cache() # The script may have changed any file
+                mark_indexes_stale()
+            return _format_output(stdout, stderr, returncode)
+
         # Construct the command to execute
         # Using sys.executable ensures the same Python interpreter is used.
+        # shell=False (a list command) is crucial for security.
         command = [sys.executable, abs_file_path] + args
 
-        # Execute the Python script using subprocess.run
-        # shell=False is crucial for security.
-        # capture_output=True captures stdout and stderr.
-        # text=True decodes output as strings.
-        # timeout sets the maximum execution time.
-        process = subprocess.run(
-            command,
-            cwd=abs_working_dir,  # Set the working directory for the subprocess
-            capture_output=True,
-            text=True,
-            timeout=30, # Set timeout to 30 seconds
-            check=False # Do not raise CalledProcessError automatically
-        )
+        try:
+            stdout, stderr, returncode = _run_streaming(command, abs_working_dir, timeout)
+        finally:
+            invalidate_listing_cache() # The script may have changed any file
+            mark_indexes_stale()
 
         # Format the output
-        output_parts = []
-
-        if process.stdout:
-            output_parts.append(f"STDOUT:\n{process.stdout}")
-
-        if process.stderr:
-            output_parts.append(f"STDERR:\n{process.stderr}")
-
-        if process.returncode != 0:
-            output_parts.append(f"Process exited with code {process.returncode}")
-
-        if not output_parts: # If both stdout and stderr are empty and exit code is 0
-            return "No output produced."
-        else:
-            return "\n".join(output_parts)
+        return _format_output(stdout, stderr, returncode)
 
     except subprocess.TimeoutExpired:
         # The process was killed due to timeout
-        return f"Error: execution timed out after 30 seconds."
+        return f"Error: execution timed out after {timeout} seconds."
     except Exception as e:
         # Catch any other exceptions during execution
         return f"Error: executing Python file: {e}"
\ No newline at end of file
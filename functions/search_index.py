@@ -0,0 +1,423 @@
+# functions/search_index.py
+import atexit
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from functions import config
+
+INDEX_VERSION = 1
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _skip_class(pattern, i):
+    # Returns the index just past a character class whose "[" is at i - 1,
+    # including escaped and leading "]"
+    if pattern[i:i + 1] == "^":
+        i += 1
+    if pattern[i:i + 1] == "]":
+        i += 1
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+    return i + 1
+
+
+def _required_literals(pattern):
+    """
+    Returns runs of characters every match of the regular expression pattern
+    must contain, read conservatively: groups, character classes, escapes
+    like \\w and characters a quantifier makes optional all end a run. An
+    alternation at the top level, or groups that don't balance, mean nothing
+    is required.
+    """
+    runs, run = [], []
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        i += 1
+        if char == "\\" and i < len(pattern):
+            escaped = pattern[i]
+            i += 1
+            if depth == 0 and not escaped.isalnum():
+                run.append(escaped)
+                continue
+            # Skip the rest of a \x41, \u..., \N{...}, octal or backreference escape
+            if escaped == "N" and pattern[i:i + 1] == "{":
+                i = pattern.find("}", i) + 1 or len(pattern)
+            elif escaped in "xuU" or escaped.isdigit():
+                while i < len(pattern) and pattern[i] in "0123456789abcdefABCDEF":
+                    i += 1
+        elif char == "[":
+            i = _skip_class(pattern, i)
+            if i > len(pattern):
+                return [] # Unterminated class
+        elif depth > 0:
+            # Parentheses inside classes and escapes were skipped above
+            depth += {"(": 1, ")": -1}.get(char, 0)
+            continue
+        elif char == "|":
+            return []
+        elif char in "?*{":
+            if run:
+                run.pop() # The quantified character may not occur at all
+            if char == "{":
+                i = pattern.find("}", i) + 1 or len(pattern)
+        elif char == "(":
+            depth = 1
+        elif char == ")":
+            return [] # Unbalanced
+        elif char not in ".^$+":
+            run.append(char)
+            continue
+        runs.append("".join(run))
+        run = []
+    if depth:
+        return []
+    runs.append("".join(run))
+    return [run for run in runs if len(run) >= 3]
+
+
+class TrigramIndex:
+    """
+    A trigram index of the text files under a directory, for finding the few
+    files a literal or regex search has to read.
+
+    Every file is listed under each three-character substring of its
+    lowercased content. A search takes the trigrams its query must contain,
+    intersects their file lists smallest first, and only reads the files
+    left over. Regexes without three required literal characters fall back
+    to reading every indexed file.
+
+    The index is kept up to date incrementally: refresh() re-reads only files
+    whose mtime or size changed, update_file() re-indexes one file after a
+    write, and a changed file gets a new id while its old id is just dropped
+    from the file table (posting lists are cleaned up in bulk once enough
+    ids are dead). After mark_stale(), e.g. once a script has run, the tree
+    is re-checked on a background thread rather than by the next search.
+    It is saved as JSON under config.SEARCH_INDEX_DIR, so a restart only
+    re-reads what changed in the meantime; saving happens in the background
+    config.SEARCH_INDEX_SAVE_DELAY seconds after a change, never in a search.
+
+    Args:
+        root (str): Directory to index.
+        path (str): Where to save the index, or None to keep it in memory only.
+    """
+
+    def __init__(self, root, path=None):
+        self.root = os.path.abspath(root)
+        self.path = path
+        self._lock = threading.RLock()
+        self._files = [] # id -> [relative_path, mtime_ns, size], or None once dead
+        self._ids = {} # relative_path -> id
+        self._postings = {} # trigram -> set of ids
+        self._dead = 0
+        self._refreshed_at = None # time.monotonic() of the last full refresh
+        self._stale = True
+        self._dirty = False
+        self._save_lock = threading.Lock() # Serializes writers of the saved file
+        self._save_timer = None
+        self._background_refresh = None
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION or data.get("root") != self.root:
+            return
+        self._files = data["files"]
+        self._ids = {entry[0]: file_id for file_id, entry in enumerate(self._files) if entry is not None}
+        self._dead = len(self._files) - len(self._ids)
+        self._postings = {trigram: set(ids) for trigram, ids in data["postings"].items()}
+
+    def save(self):
+        """Writes the index to its path, if it changed since it was loaded or saved."""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self.path or not self._dirty or not os.path.isdir(self.root):
+                    return
+                # Snapshot under the lock, write outside it so searches aren't held up
+                self._compact()
+                snapshot = {
+                    "version": INDEX_VERSION,
+                    "root": self.root,
+                    "files": list(self._files),
+                    "postings": {trigram: sorted(ids) for trigram, ids in self._postings.items()},
+                }
+                self._dirty = False
+            try:
+                directory = os.path.dirname(self.path)
+                os.makedirs(directory, exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".index.", suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                with self._lock:
+                    self._dirty = True
+                raise
+
+    def schedule_save(self):
+        """Saves the index in the background once config.SEARCH_INDEX_SAVE_DELAY seconds have passed."""
+        with self._lock:
+            if not self.path or not self._dirty or self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(config.SEARCH_INDEX_SAVE_DELAY, self._save_quietly)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_quietly(self):
+        # The saved copy is only a cache, so a failed background save is just skipped
+        try:
+            self.save()
+        except OSError:
+            pass
+
+    def mark_stale(self):
+        """
+        Re-checks the whole tree on a background thread, e.g. after a script
+        ran; a search started meanwhile waits for it rather than walking again.
+        """
+        with self._lock:
+            self._stale = True
+            if self._background_refresh is not None:
+                return
+            self._background_refresh = threading.Thread(target=self._refresh_in_background, daemon=True)
+            self._background_refresh.start()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            self._background_refresh = None
+            if not self._stale:
+                return
+            if os.path.isdir(self.root):
+                self.refresh()
+            self.schedule_save()
+
+    def _walk(self):
+        # Yields (relative_path, stat) for regular files, not following symlinked directories
+        stack = [(self.root, "")]
+        while stack:
+            path, prefix = stack.pop()
+            try:
+                with os.scandir(path) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in config.SEARCH_SKIP_DIRS:
+                            stack.append((entry.path, prefix + entry.name + "/"))
+                    elif entry.is_file():
+                        yield prefix + entry.name, entry.stat()
+                except OSError:
+                    continue
+
+    def _read_text(self, relative_path):
+        # Returns the file's text, or None for binary and oversized files
+        try:
+            with open(os.path.join(self.root, relative_path), "rb") as f:
+                data = f.read(config.SEARCH_MAX_FILE_BYTES + 1)
+        except OSError:
+            return None
+        if len(data) > config.SEARCH_MAX_FILE_BYTES or b"\0" in data[:8192]:
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    def _forget(self, relative_path):
+        file_id = self._ids.pop(relative_path, None)
+        if file_id is not None:
+            self._files[file_id] = None
+            self._dead += 1
+            self._dirty = True
+
+    def _add(self, relative_path, stat):
+        self._forget(relative_path)
+        file_id = len(self._files)
+        self._files.append([relative_path, stat.st_mtime_ns, stat.st_size])
+        self._ids[relative_path] = file_id
+        self._dirty = True
+        text = self._read_text(relative_path)
+        if text is None:
+            return
+        postings = self._postings
+        for trigram in _trigrams(text.lower()):
+            ids = postings.get(trigram)
+            if ids is None:
+                postings[trigram] = {file_id}
+            else:
+                ids.add(file_id)
+
+    def _compact(self):
+        # Drops dead ids from the posting lists once they are a quarter of all ids
+        if self._dead * 4 < len(self._files) or not self._dead:
+            return
+        live = {file_id for file_id in self._ids.values()}
+        renumber = {}
+        files = []
+        for file_id, entry in enumerate(self._files):
+            if file_id in live:
+                renumber[file_id] = len(files)
+                files.append(entry)
+        postings = {}
+        for trigram, ids in self._postings.items():
+            kept = {renumber[file_id] for file_id in ids if file_id in renumber}
+            if kept:
+                postings[trigram] = kept
+        self._files = files
+        self._ids = {entry[0]: file_id for file_id, entry in enumerate(files)}
+        self._postings = postings
+        self._dead = 0
+
+    def refresh(self):
+        """
+        Brings the index up to date with the tree: files whose mtime or size
+        changed are re-read, deleted files are dropped. Returns the number of
+        files re-indexed.
+        """
+        with self._lock:
+            seen = set()
+            changed = 0
+            for relative_path, stat in self._walk():
+                seen.add(relative_path)
+                file_id = self._ids.get(relative_path)
+                if file_id is not None:
+                    _, mtime_ns, size = self._files[file_id]
+                    if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+                        continue
+                self._add(relative_path, stat)
+                changed += 1
+            for relative_path in [path for path in self._ids if path not in seen]:
+                self._forget(relative_path)
+            self._compact()
+            self._refreshed_at = time.monotonic()
+            self._stale = False
+            return changed
+
+    def update_file(self, abs_path):
+        """Re-indexes one file, or drops it if it no longer exists, without walking the tree."""
+        relative_path = os.path.relpath(os.path.abspath(abs_path), self.root).replace(os.sep, "/")
+        if relative_path.startswith("../"):
+            return
+        with self._lock:
+            try:
+                stat = os.stat(abs_path)
+            except OSError:
+                self._forget(relative_path)
+            else:
+                self._add(relative_path, stat)
+            self.schedule_save()
+
+    def _refresh_if_due(self):
+        if self._stale or self._refreshed_at is None or time.monotonic() - self._refreshed_at > config.SEARCH_INDEX_RECHECK_SECONDS:
+            self.refresh()
+            self.schedule_save()
+
+    def candidates(self, literals):
+        """
+        Returns the sorted relative paths of files that contain every trigram
+        of the given literal strings, ignoring case; every indexed file when
+        there are no usable literals.
+        """
+        with self._lock:
+            self._refresh_if_due()
+            trigrams = set()
+            for literal in literals:
+                trigrams |= _trigrams(literal.lower())
+            if not trigrams:
+                return sorted(self._ids)
+            postings = sorted((self._postings.get(trigram, set()) for trigram in trigrams), key=len)
+            ids = set(postings[0])
+            for posting in postings[1:]:
+                if not ids:
+                    break
+                ids &= posting
+            return sorted(self._files[file_id][0] for file_id in ids if self._files[file_id] is not None)
+
+    def search(self, query, regex=False, case_sensitive=True, include=None):
+        """
+        Yields (relative_path, text, matches) for each file with at least one
+        match of query, where matches are re.Match objects over text. include
+        is an optional predicate on relative paths, checked before a file is read.
+        """
+        if regex:
+            literals = _required_literals(query)
+            compiled = re.compile(query, re.MULTILINE | (0 if case_sensitive else re.IGNORECASE))
+            if compiled.flags & re.VERBOSE:
+                literals = [] # Whitespace in the pattern doesn't match anything
+        else:
+            literals = [query]
+            compiled = re.compile(re.escape(query), 0 if case_sensitive else re.IGNORECASE)
+        for relative_path in self.candidates(literals):
+            if include is not None and not include(relative_path):
+                continue
+            text = self._read_text(relative_path)
+            if text is None:
+                continue
+            matches = list(compiled.finditer(text))
+            if matches:
+                yield relative_path, text, matches
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(working_directory):
+    """
+    Returns the shared TrigramIndex of a working directory, loading its saved
+    copy on first use.
+    """
+    root = os.path.abspath(working_directory)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            path = None
+            if config.SEARCH_INDEX_DIR:
+                name = hashlib.sha256(root.encode("utf-8", "surrogateescape")).hexdigest()[:32]
+                path = os.path.join(config.SEARCH_INDEX_DIR, name + ".json")
+            index = _indexes[root] = TrigramIndex(root, path)
+        return index
+
+
+def notify_file_changed(abs_path):
+    """Re-indexes a file just written by a tool in every index whose tree contains it."""
+    abs_path = os.path.abspath(abs_path)
+    with _indexes_lock:
+        indexes = [index for root, index in _indexes.items() if abs_path.startswith(root + os.sep)]
+    for index in indexes:
+        index.update_file(abs_path)
+
+
+@atexit.register
+def save_indexes():
+    """Writes every index with unsaved changes now, instead of after the save delay."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.save()
+
+
+def mark_indexes_stale():
+    """Makes every index re-check its whole tree before the next search."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.mark_stale()
@@ -1,16 +1,63 @@
-import os, sys, argparse, json, tiktoken
-from dotenv import load_dotenv
-from functions.get_files_info import schema_get_files_info, schema_get_file_content, schema_run_python_file, schema_write_file
-from functions.get_files_info import get_files_info, get_file_content, write_file
+import os, sys, argparse, asyncio, json, threading, time
+from functions.get_files_info import schema_get_files_info, schema_get_file_content, schema_run_python_file, schema_write_file, schema_apply_patch, schema_search_files, schema_get_python_outline, schema_get_symbol_source
+from functions.get_files_info import get_files_info, get_file_content, write_file, apply_patch, search_files, get_python_outline, get_symbol_source
 from functions.run_python import run_python_file
+from token_ledger import ApproximateEncoding
+from conversation_history import ConversationHistory
+from tool_dispatch import dispatch_function_calls, dispatch_function_calls_async
+from response_cache import ResponseCache, make_key
+from tool_memo import ToolMemo
+from conversation_store import ConversationStore
+from tracing import Tracer, JsonlTraceSink, TraceAggregator, new_run_id
 
-load_dotenv()
-api_key = os.environ.get("GEMINI_API_KEY")
-
-from google import genai
 from google.genai import types
 
-client = genai.Client(api_key=api_key)
+# The client, tokenizer and .env are loaded on first use rather than at import,
+# so importing main (e.g. from simpleUI or tests) stays fast and works offline.
+client = None
+ENCODING = None
+_lazy_init_lock = threading.Lock()
+
+def get_client():
+    """
+    Returns the shared genai client, reading GEMINI_API_KEY (and .env) on first use.
+    """
+    global client
+    if client is None:
+        with _lazy_init_lock:
+            if client is None:
+                from dotenv import load_dotenv
+                from google import genai
+
+                load_dotenv()
+                client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+    return client
+
+def set_model_backend(backend):
+    """
+    Sends every model request to backend instead of the Gemini client, e.g. a
+    scripted_backend.ScriptedBackend for offline tests and benchmarks. backend
+    must provide the client's models.generate_content, generate_content_stream
+    and aio.models.generate_content. None goes back to the Gemini client.
+    """
+    global client
+    client = backend
+
+def get_encoding():
+    """
+    Returns the tiktoken encoding used for token counts, loading it on first use.
+    Falls back to ApproximateEncoding when tiktoken or its encoding file is unavailable (e.g. offline).
+    """
+    global ENCODING
+    if ENCODING is None:
+        with _lazy_init_lock:
+            if ENCODING is None:
+                try:
+                    import tiktoken
+                    ENCODING = tiktoken.encoding_for_model("gpt-4")
+                except Exception:
+                    ENCODING = ApproximateEncoding()
+    return ENCODING
 
 system_prompt = """
 You are a highly capable, versatile, and user-friendly AI assistant. Your primary specialization is coding tasks and problem-solving within a development environment. However, you are also equipped to provide general assistance across a broad range of topics, ensuring you are helpful to both programmers and non-technical users alike.
@@ -20,6 +67,9 @@ You have access to a set of powerful tools:
 - Reading file contents
 - Executing Python files with optional arguments
 - Writing or overwriting files
+- Editing files in place with patches
+- Searching file contents for text or regular expressions
+- Outlining Python files and fetching single classes or functions
 
 When a user asks a question or makes a request, follow this priority:
 1.  **Tool Use (Coding Context):** If the request is clearly related to the codebase or development environment, first determine if any of your tools can directly help (e.g., listing files to understand the project structure, reading a file to analyze code, running a script to test a solution, or writing a file to implement a change). Propose a plan involving tool calls if appropriate.
@@ -44,32 +94,37 @@ All paths you provide should be relative to the working directory. You do not ne
 """
 
 MAX_CONTEXT_TOKENS = 100000
-ENCODING = tiktoken.encoding_for_model("gpt-4")
+KEEP_TOOL_EXCHANGES = 2 # Most recent tool call/response pairs never compacted
+
+def count_message_tokens(message):
+    """
+    Counts the approximate number of tokens in a single Gemini API message.
+    """
+    encoding = get_encoding()
+    # Each message has overhead tokens beyond its content
+    token_count = 4 # Message overhead (e.g., role, parts, etc.)
+    for part in message.parts:
+        if hasattr(part, 'text') and part.text:
+            token_count += len(encoding.encode(part.text))
+        elif hasattr(part, 'function_call') and part.function_call:
+            # Add tokens for function name and arguments
+            token_count += len(encoding.encode(part.function_call.name))
+            for arg_name, arg_value in part.function_call.args.items():
+                token_count += len(encoding.encode(arg_name))
+                token_count += len(encoding.encode(str(arg_value)))
+        elif hasattr(part, 'function_response') and part.function_response:
+            # Add tokens for function name and response
+            token_count += len(encoding.encode(part.function_response.name))
+            for key, value in part.function_response.response.items():
+                token_count += len(encoding.encode(key))
+                token_count += len(encoding.encode(str(value)))
+    return token_count
 
 def count_tokens(messages):
     """
     Counts the approximate number of tokens in a list of Gemini API messages.
     """
-    token_count = 0
-    for message in messages:
-        # Each message has overhead tokens beyond its content
-        token_count += 4 # Message overhead (e.g., role, parts, etc.)
-        for part in message.parts:
-            if hasattr(part, 'text') and part.text:
-                token_count += len(ENCODING.encode(part.text))
-            elif hasattr(part, 'function_call') and part.function_call:
-                # Add tokens for function name and arguments
-                token_count += len(ENCODING.encode(part.function_call.name))
-                for arg_name, arg_value in part.function_call.args.items():
-                    token_count += len(ENCODING.encode(arg_name))
-                    token_count += len(ENCODING.encode(str(arg_value)))
-            elif hasattr(part, 'function_response') and part.function_response:
-                # Add tokens for function name and response
-                token_count += len(ENCODING.encode(part.function_response.name))
-                for key, value in part.function_response.response.items():
-                    token_count += len(ENCODING.encode(key))
-                    token_count += len(ENCODING.encode(str(value)))
-    return token_count
+    return sum(count_message_tokens(message) for message in messages)
 
 available_functions = types.Tool(
     function_declarations=[
@@ -77,19 +132,33 @@ available_functions = types.Tool(
         schema_get_file_content,
         schema_run_python_file,
         schema_write_file,
+        schema_apply_patch,
+        schema_search_files,
+        schema_get_python_outline,
+        schema_get_symbol_source,
     ]
 )
 
 WORKING_DIRECTORY = "./calculator"
 
+MEMOIZE_TOOL_RESULTS = True # Reuse file reads while their files are unchanged (see tool_memo.py)
+tool_memo = ToolMemo() # Script runs are only memoized with tools=("get_file_content", "run_python_file")
+
+MAX_TOOL_WORKERS = 4 # Function calls from one model turn that may run at once
+TOOL_CALL_TIMEOUT = 60 # Seconds a single function call may run before it is abandoned
+
 function_map = {
     "get_files_info": get_files_info,
     "get_file_content": get_file_content,
     "run_python_file": run_python_file,
     "write_file": write_file,
+    "apply_patch": apply_patch,
+    "search_files": search_files,
+    "get_python_outline": get_python_outline,
+    "get_symbol_source": get_symbol_source,
 }
 
-def call_function(function_call_part, verbose=False):
+def call_function(function_call_part, verbose=False, working_directory=None):
     function_name = function_call_part.name
     function_args = dict(function_call_part.args)
 
@@ -109,10 +178,13 @@ def call_function(function_call_part, verbose=False):
             ],
         )
 
-    function_args['working_directory'] = WORKING_DIRECTORY
+    function_args['working_directory'] = working_directory or WORKING_DIRECTORY
 
     try:
-        function_result = function_map[function_name](**function_args)
+        if MEMOIZE_TOOL_RESULTS:
+            function_result = tool_memo.call(function_name, function_args, function_map[function_name])
+        else:
+            function_result = function_map[function_name](**function_args)
         return types.Content(
             role="tool",
             parts=[
@@ -134,42 +206,266 @@ def call_function(function_call_part, verbose=False):
         )
 
 
-def run_ai_query(user_input, is_verbose_mode, current_messages):
-    # Start with the provided conversation history
-    messages = current_messages.copy() # Make a copy to avoid modifying the UI's stored list directly
+MODEL_NAME = 'gemini-2.0-flash-001'
+
+# Opt-in on-disk cache of model responses, set up with enable_response_cache()
+response_cache = None
+
+def enable_response_cache(directory, **limits):
+    """
+    Serves repeated identical model requests from a ResponseCache in directory.
+    limits are passed on to ResponseCache (max_entries, max_bytes, ttl).
+    """
+    global response_cache
+    response_cache = ResponseCache(directory, **limits)
+    return response_cache
+
+# Opt-in structured tracing of the agent loop, set up with enable_tracing()
+tracer = None
+
+def enable_tracing(*sinks):
+    """
+    Sends per-iteration, per-tool and per-run spans to sinks (see tracing.Tracer),
+    e.g. a JsonlTraceSink and a TraceAggregator.
+    """
+    global tracer
+    tracer = Tracer(*sinks)
+    return tracer
+
+# Opt-in persistent conversations, set up with enable_conversation_store()
+conversation_store = None
+CONVERSATION_STORE_PATH = os.path.join(os.path.expanduser("~"), ".simpleai", "conversations.sqlite3")
+
+def enable_conversation_store(path=CONVERSATION_STORE_PATH):
+    """
+    Keeps conversations in a ConversationStore at path, so that queries given
+    a session_id continue that session, across restarts too.
+    """
+    global conversation_store
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conversation_store = ConversationStore(path)
+    return conversation_store
+
+def _load_session(session_id, current_messages):
+    # Returns the history to start from and its token counts, when known
+    if session_id is None:
+        return current_messages, None
+    if conversation_store is None:
+        raise ValueError("session_id needs a conversation store; call enable_conversation_store() first")
+    return conversation_store.load_recent(session_id, MAX_CONTEXT_TOKENS)
+
+def _save_session(session_id, run):
+    if session_id is None:
+        return
+    messages, token_counts = run["messages"], run["token_counts"]
+    # A function call a cancelled run left unanswered would make the resumed request invalid
+    while messages and any(part.function_call for part in messages[-1].parts or []):
+        messages, token_counts = messages[:-1], token_counts[:-1]
+    conversation_store.append(session_id, messages, token_counts)
+
+def _trace(kind, run_id, **fields):
+    if tracer is not None:
+        tracer.emit(kind, run_id, **fields)
+
+def _trace_tool(run_id, function_call_part, result, seconds):
+    if tracer is None:
+        return
+    response = result.parts[0].function_response.response if result.parts else {}
+    _trace(
+        "tool", run_id,
+        name=function_call_part.name,
+        seconds=seconds,
+        result_chars=len(str(response.get("result", response.get("error", "")))),
+        error="error" in response,
+    )
+
+def _generation_config():
+    return types.GenerateContentConfig(tools=[available_functions], system_instruction=system_prompt)
+
+def _response_cache_key(messages):
+    if response_cache is None:
+        return None
+    return make_key(MODEL_NAME, system_prompt, [available_functions], messages)
+
+def _cache_response(cache_key, response):
+    # Only complete answers are worth replaying
+    if cache_key is not None and response.candidates:
+        response_cache.put(cache_key, response)
+
+def _generate(messages):
+    cache_key = _response_cache_key(messages)
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        return cached
+    response = get_client().models.generate_content(
+        model=MODEL_NAME,
+        contents=messages,
+        config=_generation_config(),
+    )
+    _cache_response(cache_key, response)
+    return response
+
+async def _generate_async(messages):
+    cache_key = _response_cache_key(messages)
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        return cached
+    response = await get_client().aio.models.generate_content(
+        model=MODEL_NAME,
+        contents=messages,
+        config=_generation_config(),
+    )
+    _cache_response(cache_key, response)
+    return response
+
+def _merge_stream_chunks(chunks):
+    """
+    Folds streamed response chunks into one GenerateContentResponse, joining
+    adjacent text parts, so the rest of the loop can treat it like a batch response.
+    """
+    parts = []
+    role = "model"
+    usage_metadata = None
+    for chunk in chunks:
+        if chunk.usage_metadata:
+            usage_metadata = chunk.usage_metadata
+        if not chunk.candidates or not chunk.candidates[0].content:
+            continue
+        content = chunk.candidates[0].content
+        role = content.role or role
+        for part in content.parts or []:
+            if part.text and parts and parts[-1].text and not parts[-1].function_call:
+                parts[-1] = types.Part(text=parts[-1].text + part.text)
+            else:
+                parts.append(part)
+    if not parts:
+        return types.GenerateContentResponse(candidates=[], usage_metadata=usage_metadata)
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role=role, parts=parts))],
+        usage_metadata=usage_metadata,
+    )
+
+def _stream_model_turn(messages, started_at, first_token_seen, cancel_event=None):
+    """
+    Streams one model turn, yielding text chunks as they arrive, and returns the merged response.
+    Stops reading early if cancel_event is set. A cached response is replayed as a single chunk.
+    """
+    cache_key = _response_cache_key(messages)
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        stream = [cached]
+    else:
+        stream = get_client().models.generate_content_stream(
+            model=MODEL_NAME,
+            contents=messages,
+            config=_generation_config(),
+        )
+
+    chunks = []
+    cancelled = False
+    for chunk in stream:
+        if cancel_event is not None and cancel_event.is_set():
+            cancelled = True
+            break
+        chunks.append(chunk)
+        if not first_token_seen:
+            first_token_seen = True
+            yield {"type": "first_token", "seconds": time.perf_counter() - started_at}
+        for candidate in chunk.candidates or []:
+            for part in (candidate.content.parts if candidate.content else None) or []:
+                if part.text:
+                    yield {"type": "text", "text": part.text}
+    response = _merge_stream_chunks(chunks)
+    if cached is None and not cancelled:
+        _cache_response(cache_key, response)
+    return response
+
+CANCELLED_MESSAGE = "Request cancelled."
+
+def _agent_steps(user_input, is_verbose_mode, current_messages, cancel_event=None, run_id=None, token_counts=None):
+    """
+    The model/tool loop shared by every driver (run_ai_query, stream_ai_query
+    and run_ai_query_async), written without doing any I/O itself.
+
+    Yields (kind, payload) requests to the driver:
+      - ("model", messages): send back the model's GenerateContentResponse,
+        or throw the exception the call raised.
+      - ("tools", function_calls): send back one result Content per call, in call order.
+      - ("save", run): store run["messages"], the messages this run added to
+        the conversation, with run["token_counts"] (counted before any
+        compaction); send back None. Requested once, just before "done".
+      - ("event", event): pass the event on to the caller; send back None.
+
+    Events are "function_call" and "function_response" for each tool call,
+    and finally "done" with the text run_ai_query returns. token_counts are
+    the known counts of current_messages, if any. Setting
+    cancel_event stops the loop before the next batch of tool calls or the
+    next iteration. Spans for each iteration and the whole run are sent to
+    the tracer under run_id when tracing is enabled.
+    """
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    # Start with the provided conversation history (copied, so the UI's stored list is left alone)
+    # Per-message token counts are cached so appends and trims don't re-encode the whole history
+    history = ConversationHistory(count_message_tokens, current_messages, keep_tool_exchanges=KEEP_TOOL_EXCHANGES, token_counts=token_counts)
+    new_messages, new_token_counts = [], []
+
+    def append(message):
+        total_before = history.total
+        total = history.append(message)
+        new_messages.append(message)
+        new_token_counts.append(total - total_before)
+        return total
+
+    def finish(text):
+        yield ("save", {"messages": new_messages, "token_counts": new_token_counts})
+        yield ("event", {"type": "done", "text": text})
 
     # Append the new user input to the history
-    messages.append(types.Content(role="user", parts=[types.Part(text=user_input)]))
-    
+    current_tokens = append(types.Content(role="user", parts=[types.Part(text=user_input)]))
 
     response_text_output = ""
-    current_tokens = count_tokens(messages)
+    run_started_at = time.perf_counter()
+    iterations = 0
 
     for i in range(20):
+        if cancelled():
+            response_text_output = CANCELLED_MESSAGE
+            break
+
+        iterations = i + 1
+        iteration_started_at = time.perf_counter()
         if is_verbose_mode:
             print(f"\n--- Iteration {i+1} --- (Current Tokens: {current_tokens})")
 
-        while current_tokens > MAX_CONTEXT_TOKENS:
-            if len(messages) <= 1:
-                if is_verbose_mode:
-                    print("Warning: Cannot trim messages further, context window exceeded.")
-                break
-            removed_message = messages.pop(0)
-            current_tokens = count_tokens(messages)
+        # Collapse stale tool output, and drop old exchanges if still over budget
+        tokens_before = current_tokens
+        notes = history.compact(MAX_CONTEXT_TOKENS)
+        for note in notes:
             if is_verbose_mode:
-                print(f"  - Trimmed oldest message. New token count: {current_tokens}")
+                print(f"  - {note}")
+        current_tokens = history.total
+        if notes:
+            _trace("compaction", run_id, iteration=iterations, tokens_before=tokens_before, tokens_after=current_tokens, notes=notes)
 
+        iteration = {"iteration": iterations, "context_tokens": current_tokens, "tool_calls": 0, "tools_seconds": 0.0}
         try:
-            response = client.models.generate_content(
-                model='gemini-2.0-flash-001',
-                contents=messages,
-                config=types.GenerateContentConfig(tools=[available_functions], system_instruction=system_prompt),
-            )
+            model_started_at = time.perf_counter()
+            response = yield ("model", history.as_list())
+            iteration["model_seconds"] = time.perf_counter() - model_started_at
+            usage = response.usage_metadata
+            iteration["prompt_tokens"] = usage.prompt_token_count if usage else None
+            iteration["response_tokens"] = usage.candidates_token_count if usage else None
+
+            if cancelled():
+                response_text_output = CANCELLED_MESSAGE
+                break
 
             if response.candidates and len(response.candidates) > 0:
                 for candidate in response.candidates:
-                    messages.append(candidate.content)
-                    current_tokens = count_tokens(messages)
+                    current_tokens = append(candidate.content)
                     if is_verbose_mode:
                         print(f"  - Appended candidate. New token count: {current_tokens}")
 
@@ -178,8 +474,15 @@ def run_ai_query(user_input, is_verbose_mode, current_messages):
                 all_function_response_parts = [] # <--- NEW LIST TO COLLECT ALL PARTS
 
                 for function_call_part in response.function_calls:
-                    function_call_result_content = call_function(function_call_part, verbose=is_verbose_mode)
+                    yield ("event", {"type": "function_call", "name": function_call_part.name, "args": dict(function_call_part.args or {})})
+
+                # The driver runs the batch; results come back in call order
+                tools_started_at = time.perf_counter()
+                function_call_results = yield ("tools", response.function_calls)
+                iteration["tool_calls"] = len(response.function_calls)
+                iteration["tools_seconds"] = time.perf_counter() - tools_started_at
 
+                for function_call_result_content in function_call_results:
                     # The call_function correctly returns types.Content(role="tool", parts=[Part.from_function_response(...)])
                     # We need to extract the Part itself from the returned Content object
                     if not (isinstance(function_call_result_content, types.Content) and
@@ -188,7 +491,8 @@ def run_ai_query(user_input, is_verbose_mode, current_messages):
                             hasattr(function_call_result_content.parts[0], 'function_response')): # Check the Part in the list
                         response_text_output = f"Error: Invalid function call result format from LLM."
                         if is_verbose_mode: print(response_text_output)
-                        return response_text_output
+                        yield from finish(response_text_output)
+                        return
 
                     # Extract the actual Part object containing the function_response
                     single_function_response_part = function_call_result_content.parts[0]
@@ -197,6 +501,7 @@ def run_ai_query(user_input, is_verbose_mode, current_messages):
 
                     if is_verbose_mode:
                         print(f"-> {actual_response_data}")
+                    yield ("event", {"type": "function_response", "name": single_function_response_part.function_response.name, "response": actual_response_data})
 
                     all_function_response_parts.append(single_function_response_part) # <--- ADD PART TO THE LIST
 
@@ -205,8 +510,7 @@ def run_ai_query(user_input, is_verbose_mode, current_messages):
                     role="tool",
                     parts=all_function_response_parts # <--- Use the list of all collected parts
                 )
-                messages.append(tool_response_message) # <--- Append THIS SINGLE MESSAGE
-                current_tokens = count_tokens(messages) # Update token count
+                current_tokens = append(tool_response_message) # <--- Append THIS SINGLE MESSAGE
                 if is_verbose_mode:
                     print(f"  - Appended ALL function results in one message. New token count: {current_tokens}")
 
@@ -214,10 +518,7 @@ def run_ai_query(user_input, is_verbose_mode, current_messages):
             elif response.text:
                 response_text_output = response.text
                 if is_verbose_mode: print(response_text_output)
-                messages.append(types.Content(role="model", parts=[types.Part(text=response_text_output)]))
-                current_tokens = count_tokens(messages)
-                if is_verbose_mode:
-                        print(f"  - Appended final text response. New token count: {current_tokens}")
+                # The candidate holding this text was already appended above
                 break
             else:
                 response_text_output = "No response text or function call was received. Ending conversation."
@@ -228,9 +529,198 @@ def run_ai_query(user_input, is_verbose_mode, current_messages):
             response_text_output = f"Error during AI interaction: {e}"
             if is_verbose_mode: print(response_text_output)
             break
+        finally:
+            if "model_seconds" in iteration:
+                _trace("iteration", run_id, seconds=time.perf_counter() - iteration_started_at, **iteration)
 
     else:
         response_text_output = "Warning: Maximum iterations reached without a final response."
         if is_verbose_mode: print(response_text_output)
 
-    return response_text_output
\ No newline at end of file
+    _trace("run", run_id, iterations=iterations, seconds=time.perf_counter() - run_started_at, context_tokens=current_tokens)
+    yield from finish(response_text_output)
+
+def _drive_sync(steps, stream, cancel_event=None, on_tool_progress=None, is_verbose_mode=False, run_id=None, working_directory=None, session_id=None):
+    """
+    Runs _agent_steps against the blocking client, yielding its events. In
+    streaming mode the model's text chunks and a "first_token" event are
+    yielded as they arrive.
+    """
+    def run_tool(function_call_part):
+        if on_tool_progress:
+            on_tool_progress({"type": "tool_started", "name": function_call_part.name, "args": dict(function_call_part.args or {})})
+        tool_started_at = time.perf_counter()
+        result = call_function(function_call_part, verbose=is_verbose_mode, working_directory=working_directory)
+        seconds = time.perf_counter() - tool_started_at
+        _trace_tool(run_id, function_call_part, result, seconds)
+        if on_tool_progress:
+            on_tool_progress({"type": "tool_finished", "name": function_call_part.name, "seconds": seconds})
+        return result
+
+    started_at = time.perf_counter()
+    first_token_seen = False
+    reply, error = None, None
+    while True:
+        try:
+            kind, payload = steps.throw(error) if error else steps.send(reply)
+        except StopIteration:
+            return
+        reply, error = None, None
+        try:
+            if kind == "model" and stream:
+                reply = yield from _stream_model_turn(payload, started_at, first_token_seen, cancel_event)
+                first_token_seen = True
+            elif kind == "model":
+                reply = _generate(payload)
+            elif kind == "tools":
+                # Independent calls run concurrently; results come back in call order
+                reply = dispatch_function_calls(
+                    payload,
+                    run_tool,
+                    max_workers=MAX_TOOL_WORKERS,
+                    timeout=TOOL_CALL_TIMEOUT,
+                    scope=os.path.abspath(working_directory or WORKING_DIRECTORY),
+                )
+            elif kind == "save":
+                _save_session(session_id, payload)
+            else:
+                yield payload
+        except Exception as e:
+            error = e
+
+def run_ai_query(user_input, is_verbose_mode, current_messages, cancel_event=None, on_tool_progress=None, working_directory=None, session_id=None):
+    """
+    Runs one user request through the model/tool loop and returns the final
+    text. Tools run in working_directory, WORKING_DIRECTORY by default.
+
+    With a session_id the conversation so far is read from conversation_store
+    instead of current_messages (the newest turns that fit in
+    MAX_CONTEXT_TOKENS), and this run's messages are appended to it.
+    """
+    run_id = new_run_id()
+    messages, token_counts = _load_session(session_id, current_messages)
+    steps = _agent_steps(user_input, is_verbose_mode, messages, cancel_event, run_id, token_counts)
+    for event in _drive_sync(steps, False, cancel_event, on_tool_progress, is_verbose_mode, run_id, working_directory, session_id):
+        if event["type"] == "done":
+            return event["text"]
+
+def stream_ai_query(user_input, is_verbose_mode, current_messages, cancel_event=None, on_tool_progress=None, working_directory=None, session_id=None):
+    """
+    Streaming counterpart of run_ai_query: a generator of the events described
+    in _agent_steps plus "first_token" and "text" chunks, using
+    generate_content_stream so text shows up as it is produced. Function calls
+    and token accounting are handled exactly as in run_ai_query, and the final
+    "done" event carries the same text it would return. Setting cancel_event
+    also stops reading the current stream.
+    """
+    run_id = new_run_id()
+    messages, token_counts = _load_session(session_id, current_messages)
+    steps = _agent_steps(user_input, is_verbose_mode, messages, cancel_event, run_id, token_counts)
+    yield from _drive_sync(steps, True, cancel_event, on_tool_progress, is_verbose_mode, run_id, working_directory, session_id)
+
+async def run_ai_query_async(user_input, is_verbose_mode, current_messages, cancel_event=None, working_directory=None, session_id=None):
+    """
+    Asynchronous run_ai_query built on client.aio, for hosting many
+    conversations in one process. Tool calls run in worker threads so they
+    don't block the event loop.
+    """
+    run_id = new_run_id()
+    messages, token_counts = _load_session(session_id, current_messages)
+    steps = _agent_steps(user_input, is_verbose_mode, messages, cancel_event, run_id, token_counts)
+
+    def run_tool(function_call_part):
+        tool_started_at = time.perf_counter()
+        result = call_function(function_call_part, verbose=is_verbose_mode, working_directory=working_directory)
+        _trace_tool(run_id, function_call_part, result, time.perf_counter() - tool_started_at)
+        return result
+
+    reply, error = None, None
+    while True:
+        try:
+            kind, payload = steps.throw(error) if error else steps.send(reply)
+        except StopIteration:
+            return None
+        reply, error = None, None
+        try:
+            if kind == "model":
+                reply = await _generate_async(payload)
+            elif kind == "tools":
+                reply = await dispatch_function_calls_async(
+                    payload,
+                    run_tool,
+                    max_workers=MAX_TOOL_WORKERS,
+                    timeout=TOOL_CALL_TIMEOUT,
+                    scope=os.path.abspath(working_directory or WORKING_DIRECTORY),
+                )
+            elif kind == "save":
+                _save_session(session_id, payload)
+            elif payload["type"] == "done":
+                return payload["text"]
+        except Exception as e:
+            error = e
+
+async def run_many_ai_queries(user_inputs, max_concurrency=8, is_verbose_mode=False):
+    """
+    Runs independent single-turn conversations concurrently, at most
+    max_concurrency at a time, and returns their answers in input order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(user_input):
+        async with semaphore:
+            return await run_ai_query_async(user_input, is_verbose_mode, [])
+
+    return await asyncio.gather(*(run_one(user_input) for user_input in user_inputs))
+
+def _run_cli_query(args):
+    if args.no_stream:
+        print(run_ai_query(args.prompt, args.verbose, [], session_id=args.session))
+        return
+
+    streamed_text = False
+    for event in stream_ai_query(args.prompt, args.verbose, [], session_id=args.session):
+        if event["type"] == "first_token":
+            print(f"[time to first token: {event['seconds']:.2f}s]", file=sys.stderr)
+        elif event["type"] == "text":
+            streamed_text = True
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "done":
+            if streamed_text:
+                print()
+            else:
+                print(event["text"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Ask the AI assistant a question from the command line.")
+    parser.add_argument("prompt", help="The request to send to the assistant.")
+    parser.add_argument("--verbose", action="store_true", help="Print iterations, tool calls and token counts.")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for the whole answer instead of streaming it.")
+    parser.add_argument("--cache-dir", help="Reuse model responses for identical requests, cached in this directory.")
+    parser.add_argument("--trace", help="Append JSONL spans for each iteration and tool call to this file.")
+    parser.add_argument("--session", help="Continue (or start) the conversation with this id, kept in --store.")
+    parser.add_argument("--store", default=CONVERSATION_STORE_PATH, help="Conversation database used by --session (default %(default)s).")
+    args = parser.parse_args()
+
+    if args.session:
+        enable_conversation_store(args.store)
+    if args.cache_dir:
+        enable_response_cache(args.cache_dir)
+    trace_sink = JsonlTraceSink(args.trace) if args.trace else None
+    aggregator = TraceAggregator()
+    if trace_sink is not None or args.verbose:
+        enable_tracing(*[sink for sink in (trace_sink, aggregator) if sink is not None])
+
+    try:
+        _run_cli_query(args)
+    finally:
+        if response_cache is not None:
+            response_cache.flush()
+            if args.verbose:
+                print(f"Response cache: {response_cache.stats()}", file=sys.stderr)
+        if args.verbose:
+            print(aggregator.format_summary(), file=sys.stderr)
+        if trace_sink is not None:
+            trace_sink.close()
+
+if __name__ == "__main__":
+    main()
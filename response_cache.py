@@ -0,0 +1,170 @@
+# response_cache.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from google.genai import types
+
+
+def make_key(model, system_instruction, tools, messages):
+    """
+    Returns the content address of a model request: a SHA-256 over the model
+    name, system prompt, tool declarations and the serialized conversation.
+    """
+    request = {
+        "model": model,
+        "system_instruction": system_instruction,
+        "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+        "messages": [message.model_dump(mode="json", exclude_none=True) for message in messages],
+    }
+    encoded = json.dumps(request, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResponseCache:
+    """
+    An on-disk cache of GenerateContentResponse objects keyed by make_key().
+
+    Each response is stored in its own file named after its key. An index file
+    records every entry's size and timestamps, so a lookup is a dict lookup
+    plus one file read, with no scanning of stored payloads. Entries are
+    evicted least-recently-used first once the cache exceeds max_entries or
+    max_bytes, and treated as missing once they are older than ttl seconds.
+
+    The cache is meant for one process at a time; concurrent processes sharing
+    a directory may lose each other's index updates.
+
+    Args:
+        directory (str): Where payloads and the index are kept.
+        max_entries (int): Maximum number of cached responses.
+        max_bytes (int): Maximum total size of cached payloads.
+        ttl (float): Seconds a response stays valid, or None to keep it until evicted.
+    """
+
+    INDEX_FILE = "index.json"
+    INDEX_FLUSH_INTERVAL = 5 # Seconds between index writes caused only by hits
+
+    def __init__(self, directory, max_entries=1000, max_bytes=100 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.directory = os.path.abspath(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> {"size", "created", "used"}, least recently used first
+        self._total_bytes = 0
+        self._last_flush = 0.0
+        self._dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _payload_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE), "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for key, entry in sorted(entries.items(), key=lambda item: item[1]["used"]):
+            self._entries[key] = entry
+            self._total_bytes += entry["size"]
+
+    def _write_index(self):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".index.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(temp_path, os.path.join(self.directory, self.INDEX_FILE))
+        self._last_flush = time.time()
+        self._dirty = False
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry["size"]
+        try:
+            os.unlink(self._payload_path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        """Returns the cached response for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry is not None and self.ttl is not None and now - entry["created"] > self.ttl:
+                self._remove(key)
+                self._dirty = True
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._payload_path(key), "r", encoding="utf-8") as f:
+                    payload = f.read()
+            except FileNotFoundError:
+                # Payload removed behind our back; forget the entry
+                self._remove(key)
+                self._dirty = True
+                self.misses += 1
+                return None
+            entry["used"] = now
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._dirty = True
+            if now - self._last_flush > self.INDEX_FLUSH_INTERVAL:
+                self._write_index()
+        return types.GenerateContentResponse.model_validate_json(payload)
+
+    def put(self, key, response):
+        """Stores a response under key, evicting old entries if the cache is over its limits."""
+        payload = response.model_dump_json(exclude_none=True)
+        path = self._payload_path(key)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)["size"]
+            now = time.time()
+            size = len(payload.encode("utf-8"))
+            self._entries[key] = {"size": size, "created": now, "used": now}
+            self._total_bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._write_index()
+
+    def flush(self):
+        """Writes pending index updates (recency from hits) to disk."""
+        with self._lock:
+            if self._dirty:
+                self._write_index()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+            self._write_index()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
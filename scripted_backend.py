@@ -0,0 +1,101 @@
+# scripted_backend.py
+import asyncio
+import time
+
+from google.genai import types
+
+
+def _turn_response(turn, prompt_tokens):
+    if isinstance(turn, str):
+        parts = [types.Part(text=turn)]
+    else:
+        parts = [types.Part.from_function_call(name=name, args=args) for name, args in turn]
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(prompt_token_count=prompt_tokens),
+    )
+
+
+class _Models:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def generate_content(self, model, contents, config=None):
+        if self._backend.latency:
+            time.sleep(self._backend.latency)
+        return self._backend.respond(contents)
+
+    def generate_content_stream(self, model, contents, config=None):
+        if self._backend.latency:
+            time.sleep(self._backend.latency)
+        response = self._backend.respond(contents)
+        parts = response.candidates[0].content.parts
+        if not parts[0].text:
+            yield response
+            return
+        # Stream text in a few chunks, like the real API does
+        text = parts[0].text
+        size = max(1, len(text) // self._backend.stream_chunks)
+        for start in range(0, len(text), size):
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text[start:start + size])]))],
+                usage_metadata=response.usage_metadata,
+            )
+
+
+class _AsyncModels:
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def generate_content(self, model, contents, config=None):
+        if self._backend.latency:
+            await asyncio.sleep(self._backend.latency)
+        return self._backend.respond(contents)
+
+
+class _Aio:
+    def __init__(self, backend):
+        self.models = _AsyncModels(backend)
+
+
+class ScriptedBackend:
+    """
+    A deterministic stand-in for the Gemini client that replays a script of
+    model turns, for tests and offline benchmarks (see main.set_model_backend).
+
+    Each turn is either the answer text, or a list of (function_name, args)
+    pairs to request in one turn. The turn to replay is chosen from the
+    request itself (the number of model messages since the latest user
+    message), so one backend can serve any number of conversations, including
+    concurrent ones, and each replays the script from the start. Once the
+    script runs out the last turn is repeated.
+
+    Args:
+        turns (list): The scripted turns, in order.
+        latency (float): Seconds each request takes, to model network time.
+        stream_chunks (int): Number of chunks a streamed text answer is split into.
+    """
+
+    def __init__(self, turns, latency=0.0, stream_chunks=3):
+        if not turns:
+            raise ValueError("A script needs at least one turn")
+        self.turns = list(turns)
+        self.latency = latency
+        self.stream_chunks = stream_chunks
+        self.requests = 0
+        self.models = _Models(self)
+        self.aio = _Aio(self)
+
+    def _turn_index(self, contents):
+        index = 0
+        for content in reversed(contents):
+            if content.role == "user" and any(part.text for part in content.parts or []):
+                break
+            if content.role == "model":
+                index += 1
+        return min(index, len(self.turns) - 1)
+
+    def respond(self, contents):
+        self.requests += 1
+        prompt_chars = sum(len(str(part)) for content in contents for part in content.parts or [])
+        return _turn_response(self.turns[self._turn_index(contents)], prompt_chars // 4)
@@ -3,15 +3,19 @@ from tkinter import ttk, filedialog, messagebox # Added filedialog and messagebo
 import sys
 import os
 import datetime
+import queue
+import threading
 
 # Adjust sys.path to ensure main.py is importable
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(script_dir)
 
-from main import run_ai_query
+from main import CANCELLED_MESSAGE, enable_conversation_store, stream_ai_query
+
+REPLAY_TURNS = 50 # Turns of a resumed session shown in the history field
 
 class AssistantApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, session_id=None):
         super().__init__()
         self.title("Sophisticated AI Assistant")
         self.geometry("1000x900")  # Even larger default size
@@ -37,7 +41,18 @@ class AssistantApp(tk.Tk):
         self.grid_rowconfigure(6, weight=2) # Response field
         self.grid_columnconfigure(0, weight=1)
 
-        self.conversation_messages = []
+        # The whole conversation, tool calls included, is kept in the store so it
+        # can be resumed. The store is opened and a new session created on the
+        # first Send, so just opening the window writes nothing.
+        self.conversation_store = None
+        self.session_id = session_id
+
+        # The agent loop runs on a worker thread; its events come back through this queue
+        self._agent_events = queue.Queue()
+        self._active_request = 0 # Events from older requests are ignored
+        self._cancel_event = None
+        self._first_chunk = True
+        self._poll_id = None # after() id of the pending _poll_agent_events call
 
         self.verbose_var = tk.BooleanVar(value=False) 
 
@@ -50,8 +65,35 @@ class AssistantApp(tk.Tk):
         self.conversation_history_field.tag_config('ai', foreground="#BBDEFB", font=("Arial", 9))
         self.conversation_history_field.tag_config('delimiter', foreground="#607D8B", font=("Arial", 8))
 
+        self._replay_session()
+
     # --- New Helper Methods ---
 
+    def _replay_session(self):
+        # Shows the last turns of a resumed session; only their rows are read from the store
+        if self.session_id is None:
+            return
+        self.title(f"Sophisticated AI Assistant - session {self.session_id}")
+        session = self._store().get_session(self.session_id)
+        if session is None:
+            return
+        messages, _ = self.conversation_store.load_turns(self.session_id, max(session["turns"] - REPLAY_TURNS, 0))
+        for message in messages:
+            text = "".join(part.text or "" for part in message.parts or [])
+            if text and message.role in ("user", "model"):
+                self._append_to_history("user" if message.role == "user" else "ai", text)
+
+    def _store(self):
+        if self.conversation_store is None:
+            self.conversation_store = enable_conversation_store()
+        return self.conversation_store
+
+    def _ensure_session(self):
+        if self.session_id is None:
+            self.session_id = self._store().create_session()
+            self.title(f"Sophisticated AI Assistant - session {self.session_id}")
+        return self.session_id
+
     def _save_history(self):
         file_path = filedialog.asksaveasfilename(
             defaultextension=".txt",
@@ -67,7 +109,8 @@ class AssistantApp(tk.Tk):
             self.conversation_history_field.config(state=tk.NORMAL)
             self.conversation_history_field.delete("1.0", tk.END)
             self.conversation_history_field.config(state=tk.DISABLED)
-            self.conversation_messages = [] # Clear the internal message list as well
+            self.session_id = None # The next Send starts a new session; the old one stays in the store
+            self.title("Sophisticated AI Assistant")
             messagebox.showinfo("History Cleared", "Conversation history has been cleared.")
 
     def _confirm_tool_call(self, function_name, function_args):
@@ -151,8 +194,15 @@ class AssistantApp(tk.Tk):
         self.input_field.config(yscrollcommand=input_scrollbar.set)
 
         # Send Button (Moved into Input Frame to be below input field, expanded)
-        self.send_button = ttk.Button(input_frame, text="Send Request", command=self._send_request)
-        self.send_button.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5,0))
+        button_frame = ttk.Frame(input_frame)
+        button_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5,0))
+        button_frame.grid_columnconfigure(0, weight=1)
+
+        self.send_button = ttk.Button(button_frame, text="Send Request", command=self._send_request)
+        self.send_button.grid(row=0, column=0, sticky="ew")
+
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self._cancel_request, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1, sticky="e", padx=(5,0))
 
         # Output Label (now in row 5)
         self.output_label = ttk.Label(self, text="Current AI Response:")
@@ -185,13 +235,11 @@ class AssistantApp(tk.Tk):
         if role == "user":
             prefix = f"[{timestamp}] You:\n"
             self.conversation_history_field.insert(tk.END, prefix, 'user')
-            self.conversation_messages.append({"role": "user", "text": text})
         else: # role == "ai"
             separator = "*" * 50 + "\n"
             self.conversation_history_field.insert(tk.END, separator, 'delimiter')
             prefix = f"[{timestamp}] AI:\n"
             self.conversation_history_field.insert(tk.END, prefix, 'ai')
-            self.conversation_messages.append({"role": "ai", "text": text})
 
         self.conversation_history_field.insert(tk.END, text + "\n", role)
         self.conversation_history_field.config(state=tk.DISABLED)
@@ -203,38 +251,122 @@ class AssistantApp(tk.Tk):
         self.output_field.insert(tk.END, text)
         self.output_field.config(state=state)
 
+    def _append_output(self, text):
+        self.output_field.config(state=tk.NORMAL)
+        self.output_field.insert(tk.END, text)
+        self.output_field.config(state=tk.DISABLED)
+        self.output_field.yview(tk.END)
+
     def _send_request(self):
+        if self._cancel_event is not None: # A request is already running
+            return
+
         user_input = self.input_field.get("1.0", tk.END).strip()
         if not user_input:
             self._display_output("Please enter a prompt.")
             return
+        session_id = self._ensure_session()
 
+        self.output_label.config(text="Current AI Response:")
         self._display_output("Thinking...\n", state=tk.DISABLED)
-        self.input_field.config(state=tk.DISABLED)
-        self.send_button.config(state=tk.DISABLED)
-        # Add disable for history buttons while AI is processing
-        self.save_history_button.config(state=tk.DISABLED)
-        self.clear_history_button.config(state=tk.DISABLED)
-        self.update_idletasks()
+        self._set_busy(True)
 
         self._append_to_history("user", user_input)
         self.input_field.delete("1.0", tk.END)
 
-        is_verbose_mode = self.verbose_var.get()
-        final_ai_response = run_ai_query(user_input, is_verbose_mode) # This will be modified for tool confirmation
-
+        self._active_request += 1
+        self._cancel_event = threading.Event()
+        self._first_chunk = True
+        worker = threading.Thread(
+            target=self._run_agent,
+            args=(self._active_request, user_input, self.verbose_var.get(), session_id, self._cancel_event),
+            daemon=True,
+        )
+        worker.start()
+        self._poll_id = self.after(50, self._poll_agent_events)
+
+    def _run_agent(self, request_id, user_input, is_verbose_mode, session_id, cancel_event):
+        # Runs on the worker thread: never touch Tk widgets here, only the queue
+        def post(event):
+            self._agent_events.put((request_id, event))
+
+        try:
+            for event in stream_ai_query(user_input, is_verbose_mode, [], cancel_event=cancel_event, on_tool_progress=post, session_id=session_id): # This will be modified for tool confirmation
+                post(event)
+        except Exception as e:
+            post({"type": "done", "text": f"Error during AI interaction: {e}"})
+
+    def _poll_agent_events(self):
+        self._poll_id = None
+        while True:
+            try:
+                request_id, event = self._agent_events.get_nowait()
+            except queue.Empty:
+                break
+            if request_id != self._active_request or self._cancel_event is None:
+                continue # Left over from an earlier request
+            if self._handle_agent_event(event):
+                return
+        if self._cancel_event is not None: # Polling stops when no request is running
+            self._poll_id = self.after(50, self._poll_agent_events)
+
+    def _handle_agent_event(self, event):
+        """Shows one agent event; returns True once the request has finished."""
+        if self._cancel_event.is_set():
+            if event["type"] == "done":
+                self._finish_request(event["text"]) # Usually CANCELLED_MESSAGE, unless the run had already finished
+                return True
+            return False # Output of a cancelled request is no longer shown
+        if event["type"] == "first_token":
+            self.output_label.config(text=f"Current AI Response: (first token after {event['seconds']:.2f}s)")
+        elif event["type"] == "done":
+            self._finish_request(event["text"])
+            return True
+        elif event["type"] in ("text", "tool_started", "tool_finished"):
+            if self._first_chunk:
+                self._display_output("", state=tk.DISABLED) # Replace "Thinking..."
+                self._first_chunk = False
+            if event["type"] == "text":
+                self._append_output(event["text"])
+            elif event["type"] == "tool_started":
+                self._append_output(f"\n[Calling {event['name']}...]")
+            else:
+                self._append_output(f"\n[{event['name']} finished in {event['seconds']:.2f}s]")
+        return False
+
+    def _cancel_request(self):
+        if self._cancel_event is None or self._cancel_event.is_set():
+            return
+        # The worker stops at its next checkpoint and still saves what the run
+        # added to the session, so the UI stays busy until its "done" arrives;
+        # a new request started sooner would load history without that turn
+        self._cancel_event.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self._display_output(CANCELLED_MESSAGE, state=tk.DISABLED)
+
+    def _finish_request(self, final_ai_response):
+        self._cancel_event = None
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
         self._display_output(final_ai_response)
         self._append_to_history("ai", final_ai_response)
-
-        self.input_field.config(state=tk.NORMAL)
-        self.send_button.config(state=tk.NORMAL)
-        self.save_history_button.config(state=tk.NORMAL) # Re-enable buttons
-        self.clear_history_button.config(state=tk.NORMAL)
+        self._set_busy(False)
         self.input_field.focus_set()
 
+    def _set_busy(self, busy):
+        state = tk.DISABLED if busy else tk.NORMAL
+        self.input_field.config(state=state)
+        self.send_button.config(state=state)
+        # Disable history buttons while AI is processing
+        self.save_history_button.config(state=state)
+        self.clear_history_button.config(state=state)
+        self.cancel_button.config(state=tk.NORMAL if busy else tk.DISABLED)
+
     def _send_request_event(self, event=None):
         self._send_request()
 
 if __name__ == "__main__":
-    app = AssistantApp()
+    # python simpleUI.py [SESSION_ID] resumes an earlier conversation
+    app = AssistantApp(sys.argv[1] if len(sys.argv) > 1 else None)
     app.mainloop()
\ No newline at end of file
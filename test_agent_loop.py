@@ -0,0 +1,170 @@
+# test_agent_loop.py
+
+import asyncio
+import contextlib
+import io
+import threading
+import unittest
+from unittest import mock
+
+from google.genai import types
+
+import main
+
+
+def _function_call_response():
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(
+                    role="model",
+                    parts=[
+                        types.Part.from_function_call(name="get_files_info", args={"directory": "pkg"}),
+                        types.Part.from_function_call(name="get_file_content", args={"file_path": "main.py"}),
+                    ],
+                )
+            )
+        ]
+    )
+
+
+def _text_chunk(text):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))]
+    )
+
+
+class FakeModels:
+    """Replays one tool-calling turn followed by a text answer, recording what it was sent."""
+
+    def __init__(self):
+        self.requests = []
+
+    def _record(self, contents):
+        self.requests.append([content.model_dump() for content in contents])
+        return len(self.requests)
+
+    def generate_content(self, model, contents, config):
+        if self._record(contents) == 1:
+            return _function_call_response()
+        return _text_chunk("The calculator prints 17.")
+
+    def generate_content_stream(self, model, contents, config):
+        if self._record(contents) == 1:
+            yield _function_call_response()
+        else:
+            for text in ["The calc", "ulator prints", " 17."]:
+                yield _text_chunk(text)
+
+
+class FakeAsyncModels:
+    """Async view of a FakeModels, tracking how many requests are in flight at once."""
+
+    def __init__(self, models):
+        self.models = models
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_content(self, model, contents, config):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return self.models.generate_content(model, contents, config)
+
+
+class TestStreamingMatchesBatch(unittest.TestCase):
+    def _run(self, fn):
+        fake = FakeModels()
+        with mock.patch.object(main, "client", mock.Mock(models=fake)), contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        return fake, result
+
+    def test_same_requests_and_answer(self):
+        batch, answer = self._run(lambda: main.run_ai_query("What does main.py print?", False, []))
+        streaming, events = self._run(lambda: list(main.stream_ai_query("What does main.py print?", False, [])))
+
+        self.assertEqual(answer, "The calculator prints 17.")
+        self.assertEqual(events[-1], {"type": "done", "text": answer})
+        self.assertEqual(streaming.requests, batch.requests)
+
+    def test_stream_events(self):
+        _, events = self._run(lambda: list(main.stream_ai_query("What does main.py print?", False, [])))
+        kinds = [event["type"] for event in events]
+
+        self.assertEqual(kinds[0], "first_token")
+        self.assertEqual(kinds.count("first_token"), 1)
+        self.assertEqual(
+            [(event["type"], event["name"]) for event in events if "name" in event],
+            [
+                ("function_call", "get_files_info"),
+                ("function_call", "get_file_content"),
+                ("function_response", "get_files_info"),
+                ("function_response", "get_file_content"),
+            ],
+        )
+        self.assertEqual("".join(event["text"] for event in events if event["type"] == "text"), "The calculator prints 17.")
+
+    def test_merge_joins_text_and_keeps_function_calls(self):
+        merged = main._merge_stream_chunks([_text_chunk("a"), _text_chunk("b"), _function_call_response(), _text_chunk("c")])
+        parts = merged.candidates[0].content.parts
+        self.assertEqual(parts[0].text, "ab")
+        self.assertEqual([part.function_call.name for part in parts[1:3]], ["get_files_info", "get_file_content"])
+        self.assertEqual(parts[3].text, "c")
+
+
+class TestAsyncLoop(unittest.TestCase):
+    def test_async_matches_batch(self):
+        batch = FakeModels()
+        with mock.patch.object(main, "client", mock.Mock(models=batch)), contextlib.redirect_stdout(io.StringIO()):
+            answer = main.run_ai_query("What does main.py print?", False, [])
+
+        fake = FakeModels()
+        client = mock.Mock(models=fake, aio=mock.Mock(models=FakeAsyncModels(fake)))
+        with mock.patch.object(main, "client", client), contextlib.redirect_stdout(io.StringIO()):
+            async_answer = asyncio.run(main.run_ai_query_async("What does main.py print?", False, []))
+
+        self.assertEqual(async_answer, answer)
+        self.assertEqual(fake.requests, batch.requests)
+
+    def test_many_queries_respect_concurrency_limit(self):
+        class AlwaysAnswer(FakeModels):
+            def generate_content(self, model, contents, config):
+                self._record(contents)
+                return _text_chunk(contents[-1].parts[0].text.upper())
+
+        aio_models = FakeAsyncModels(AlwaysAnswer())
+        client = mock.Mock(aio=mock.Mock(models=aio_models))
+        with mock.patch.object(main, "client", client), contextlib.redirect_stdout(io.StringIO()):
+            answers = asyncio.run(main.run_many_ai_queries([f"q{i}" for i in range(10)], max_concurrency=3))
+
+        self.assertEqual(answers, [f"Q{i}" for i in range(10)])
+        self.assertEqual(aio_models.max_in_flight, 3)
+
+
+class TestCancelAndProgress(unittest.TestCase):
+    def test_tool_progress_reported_per_call(self):
+        progress = []
+        fake = FakeModels()
+        with mock.patch.object(main, "client", mock.Mock(models=fake)), contextlib.redirect_stdout(io.StringIO()):
+            main.run_ai_query("What does main.py print?", False, [], on_tool_progress=progress.append)
+        started = sorted(event["name"] for event in progress if event["type"] == "tool_started")
+        finished = sorted(event["name"] for event in progress if event["type"] == "tool_finished")
+        self.assertEqual(started, ["get_file_content", "get_files_info"])
+        self.assertEqual(finished, started)
+
+    def test_cancel_before_tools_run(self):
+        cancel_event = threading.Event()
+        fake = FakeModels()
+        with mock.patch.object(main, "client", mock.Mock(models=fake)), contextlib.redirect_stdout(io.StringIO()):
+            events = []
+            for event in main.stream_ai_query("What does main.py print?", False, [], cancel_event=cancel_event):
+                events.append(event)
+                cancel_event.set() # Cancel as soon as the model starts answering
+        self.assertEqual(events[-1], {"type": "done", "text": main.CANCELLED_MESSAGE})
+        self.assertNotIn("function_call", [event["type"] for event in events])
+        self.assertEqual(len(fake.requests), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+# test_agent_server.py
+
+import contextlib
+import io
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+import main
+from agent_server import AgentServer, ServerBusy, SessionBusy, UnknownSession, serve_http, serve_stdio
+from scripted_backend import ScriptedBackend
+
+
+class BlockingBackend(ScriptedBackend):
+    """Answers only once released, so tests can fill the queue."""
+
+    def __init__(self):
+        super().__init__(["Answer."])
+        self.release = threading.Event()
+
+    def respond(self, contents):
+        self.release.wait(5)
+        return super().respond(contents)
+
+
+class AgentServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.backend = ScriptedBackend([
+            [("get_files_info", {"directory": "pkg"})],
+            "The pkg directory holds the calculator.",
+        ])
+        patcher = mock.patch.object(main, "client", self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        stdout = contextlib.redirect_stdout(io.StringIO())
+        stdout.__enter__()
+        self.addCleanup(stdout.__exit__, None, None, None)
+
+
+class TestAgentServer(AgentServerTestCase):
+    def test_sessions_keep_separate_histories(self):
+        agent = AgentServer(max_workers=2, max_queue=2)
+        self.addCleanup(agent.close)
+        first = agent.create_session()
+        second = agent.create_session()
+
+        self.assertEqual(agent.send_message(first.session_id, "What is in pkg?").result(5), "The pkg directory holds the calculator.")
+        self.assertEqual(len(agent.get_session(first.session_id).messages), 2)
+        self.assertEqual(agent.get_session(second.session_id).messages, [])
+
+    def test_working_directory_must_stay_in_workspace(self):
+        agent = AgentServer()
+        self.addCleanup(agent.close)
+        self.assertTrue(agent.create_session("calculator/pkg").working_directory.endswith("pkg"))
+        with self.assertRaises(ValueError):
+            agent.create_session("..")
+
+    def test_backpressure(self):
+        blocking = BlockingBackend()
+        main.client = blocking
+        agent = AgentServer(max_workers=1, max_queue=1)
+        self.addCleanup(agent.close)
+        self.addCleanup(blocking.release.set)
+        sessions = [agent.create_session().session_id for _ in range(3)]
+
+        futures = [agent.send_message(sessions[0], "one"), agent.send_message(sessions[1], "two")]
+        with self.assertRaises(SessionBusy):
+            agent.send_message(sessions[0], "again")
+        with self.assertRaises(ServerBusy):
+            agent.send_message(sessions[2], "three")
+        self.assertEqual(agent.stats()["rejected"], 1)
+
+        blocking.release.set()
+        self.assertEqual([future.result(5) for future in futures], ["Answer.", "Answer."])
+        self.assertEqual(agent.send_message(sessions[2], "three").result(5), "Answer.")
+
+    def test_idle_sessions_are_evicted_when_full(self):
+        blocking = BlockingBackend()
+        main.client = blocking
+        agent = AgentServer(max_workers=1, max_sessions=3)
+        self.addCleanup(agent.close)
+        self.addCleanup(blocking.release.set)
+        busy, oldest, newer = (agent.create_session() for _ in range(3))
+        busy.last_used, oldest.last_used, newer.last_used = 0, 1, 2
+        future = agent.send_message(busy.session_id, "still answering")
+        busy.last_used = 0
+
+        agent.create_session()
+        with self.assertRaises(UnknownSession):
+            agent.get_session(oldest.session_id)
+        self.assertIs(agent.get_session(busy.session_id), busy)
+        self.assertIs(agent.get_session(newer.session_id), newer)
+        self.assertEqual(agent.stats()["evicted"], 1)
+
+        blocking.release.set()
+        self.assertEqual(future.result(5), "Answer.")
+
+    def test_unknown_session(self):
+        agent = AgentServer()
+        self.addCleanup(agent.close)
+        with self.assertRaises(UnknownSession):
+            agent.send_message("missing", "hello")
+
+
+class TestHttpApi(AgentServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.agent = AgentServer(max_workers=2, max_queue=0)
+        self.server = serve_http(self.agent, port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.agent.close)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.base + path, data=data, method=method, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                payload = response.read()
+                return response.status, json.loads(payload) if payload else None
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_conversation_round_trip(self):
+        status, session = self._request("POST", "/sessions", {})
+        self.assertEqual(status, 201)
+        path = f"/sessions/{session['session_id']}"
+
+        status, answer = self._request("POST", path + "/messages", {"prompt": "What is in pkg?"})
+        self.assertEqual((status, answer), (200, {"text": "The pkg directory holds the calculator."}))
+        status, state = self._request("GET", path)
+        self.assertEqual([message["role"] for message in state["messages"]], ["user", "model"])
+
+        self.assertEqual(self._request("DELETE", path)[0], 204)
+        self.assertEqual(self._request("GET", path)[0], 404)
+
+    def test_bad_requests(self):
+        _, session = self._request("POST", "/sessions", {})
+        self.assertEqual(self._request("POST", f"/sessions/{session['session_id']}/messages", {})[0], 400)
+        self.assertEqual(self._request("POST", "/sessions", {"working_directory": "/etc"})[0], 400)
+        self.assertEqual(self._request("GET", "/nowhere")[0], 404)
+
+    def test_unexpected_error_is_a_500(self):
+        _, session = self._request("POST", "/sessions", {})
+        with mock.patch.object(self.agent, "send_message", side_effect=RuntimeError("boom")), contextlib.redirect_stderr(io.StringIO()) as stderr:
+            status, body = self._request("POST", f"/sessions/{session['session_id']}/messages", {"prompt": "Hi"})
+        self.assertEqual((status, body), (500, {"error": "boom"}))
+        self.assertIn("RuntimeError: boom", stderr.getvalue())
+
+
+class TestStdioApi(AgentServerTestCase):
+    def test_json_lines(self):
+        agent = AgentServer()
+        stdout = io.StringIO()
+        serve_stdio(agent, io.StringIO('{"id": 1, "method": "create_session"}\n'), stdout)
+        session_id = json.loads(stdout.getvalue())["result"]["session_id"]
+
+        requests = [
+            {"id": 2, "method": "send_message", "params": {"session_id": session_id, "prompt": "What is in pkg?"}},
+            {"id": 3, "method": "send_message", "params": {"session_id": "missing", "prompt": "hi"}},
+            {"id": 4, "method": "bogus"},
+        ]
+        stdout = io.StringIO()
+        serve_stdio(agent, io.StringIO("".join(json.dumps(request) + "\n" for request in requests)), stdout)
+        agent.close()
+
+        responses = {response["id"]: response for response in map(json.loads, stdout.getvalue().splitlines())}
+        self.assertEqual(responses[2]["result"], {"text": "The pkg directory holds the calculator."})
+        self.assertEqual(responses[3]["error"]["code"], 404)
+        self.assertEqual(responses[4]["error"]["code"], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# test_conversation_history.py
+
+import unittest
+
+from google.genai import types
+
+from conversation_history import ConversationHistory
+from main import count_message_tokens, count_tokens
+
+
+def _user(text):
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def _exchange(name, args, result):
+    return [
+        types.Content(role="model", parts=[types.Part.from_function_call(name=name, args=args)]),
+        types.Content(role="tool", parts=[types.Part.from_function_response(name=name, response={"result": result})]),
+    ]
+
+
+def _results(messages):
+    return [
+        part.function_response.response["result"]
+        for message in messages for part in message.parts if part.function_response
+    ]
+
+
+def _long_session():
+    messages = [_user("Fix the calculator precedence bug.")]
+    for i in range(6):
+        messages += _exchange("get_file_content", {"file_path": f"pkg/file{i}.py"}, f"# file {i}\n" + "x = 1\n" * 400)
+    messages.append(types.Content(role="model", parts=[types.Part(text="Done.")]))
+    messages.append(_user("Now run the tests."))
+    return messages
+
+
+class TestConversationHistory(unittest.TestCase):
+    def test_total_tracks_appends(self):
+        messages = _long_session()
+        history = ConversationHistory(count_message_tokens, messages[:3])
+        for message in messages[3:]:
+            history.append(message)
+        self.assertEqual(history.total, count_tokens(messages))
+        self.assertEqual(history.as_list(), messages)
+
+    def test_superseded_read_collapsed_even_under_budget(self):
+        messages = [_user("Read main.py twice.")]
+        messages += _exchange("get_file_content", {"file_path": "main.py"}, "old contents " * 50)
+        messages += _exchange("get_files_info", {"directory": "."}, "listing")
+        messages += _exchange("get_files_info", {"directory": "pkg"}, "listing")
+        messages += _exchange("get_file_content", {"file_path": "main.py"}, "new contents")
+        history = ConversationHistory(count_message_tokens, messages)
+
+        notes = history.compact(10 ** 6)
+
+        self.assertEqual(len(notes), 1)
+        results = _results(history.as_list())
+        self.assertIn("main.py was read again later", results[0])
+        self.assertEqual(results[1:], ["listing", "listing", "new contents"])
+        self.assertEqual(history.total, count_tokens(history.as_list()))
+
+    def test_old_outputs_digested_before_dropping(self):
+        messages = _long_session()
+        history = ConversationHistory(count_message_tokens, messages, keep_tool_exchanges=2, digest_chars=100)
+        budget = count_tokens(messages) // 2
+
+        history.compact(budget)
+
+        compacted = history.as_list()
+        self.assertEqual(len(compacted), len(messages))
+        self.assertLessEqual(history.total, budget)
+        results = _results(compacted)
+        self.assertTrue(all("[compacted:" in result for result in results[:4]))
+        self.assertEqual(results[4:], _results(messages)[4:])
+
+    def test_drop_keeps_pins_and_pairs(self):
+        messages = _long_session()
+        history = ConversationHistory(count_message_tokens, messages, keep_tool_exchanges=1, digest_chars=100)
+        pinned_cost = count_tokens([messages[0], *messages[11:13], messages[-1]])
+
+        notes = history.compact(pinned_cost + 10)
+
+        compacted = history.as_list()
+        self.assertEqual(compacted[0], messages[0])
+        self.assertEqual(compacted[-1], messages[-1])
+        self.assertIn(messages[11], compacted)
+        self.assertIn(messages[12], compacted)
+        for i, message in enumerate(compacted):
+            if any(part.function_call for part in message.parts):
+                self.assertTrue(any(part.function_response for part in compacted[i + 1].parts))
+        self.assertLessEqual(history.total, pinned_cost + 10)
+        self.assertEqual(history.total, count_tokens(compacted))
+        self.assertTrue(any(note.startswith("Dropped") for note in notes))
+
+    def test_warns_when_pinned_messages_exceed_budget(self):
+        history = ConversationHistory(count_message_tokens, [_user("a " * 500)])
+        notes = history.compact(10)
+        self.assertEqual(len(history), 1)
+        self.assertIn("Cannot trim messages further", notes[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
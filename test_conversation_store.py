@@ -0,0 +1,118 @@
+# test_conversation_store.py
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from google.genai import types
+
+import main
+from conversation_store import ConversationStore
+from scripted_backend import ScriptedBackend
+
+
+def _user(text):
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def _turn(i):
+    return [
+        _user(f"Question {i}"),
+        types.Content(role="model", parts=[types.Part.from_function_call(name="get_file_content", args={"file_path": f"f{i}.py"})]),
+        types.Content(role="tool", parts=[types.Part.from_function_response(name="get_file_content", response={"result": f"x = {i}"})]),
+        types.Content(role="model", parts=[types.Part(text=f"Answer {i}")]),
+    ]
+
+
+class RecordingBackend(ScriptedBackend):
+    def __init__(self, turns):
+        super().__init__(turns)
+        self.contents = []
+
+    def respond(self, contents):
+        self.contents.append(list(contents))
+        return super().respond(contents)
+
+
+class TestConversationStore(unittest.TestCase):
+    def setUp(self):
+        self.store = ConversationStore(":memory:")
+        self.addCleanup(self.store.close)
+
+    def test_round_trips_function_calls_and_counts(self):
+        session_id = self.store.create_session()
+        messages = _turn(0)
+        self.store.append(session_id, messages, [5, 6, 7, 8])
+
+        loaded, counts = self.store.load_turns(session_id)
+        self.assertEqual(loaded, messages)
+        self.assertEqual(counts, [5, 6, 7, 8])
+        self.assertEqual(loaded[1].parts[0].function_call.args, {"file_path": "f0.py"})
+        session = self.store.get_session(session_id)
+        self.assertEqual((session["turns"], session["tokens"], session["messages"]), (1, 26, 4))
+
+    def test_pages_by_turn(self):
+        for i in range(5):
+            self.store.append("s", _turn(i), [10, 10, 10, 10])
+
+        page, _ = self.store.load_turns("s", 1, 3)
+        self.assertEqual([m.parts[0].text for m in page if m.role == "user"], ["Question 1", "Question 2"])
+        recent, counts = self.store.load_recent("s", max_tokens=100)
+        self.assertEqual(recent, _turn(3) + _turn(4))
+        self.assertEqual(sum(counts), 80)
+        # The last turn is returned even when it alone is over budget
+        self.assertEqual(self.store.load_recent("s", max_tokens=1)[0], _turn(4))
+        self.assertEqual(self.store.load_recent("missing", 100), ([], []))
+
+    def test_rejects_mismatched_counts(self):
+        with self.assertRaises(ValueError):
+            self.store.append("s", _turn(0), [1])
+
+
+class TestResumeSession(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "conversations.sqlite3")
+        for name in ("client", "conversation_store"):
+            patcher = mock.patch.object(main, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        stdout = contextlib.redirect_stdout(io.StringIO())
+        stdout.__enter__()
+        self.addCleanup(stdout.__exit__, None, None, None)
+
+    def test_resumes_after_restart_without_recounting(self):
+        main.enable_conversation_store(self.path)
+        main.set_model_backend(ScriptedBackend([[("get_files_info", {"directory": "pkg"})], "First answer."]))
+        self.assertEqual(main.run_ai_query("What is in pkg?", False, [], session_id="s1"), "First answer.")
+        main.conversation_store.close()
+
+        # A new store on the same file, as after a restart
+        store = main.enable_conversation_store(self.path)
+        self.addCleanup(store.close)
+        backend = RecordingBackend(["Second answer."])
+        main.set_model_backend(backend)
+        counted = []
+        count_message_tokens = main.count_message_tokens
+        with mock.patch.object(main, "count_message_tokens", lambda m: counted.append(m) or count_message_tokens(m)):
+            events = list(main.stream_ai_query("And then?", False, [], session_id="s1"))
+
+        self.assertEqual(events[-1]["text"], "Second answer.")
+        sent = backend.contents[0]
+        self.assertEqual([m.role for m in sent], ["user", "model", "tool", "model", "user"])
+        self.assertEqual(sent[1].parts[0].function_call.name, "get_files_info")
+        # Only the messages of the new run were tokenized
+        self.assertEqual(len(counted), 2)
+        self.assertEqual(store.get_session("s1")["turns"], 2)
+
+    def test_session_needs_a_store(self):
+        with self.assertRaises(ValueError):
+            main.run_ai_query("Hi", False, [], session_id="s1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,419 @@
+# test_get_files_info.py
+
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+from functions import config
+from functions import python_outline
+from functions.get_files_info import (
+    apply_patch, get_file_content, get_files_info, get_python_outline, get_symbol_source, invalidate_listing_cache, search_files, write_file,
+)
+from functions.search_index import TrigramIndex, _required_literals, save_indexes
+
+
+class TestGetFileContent(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _write(self, name, data):
+        with open(os.path.join(self.tmp.name, name), "wb") as f:
+            f.write(data)
+
+    def _read_all_pages(self, name, length=None):
+        pages, offset = [], 0
+        while True:
+            content = get_file_content(self.tmp.name, name, offset=offset, length=length)
+            match = re.search(r"\[\.\.\.File .* offset=(\d+)\]$", content)
+            if not match:
+                pages.append(content)
+                return pages
+            pages.append(content[:match.start()])
+            offset = int(match.group(1))
+
+    def test_small_file_read_whole(self):
+        self._write("small.txt", b"line one\r\nline two\n")
+        self.assertEqual(get_file_content(self.tmp.name, "small.txt"), "line one\nline two\n")
+
+    def test_truncates_at_limit(self):
+        self._write("big.txt", b"x" * (config.MAX_FILE_READ_CHARS + 50))
+        content = get_file_content(self.tmp.name, "big.txt")
+        self.assertTrue(content.startswith("x" * config.MAX_FILE_READ_CHARS + "[...File"))
+        self.assertIn(f"offset={config.MAX_FILE_READ_CHARS}", content)
+
+    def test_pages_reassemble_multibyte_text(self):
+        text = "".join(f"{i}: héllo wörld €𝄞\n" for i in range(500))
+        self._write("utf8.txt", text.encode("utf-8"))
+        self.assertEqual("".join(self._read_all_pages("utf8.txt", length=333)), text)
+
+    def test_pages_through_memory_mapped_file(self):
+        text = "".join(f"row {i} ✓\n" for i in range(2000))
+        self._write("mapped.txt", text.encode("utf-8"))
+        with mock.patch.object(config, "MMAP_THRESHOLD_BYTES", 1):
+            self.assertEqual("".join(self._read_all_pages("mapped.txt")), text)
+
+    def test_offset_inside_character_is_realigned(self):
+        self._write("euro.txt", "€uro".encode("utf-8"))
+        self.assertEqual(get_file_content(self.tmp.name, "euro.txt", offset=1), "uro")
+
+    def test_offset_past_end(self):
+        self._write("short.txt", b"abc")
+        self.assertEqual(get_file_content(self.tmp.name, "short.txt", offset=3), "")
+        self.assertIn("beyond the end", get_file_content(self.tmp.name, "short.txt", offset=4))
+
+    def test_outside_working_directory(self):
+        self.assertIn("outside the permitted working directory", get_file_content(self.tmp.name, "../etc/passwd"))
+
+
+class TestGetFilesInfo(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(invalidate_listing_cache)
+        os.makedirs(os.path.join(self.tmp.name, "pkg", "sub"))
+        for name, data in [("main.py", "print()"), ("notes.txt", "abc"), ("pkg/calc.py", "x = 1"), ("pkg/sub/deep.py", "")]:
+            with open(os.path.join(self.tmp.name, name), "w") as f:
+                f.write(data)
+
+    def test_flat_listing(self):
+        pkg_size = os.path.getsize(os.path.join(self.tmp.name, "pkg"))
+        self.assertEqual(
+            get_files_info(self.tmp.name).splitlines(),
+            [
+                "- main.py: file_size=7 bytes, is_dir=False",
+                "- notes.txt: file_size=3 bytes, is_dir=False",
+                f"- pkg: file_size={pkg_size} bytes, is_dir=True",
+            ],
+        )
+
+    def test_recursive_with_pattern(self):
+        listing = get_files_info(self.tmp.name, recursive=True, pattern="*.py")
+        self.assertEqual(
+            [line.split(":")[0] for line in listing.splitlines()],
+            ["- main.py", "- pkg/calc.py", "- pkg/sub/deep.py"],
+        )
+
+    def test_max_depth(self):
+        listing = get_files_info(self.tmp.name, max_depth=2, pattern="*.py")
+        self.assertNotIn("deep.py", listing)
+        self.assertIn("pkg/calc.py", listing)
+
+    def test_write_file_invalidates_cached_sizes(self):
+        self.assertIn("notes.txt: file_size=3 bytes", get_files_info(self.tmp.name))
+        write_file(self.tmp.name, "notes.txt", "abcdef")
+        self.assertIn("notes.txt: file_size=6 bytes", get_files_info(self.tmp.name))
+
+    def test_new_entries_seen_through_cache(self):
+        get_files_info(self.tmp.name, "pkg")
+        with open(os.path.join(self.tmp.name, "pkg", "added.py"), "w") as f:
+            f.write("")
+        self.assertIn("added.py", get_files_info(self.tmp.name, "pkg"))
+
+
+class TestWriteAndPatch(unittest.TestCase):
+    ORIGINAL = "def add(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a - b\n"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "ops.py")
+        write_file(self.tmp.name, "ops.py", self.ORIGINAL)
+
+    def _read(self):
+        with open(self.path, newline="") as f:
+            return f.read()
+
+    def test_write_leaves_no_temp_files(self):
+        self.assertIn("Successfully wrote", write_file(self.tmp.name, "sub/new.py", "x = 1\n"))
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["ops.py", "sub"])
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, "sub")), ["new.py"])
+
+    def test_write_keeps_permissions(self):
+        os.chmod(self.path, 0o755)
+        write_file(self.tmp.name, "ops.py", "pass\n")
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o755)
+
+    def test_unified_diff(self):
+        patch = (
+            "--- a/ops.py\n"
+            "+++ b/ops.py\n"
+            "@@ -4,3 +4,3 @@\n"
+            " \n"
+            " def sub(a, b):\n"
+            "-    return a - b\n"
+            "+    return b - a\n"
+        )
+        self.assertIn("1 hunks applied", apply_patch(self.tmp.name, "ops.py", patch))
+        self.assertEqual(self._read(), self.ORIGINAL.replace("a - b", "b - a"))
+
+    def test_unified_diff_with_stale_line_numbers(self):
+        patch = "@@ -40,2 +40,3 @@\n def add(a, b):\n+    # Adds\n     return a + b\n"
+        apply_patch(self.tmp.name, "ops.py", patch)
+        self.assertTrue(self._read().startswith("def add(a, b):\n    # Adds\n    return a + b\n"))
+
+    def test_search_replace(self):
+        patch = "<<<<<<< SEARCH\n    return a + b\n=======\n    return b + a\n>>>>>>> REPLACE\n"
+        apply_patch(self.tmp.name, "ops.py", patch)
+        self.assertEqual(self._read(), self.ORIGINAL.replace("a + b", "b + a"))
+
+    def test_ambiguous_search_is_rejected(self):
+        write_file(self.tmp.name, "ops.py", self.ORIGINAL * 2)
+        patch = "<<<<<<< SEARCH\n    return a + b\n=======\n    return b + a\n>>>>>>> REPLACE"
+        result = apply_patch(self.tmp.name, "ops.py", patch)
+        self.assertIn("found 2 times", result)
+        self.assertEqual(self._read(), self.ORIGINAL * 2)
+
+    def test_mismatched_hunk_leaves_file_untouched(self):
+        result = apply_patch(self.tmp.name, "ops.py", "@@ -1,1 +1,1 @@\n-def mul(a, b):\n+def times(a, b):\n")
+        self.assertIn("does not match", result)
+        self.assertEqual(self._read(), self.ORIGINAL)
+
+    def test_insertion_at_end_of_file(self):
+        write_file(self.tmp.name, "ops.py", "x = 5\ny = 2\n")
+        apply_patch(self.tmp.name, "ops.py", "@@ -2,0 +3 @@\n+z = 9\n")
+        self.assertEqual(self._read(), "x = 5\ny = 2\nz = 9\n")
+        apply_patch(self.tmp.name, "ops.py", "@@ -9,0 +9 @@\n+w = 1\n")
+        self.assertEqual(self._read(), "x = 5\ny = 2\nz = 9\nw = 1\n")
+
+    def test_unparsed_search_replace_is_rejected(self):
+        patch = "<<<<<<< SEARCH\n    return a + b\n======\n    return b + a\n>>>>>>> REPLACE\n"
+        result = apply_patch(self.tmp.name, "ops.py", patch)
+        self.assertIn("no SEARCH/REPLACE blocks found", result)
+        self.assertEqual(self._read(), self.ORIGINAL)
+
+    def test_keeps_windows_line_endings(self):
+        with open(self.path, "w", newline="") as f:
+            f.write(self.ORIGINAL.replace("\n", "\r\n"))
+        apply_patch(self.tmp.name, "ops.py", "<<<<<<< SEARCH\na - b\n=======\nb - a\n>>>>>>> REPLACE")
+        self.assertEqual(self._read(), self.ORIGINAL.replace("a - b", "b - a").replace("\n", "\r\n"))
+
+    def test_outside_working_directory(self):
+        self.assertIn("outside the permitted", apply_patch(self.tmp.name, "../x.py", "@@ -1 +1 @@\n+x\n"))
+
+
+
+class TestSearchFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        self.addCleanup(save_indexes) # Writes now instead of into a removed directory later
+        patcher = mock.patch.object(config, "SEARCH_INDEX_DIR", index_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.makedirs(os.path.join(self.tmp.name, "pkg"))
+        self._write("pkg/calc.py", "class Calculator:\n    def evaluate(self, expression):\n        return eval(expression)\n")
+        self._write("main.py", "from pkg.calc import Calculator\n\nprint(Calculator().evaluate('1 + 2'))\n")
+        self._write("notes.txt", "The calculator is in pkg.\n")
+
+    def _write(self, name, text):
+        with open(os.path.join(self.tmp.name, name), "w") as f:
+            f.write(text)
+
+    def test_literal_with_context(self):
+        self.assertEqual(
+            search_files(self.tmp.name, "def evaluate", context=1),
+            "pkg/calc.py-1- class Calculator:\npkg/calc.py:2:     def evaluate(self, expression):\npkg/calc.py-3-         return eval(expression)",
+        )
+
+    def test_regex_case_and_filters(self):
+        result = search_files(self.tmp.name, r"Calc\w+\(\)", regex=True, context=0)
+        self.assertEqual(result, "main.py:3: print(Calculator().evaluate('1 + 2'))")
+        self.assertIn("notes.txt:1:", search_files(self.tmp.name, "CALCULATOR", case_sensitive=False, pattern="*.txt"))
+        self.assertNotIn("main.py", search_files(self.tmp.name, "Calculator", directory="pkg"))
+        self.assertTrue(search_files(self.tmp.name, "missing_name").startswith("No matches"))
+        self.assertTrue(search_files(self.tmp.name, "(", regex=True).startswith("Error: Invalid regular expression"))
+
+    def test_line_numbers_with_other_line_separators(self):
+        self._write("feed.py", "foo = 1\x0c\nbar = 2\r\nbaz = 3\n")
+        self._write("cr.txt", "line1\rneedle\r")
+        self.assertEqual(search_files(self.tmp.name, "bar = 2", context=0), "feed.py:2: bar = 2")
+        self.assertEqual(search_files(self.tmp.name, "needle", context=0), "cr.txt:1: line1\rneedle")
+
+    def test_regex_with_brackets_in_a_group(self):
+        self._write("paren.py", "x = f()abc\n")
+        self.assertEqual(search_files(self.tmp.name, r"([)]abc)", regex=True, context=0), "paren.py:1: x = f()abc")
+
+    def test_sees_tool_writes_immediately(self):
+        self.assertTrue(search_files(self.tmp.name, "subtract").startswith("No matches"))
+        write_file(self.tmp.name, "pkg/ops.py", "def subtract(a, b):\n    return a - b\n")
+        self.assertIn("pkg/ops.py:1:", search_files(self.tmp.name, "subtract"))
+        apply_patch(self.tmp.name, "pkg/ops.py", "<<<<<<< SEARCH\ndef subtract(a, b):\n=======\ndef minus(a, b):\n>>>>>>> REPLACE")
+        self.assertTrue(search_files(self.tmp.name, "subtract").startswith("No matches"))
+
+    def test_result_cap(self):
+        self._write("many.txt", "hit\n" * 100)
+        result = search_files(self.tmp.name, "hit", context=0, max_results=5)
+        self.assertEqual(result.count("many.txt:"), 5)
+        self.assertTrue(result.endswith("narrow it with directory or pattern]"))
+
+    def test_outside_working_directory(self):
+        self.assertTrue(search_files(self.tmp.name, "x", directory="..").startswith("Error: Cannot search"))
+
+
+class TestTrigramIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.index_path = os.path.join(self.tmp.name, "index", "index.json")
+        self.root = os.path.join(self.tmp.name, "tree")
+        os.makedirs(os.path.join(self.root, "__pycache__"))
+        for name, text in (("a.py", "alpha beta"), ("b.py", "beta gamma"), ("__pycache__/c.py", "alpha")):
+            self._write(name, text)
+
+    def _write(self, name, text, mtime_ns=None):
+        path = os.path.join(self.root, name)
+        with open(path, "w") as f:
+            f.write(text)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_candidates_and_incremental_refresh(self):
+        index = TrigramIndex(self.root)
+        self.assertEqual(index.candidates(["Alpha"]), ["a.py"])
+        self.assertEqual(index.candidates(["beta"]), ["a.py", "b.py"])
+        self._write("b.py", "alpha again", mtime_ns=1)
+        os.unlink(os.path.join(self.root, "a.py"))
+        self.assertEqual(index.refresh(), 1)
+        self.assertEqual(index.candidates(["alpha"]), ["b.py"])
+        self.assertEqual(index.candidates(["beta"]), [])
+
+    def test_saved_index_is_reused(self):
+        index = TrigramIndex(self.root, self.index_path)
+        self.addCleanup(index.save) # Cancels the pending background save
+        index.candidates(["alpha"])
+        self.assertFalse(os.path.exists(self.index_path)) # Searches don't write the index
+        index.save()
+        reloaded = TrigramIndex(self.root, self.index_path)
+        self.assertEqual(len(reloaded), 2)
+        self.assertEqual(reloaded.refresh(), 0)
+        self.assertEqual(reloaded.candidates(["gamma"]), ["b.py"])
+
+    def test_stale_index_refreshes_in_background(self):
+        index = TrigramIndex(self.root)
+        index.candidates(["alpha"])
+        self._write("d.py", "delta")
+        index.mark_stale()
+        thread = index._background_refresh
+        if thread is not None:
+            thread.join(5)
+        self.assertFalse(index._stale)
+        self.assertEqual(index.candidates(["delta"]), ["d.py"])
+
+    def test_required_literals(self):
+        self.assertEqual(_required_literals(r"def \w+_name\("), ["def ", "_name("])
+        self.assertEqual(_required_literals("colou?r"), ["colo"])
+        self.assertEqual(_required_literals("foo|bar"), [])
+        self.assertEqual(_required_literals("[abc]{3}xyz(?:opt)?"), ["xyz"])
+        # Brackets inside a group's classes don't end the group early
+        self.assertEqual(_required_literals(r"([)]abc)"), [])
+        self.assertEqual(_required_literals(r"(a[(]b)xyzw"), ["xyzw"])
+        self.assertEqual(_required_literals("abc)def"), [])
+
+
+
+MODULE = """\
+import functools
+
+
+class Shape:
+    sides = 0
+
+    @functools.cache
+    def area(self, scale: float = 1.0) -> float:
+        return 0.0
+
+    class Meta:
+        pass
+
+
+async def fetch(url, *, retries=3):
+    def helper():
+        pass
+    return url
+"""
+
+
+class TestPythonOutline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        os.makedirs(os.path.join(self.tmp.name, "pkg"))
+        self._write("pkg/shapes.py", MODULE)
+        self._write("pkg/broken.py", "def oops(:\n")
+
+    def _write(self, name, text):
+        with open(os.path.join(self.tmp.name, name), "w") as f:
+            f.write(text)
+
+    def test_outline_of_file(self):
+        self.assertEqual(get_python_outline(self.tmp.name, "pkg/shapes.py"), "\n".join([
+            "pkg/shapes.py",
+            "  class Shape  [lines 4-12]",
+            "    def area(self, scale: float=1.0) -> float  [lines 7-9]",
+            "    class Meta  [lines 11-12]",
+            "  async def fetch(url, *, retries=3)  [lines 15-18]",
+        ]))
+
+    def test_outline_of_directory_reports_syntax_errors(self):
+        outline = get_python_outline(self.tmp.name)
+        self.assertTrue(outline.startswith("pkg/broken.py\n  Could not parse: "))
+        self.assertIn("pkg/shapes.py\n  class Shape", outline)
+
+    def test_symbol_source(self):
+        self.assertEqual(
+            get_symbol_source(self.tmp.name, "Shape.area", "pkg/shapes.py"),
+            "pkg/shapes.py lines 7-9 (Shape.area):\n"
+            "    @functools.cache\n    def area(self, scale: float = 1.0) -> float:\n        return 0.0\n",
+        )
+        self.assertTrue(get_symbol_source(self.tmp.name, "Meta").startswith("pkg/shapes.py lines 11-12 (Shape.Meta):"))
+        self.assertIn("Did you mean: Shape.area", get_symbol_source(self.tmp.name, "Shape.aera"))
+        self.assertTrue(get_symbol_source(self.tmp.name, "x", "../x.py").startswith("Error: Cannot read"))
+
+    def test_bom_and_coding_declaration(self):
+        with open(os.path.join(self.tmp.name, "bom.py"), "wb") as f:
+            f.write(b"\xef\xbb\xbfdef with_bom():\n    pass\n")
+        with open(os.path.join(self.tmp.name, "latin.py"), "wb") as f:
+            f.write("# -*- coding: latin-1 -*-\ndef caf\u00e9():\n    return '\u00e9t\u00e9'\n".encode("latin-1"))
+        self.assertIn("def with_bom()  [lines 1-2]", get_python_outline(self.tmp.name, "bom.py"))
+        self.assertEqual(
+            get_symbol_source(self.tmp.name, "caf\u00e9", "latin.py"),
+            "latin.py lines 2-3 (caf\u00e9):\ndef caf\u00e9():\n    return '\u00e9t\u00e9'\n",
+        )
+
+    def test_cached_by_stat_then_hash(self):
+        path = os.path.join(self.tmp.name, "pkg/shapes.py")
+        get_python_outline(self.tmp.name, "pkg/shapes.py")
+        with mock.patch.object(python_outline, "_parse_file", wraps=python_outline._parse_file) as parse:
+            get_python_outline(self.tmp.name, "pkg/shapes.py")
+            os.utime(path, ns=(1, 1)) # Touched but unchanged
+            get_python_outline(self.tmp.name, "pkg/shapes.py")
+            self.assertEqual(parse.call_count, 0)
+            write_file(self.tmp.name, "pkg/shapes.py", MODULE + "\ndef added():\n    pass\n")
+            self.assertIn("def added()", get_python_outline(self.tmp.name, "pkg/shapes.py"))
+            self.assertEqual(parse.call_count, 1)
+
+    def test_parallel_parse_matches_serial(self):
+        for i in range(5):
+            self._write(f"pkg/m{i}.py", f"def f{i}(x):\n    return x\n")
+        serial = get_python_outline(self.tmp.name)
+        with python_outline._outline_cache_lock:
+            python_outline._outline_cache.clear()
+        with mock.patch.object(config, "OUTLINE_PARALLEL_THRESHOLD", 2), mock.patch.object(config, "OUTLINE_WORKERS", 2):
+            self.assertEqual(get_python_outline(self.tmp.name), serial)
+
+    def test_single_worker_parses_in_process(self):
+        for i in range(3):
+            self._write(f"pkg/m{i}.py", f"def f{i}(x):\n    return x\n")
+        with mock.patch.object(config, "OUTLINE_PARALLEL_THRESHOLD", 2), mock.patch.object(config, "OUTLINE_WORKERS", 1), \
+                mock.patch.object(python_outline, "_get_pool") as get_pool:
+            self.assertIn("def f2(x)", get_python_outline(self.tmp.name))
+        get_pool.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+# test_interpreter_pool.py
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from functions.interpreter_pool import InterpreterPool
+
+SCRIPT = """\
+import os, sys
+import helper
+print("argv", sys.argv[1:], "cwd", os.path.basename(os.getcwd()), "helper", helper.VALUE)
+print("to stderr", file=sys.stderr)
+if sys.argv[1:] == ["hard-exit"]:
+    sys.stdout.flush()
+    os._exit(3)
+if sys.argv[1:] == ["sleep"]:
+    import time
+    time.sleep(10)
+sys.exit(len(sys.argv) - 1)
+"""
+
+
+class TestInterpreterPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.script = os.path.join(self.tmp.name, "script.py")
+        with open(self.script, "w") as f:
+            f.write(SCRIPT)
+        self._write_helper(1)
+        self.pool = InterpreterPool(self.tmp.name, size=1, max_runs=3)
+        self.addCleanup(self.pool.close)
+
+    def _write_helper(self, value):
+        with open(os.path.join(self.tmp.name, "helper.py"), "w") as f:
+            f.write(f"VALUE = {value}\n")
+
+    def _cold_run(self, args):
+        process = subprocess.run(
+            [sys.executable, self.script] + args,
+            cwd=self.tmp.name,
+            capture_output=True,
+            text=True,
+        )
+        return process.stdout, process.stderr, process.returncode
+
+    def test_matches_fresh_process(self):
+        for args in ([], ["a", "b"], ["hard-exit"]):
+            self.assertEqual(self.pool.run(self.script, args), self._cold_run(args))
+
+    def test_edited_modules_are_reimported(self):
+        self.assertIn("helper 1", self.pool.run(self.script)[0])
+        self._write_helper(2)
+        self.assertIn("helper 2", self.pool.run(self.script)[0])
+
+    def test_bounded_output(self):
+        stdout, stderr, returncode = self.pool.run(self.script, ["a"], head_bytes=5, tail_bytes=4)
+        self.assertEqual((bytes(stdout.head), bytes(stdout.tail)), (b"argv ", b"r 1\n"))
+        self.assertEqual(stderr.text(), "to st\n... [1 bytes omitted] ...\nerr\n")
+        self.assertEqual(returncode, 1)
+
+    def test_timeout_recycles_worker(self):
+        with self.assertRaises(subprocess.TimeoutExpired):
+            self.pool.run(self.script, ["sleep"], timeout=0.5)
+        self.assertEqual(self.pool.run(self.script, ["x"])[2], 1)
+
+    def test_workers_recycled_after_max_runs(self):
+        for i in range(7):
+            stdout, _, _ = self.pool.run(self.script, [str(i)])
+            self.assertIn(f"argv ['{i}']", stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# test_response_cache.py
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from google.genai import types
+
+import main
+from response_cache import ResponseCache, make_key
+from test_agent_loop import FakeModels
+
+
+def _response(text):
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))]
+    )
+
+
+def _messages(text):
+    return [types.Content(role="user", parts=[types.Part(text=text)])]
+
+
+class TestMakeKey(unittest.TestCase):
+    def test_key_covers_every_input(self):
+        tool = types.Tool(function_declarations=[types.FunctionDeclaration(name="f", description="d")])
+        base = make_key("model-a", "system", [tool], _messages("hi"))
+        self.assertEqual(base, make_key("model-a", "system", [tool], _messages("hi")))
+        self.assertNotEqual(base, make_key("model-b", "system", [tool], _messages("hi")))
+        self.assertNotEqual(base, make_key("model-a", "other", [tool], _messages("hi")))
+        self.assertNotEqual(base, make_key("model-a", "system", [], _messages("hi")))
+        self.assertNotEqual(base, make_key("model-a", "system", [tool], _messages("hello")))
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_round_trip_and_stats(self):
+        cache = ResponseCache(self.tmp.name)
+        self.assertIsNone(cache.get("a" * 64))
+        cache.put("a" * 64, _response("cached answer"))
+        self.assertEqual(cache.get("a" * 64).text, "cached answer")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_index_survives_restart(self):
+        ResponseCache(self.tmp.name).put("b" * 64, _response("persisted"))
+        self.assertEqual(ResponseCache(self.tmp.name).get("b" * 64).text, "persisted")
+
+    def test_lru_eviction_by_count(self):
+        cache = ResponseCache(self.tmp.name, max_entries=2)
+        cache.put("1" * 64, _response("one"))
+        cache.put("2" * 64, _response("two"))
+        cache.get("1" * 64) # Now "2" is least recently used
+        cache.put("3" * 64, _response("three"))
+        self.assertIsNone(cache.get("2" * 64))
+        self.assertEqual(cache.get("1" * 64).text, "one")
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertFalse(os.path.exists(cache._payload_path("2" * 64)))
+
+    def test_eviction_by_size(self):
+        cache = ResponseCache(self.tmp.name, max_bytes=3 * len(_response("x" * 100).model_dump_json(exclude_none=True)))
+        for i in range(5):
+            cache.put(str(i) * 64, _response(str(i) * 100))
+        self.assertEqual(cache.stats()["entries"], 3)
+        self.assertLessEqual(cache.stats()["bytes"], cache.max_bytes)
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(self.tmp.name, ttl=60)
+        cache.put("c" * 64, _response("old"))
+        with mock.patch("response_cache.time.time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get("c" * 64))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+class TestAgentLoopUsesCache(unittest.TestCase):
+    def test_repeated_query_skips_the_model(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with mock.patch.object(main, "response_cache", ResponseCache(tmp.name)), contextlib.redirect_stdout(io.StringIO()):
+            first = FakeModels()
+            with mock.patch.object(main, "client", mock.Mock(models=first)):
+                answer = main.run_ai_query("What does main.py print?", False, [])
+            second = FakeModels()
+            with mock.patch.object(main, "client", mock.Mock(models=second)):
+                events = list(main.stream_ai_query("What does main.py print?", False, []))
+
+        self.assertEqual(len(first.requests), 2)
+        self.assertEqual(second.requests, [])
+        self.assertEqual(events[-1]["text"], answer)
+
+
+if __name__ == "__main__":
+    unittest.main()
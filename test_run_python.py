@@ -0,0 +1,72 @@
+# test_run_python.py
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from functions import config
+from functions.output_capture import HeadTailBuffer
+from functions.run_python import run_python_file
+
+
+class TestHeadTailBuffer(unittest.TestCase):
+    def test_keeps_head_and_tail_across_writes(self):
+        buffer = HeadTailBuffer(4, 3)
+        for chunk in (b"ab", b"cdef", b"ghij", b"k"):
+            buffer.write(chunk)
+        self.assertEqual((bytes(buffer.head), bytes(buffer.tail)), (b"abcd", b"ijk"))
+        self.assertEqual((buffer.total_bytes, buffer.omitted_bytes), (11, 4))
+        self.assertEqual(buffer.text(), "abcd\n... [4 bytes omitted] ...\nijk")
+
+    def test_short_output_is_kept_whole(self):
+        buffer = HeadTailBuffer(4, 3)
+        buffer.write(b"abcdef")
+        self.assertEqual(buffer.text(), "abcdef")
+
+    def test_from_file_matches_streaming(self):
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(bytes(range(256)) * 10)
+        self.addCleanup(os.unlink, f.name)
+        streamed = HeadTailBuffer(100, 50)
+        streamed.write(bytes(range(256)) * 10)
+        from_file = HeadTailBuffer.from_file(f.name, 100, 50)
+        self.assertEqual((from_file.head, from_file.tail, from_file.total_bytes), (streamed.head, streamed.tail, streamed.total_bytes))
+
+
+class TestRunPythonFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _run(self, source, **kwargs):
+        with open(os.path.join(self.tmp.name, "script.py"), "w") as f:
+            f.write(source)
+        return run_python_file(self.tmp.name, "script.py", **kwargs)
+
+    def test_large_output_keeps_head_and_tail(self):
+        output = self._run("import sys\nprint('first')\nsys.stdout.write('x' * 20_000_000)\nprint('last')\n")
+        self.assertTrue(output.startswith("STDOUT (20000011 bytes, "))
+        self.assertIn("first", output)
+        self.assertTrue(output.rstrip().endswith("last"))
+        self.assertLess(len(output), config.RUN_PYTHON_OUTPUT_HEAD_BYTES + config.RUN_PYTHON_OUTPUT_TAIL_BYTES + 200)
+
+    def test_timeout_is_configurable(self):
+        self.assertEqual(self._run("import time\ntime.sleep(10)\n", timeout=0.5), "Error: execution timed out after 0.5 seconds.")
+
+    @unittest.skipUnless(os.name == "posix", "resource limits are POSIX only")
+    def test_memory_limit(self):
+        with mock.patch.object(config, "RUN_PYTHON_MEMORY_BYTES", 256 * 1024 * 1024):
+            output = self._run("data = bytearray(512 * 1024 * 1024)\nprint('allocated')\n")
+        self.assertIn("MemoryError", output)
+        self.assertNotIn("allocated", output)
+
+    @unittest.skipUnless(os.name == "posix", "resource limits are POSIX only")
+    def test_open_file_limit(self):
+        with mock.patch.object(config, "RUN_PYTHON_MAX_OPEN_FILES", 32):
+            output = self._run("import resource\nprint(resource.getrlimit(resource.RLIMIT_NOFILE))\n")
+        self.assertIn("(32, 32)", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# test_scripted_backend.py
+
+import asyncio
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+import main
+from scripted_backend import ScriptedBackend
+
+SCRIPT = [
+    [("get_files_info", {"directory": "pkg"}), ("get_file_content", {"file_path": "main.py"})],
+    "Done.",
+]
+
+
+class TestScriptedBackend(unittest.TestCase):
+    def _query(self, backend, fn):
+        progress = []
+        with mock.patch.object(main, "client", None), contextlib.redirect_stdout(io.StringIO()):
+            main.set_model_backend(backend)
+            return fn(progress), progress
+
+    def test_replays_multi_call_turn_then_answer(self):
+        backend = ScriptedBackend(SCRIPT)
+        answer, progress = self._query(
+            backend, lambda progress: main.run_ai_query("Look around.", False, [], on_tool_progress=progress.append)
+        )
+        self.assertEqual(answer, "Done.")
+        self.assertEqual(backend.requests, 2)
+        self.assertEqual(
+            sorted(event["name"] for event in progress if event["type"] == "tool_finished"),
+            ["get_file_content", "get_files_info"],
+        )
+
+    def test_streamed_answer_arrives_in_chunks(self):
+        backend = ScriptedBackend(["A streamed answer of some length."], stream_chunks=4)
+        events, _ = self._query(backend, lambda progress: list(main.stream_ai_query("Hi", False, [])))
+        chunks = [event["text"] for event in events if event["type"] == "text"]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), events[-1]["text"])
+
+    def test_each_conversation_starts_the_script_over(self):
+        backend = ScriptedBackend(SCRIPT)
+        answers, _ = self._query(
+            backend, lambda progress: asyncio.run(main.run_many_ai_queries([f"q{i}" for i in range(5)]))
+        )
+        self.assertEqual(answers, ["Done."] * 5)
+        self.assertEqual(backend.requests, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# test_token_ledger.py
+
+import sys
+import unittest
+from unittest import mock
+
+from google.genai import types
+
+import main
+from main import count_message_tokens, count_tokens
+from token_ledger import ApproximateEncoding, TokenLedger
+
+
+def _sample_messages():
+    return [
+        types.Content(role="user", parts=[types.Part(text="List the files and run the tests please.")]),
+        types.Content(
+            role="model",
+            parts=[
+                types.Part.from_function_call(name="get_files_info", args={"directory": "pkg"}),
+                types.Part.from_function_call(name="run_python_file", args={"file_path": "tests.py", "args": ["-v"]}),
+            ],
+        ),
+        types.Content(
+            role="tool",
+            parts=[
+                types.Part.from_function_response(
+                    name="get_files_info",
+                    response={"result": "- calculator.py: file_size=1234 bytes, is_dir=False"},
+                ),
+                types.Part.from_function_response(
+                    name="run_python_file",
+                    response={"result": "STDERR:\n" + "." * 500 + "\nOK"},
+                ),
+            ],
+        ),
+        types.Content(role="model", parts=[types.Part(text="All 9 tests passed.")]),
+    ]
+
+
+class TestTokenLedger(unittest.TestCase):
+    def test_initial_total_matches_count_tokens(self):
+        messages = _sample_messages()
+        ledger = TokenLedger(count_message_tokens, messages)
+        self.assertEqual(ledger.total, count_tokens(messages))
+        self.assertEqual(len(ledger), len(messages))
+
+    def test_append_matches_count_tokens(self):
+        messages = []
+        ledger = TokenLedger(count_message_tokens)
+        for message in _sample_messages():
+            messages.append(message)
+            self.assertEqual(ledger.append(message), count_tokens(messages))
+
+    def test_trim_matches_count_tokens(self):
+        messages = _sample_messages()
+        ledger = TokenLedger(count_message_tokens, messages)
+        while messages:
+            messages.pop(0)
+            self.assertEqual(ledger.popleft(), count_tokens(messages))
+        self.assertEqual(ledger.total, 0)
+
+    def test_pop_newest(self):
+        messages = _sample_messages()
+        ledger = TokenLedger(count_message_tokens, messages)
+        messages.pop()
+        self.assertEqual(ledger.pop(), count_tokens(messages))
+
+    def test_replace_and_remove_in_the_middle(self):
+        messages = _sample_messages()
+        ledger = TokenLedger(count_message_tokens, messages)
+        messages[1] = types.Content(role="model", parts=[types.Part(text="shorter")])
+        self.assertEqual(ledger.replace(1, messages[1]), count_tokens(messages))
+        del messages[1]
+        self.assertEqual(ledger.remove(1), count_tokens(messages))
+
+    def test_each_message_counted_once(self):
+        calls = []
+
+        def counter(message):
+            calls.append(message)
+            return 1
+
+        messages = _sample_messages()
+        ledger = TokenLedger(counter, messages)
+        ledger.popleft()
+        ledger.popleft()
+        self.assertEqual(len(calls), len(messages))
+        self.assertEqual(ledger.total, len(messages) - 2)
+
+
+class TestApproximateEncoding(unittest.TestCase):
+    def test_estimate_is_close_to_tiktoken(self):
+        try:
+            import tiktoken
+            encoding = tiktoken.encoding_for_model("gpt-4")
+        except Exception:
+            self.skipTest("tiktoken encoding unavailable")
+        for path in ("main.py", "agent_server.py", "functions/get_files_info.py", "calculator/pkg/calculator.py"):
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            estimate = len(ApproximateEncoding().encode(text))
+            actual = len(encoding.encode(text))
+            self.assertLess(abs(estimate - actual) / actual, 0.15, path) # The bound ApproximateEncoding documents
+
+    def test_fallback_when_tiktoken_missing(self):
+        with mock.patch.object(main, "ENCODING", None), mock.patch.dict(sys.modules, {"tiktoken": None}):
+            self.assertIsInstance(main.get_encoding(), ApproximateEncoding)
+            self.assertGreater(count_message_tokens(_sample_messages()[0]), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
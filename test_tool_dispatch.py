@@ -0,0 +1,242 @@
+# test_tool_dispatch.py
+
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from google.genai import types
+
+from tool_dispatch import dispatch_function_calls, dispatch_function_calls_async, plan_dependencies
+
+
+def _call(name, **args):
+    return SimpleNamespace(name=name, args=args)
+
+
+def _result(function_call_part):
+    return types.Content(
+        role="tool",
+        parts=[
+            types.Part.from_function_response(
+                name=function_call_part.name,
+                response={"result": dict(function_call_part.args)},
+            )
+        ],
+    )
+
+
+class TestPlanDependencies(unittest.TestCase):
+    def test_reads_are_independent(self):
+        calls = [
+            _call("get_file_content", file_path="main.py"),
+            _call("get_file_content", file_path="main.py"),
+            _call("get_files_info", directory="pkg"),
+        ]
+        self.assertEqual(plan_dependencies(calls), [[], [], []])
+
+    def test_writes_to_same_path_are_ordered(self):
+        calls = [
+            _call("write_file", file_path="a.txt", content="1"),
+            _call("write_file", file_path="b.txt", content="1"),
+            _call("write_file", file_path="./a.txt", content="2"),
+            _call("get_file_content", file_path="a.txt"),
+        ]
+        self.assertEqual(plan_dependencies(calls), [[], [], [0], [0, 2]])
+
+    def test_listing_waits_for_writes_inside_directory(self):
+        calls = [
+            _call("write_file", file_path="pkg/new.py", content=""),
+            _call("get_files_info", directory="pkg"),
+            _call("get_files_info", directory="other"),
+        ]
+        self.assertEqual(plan_dependencies(calls), [[], [0], []])
+
+    def test_scripts_ordered_against_writes_and_each_other(self):
+        calls = [
+            _call("get_file_content", file_path="tests.py"),
+            _call("run_python_file", file_path="tests.py"),
+            _call("write_file", file_path="pkg/render.py", content=""),
+            _call("run_python_file", file_path="main.py"),
+        ]
+        self.assertEqual(plan_dependencies(calls), [[], [], [1], [1, 2]])
+
+
+class TestDispatchFunctionCalls(unittest.TestCase):
+    def test_results_keep_call_order(self):
+        delays = {"a": 0.15, "b": 0.0, "c": 0.05}
+
+        def call(function_call_part):
+            time.sleep(delays[function_call_part.args["file_path"]])
+            return _result(function_call_part)
+
+        calls = [_call("get_file_content", file_path=name) for name in "abc"]
+        results = dispatch_function_calls(calls, call, max_workers=3)
+        paths = [r.parts[0].function_response.response["result"]["file_path"] for r in results]
+        self.assertEqual(paths, ["a", "b", "c"])
+
+    def test_reads_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=2)
+
+        def call(function_call_part):
+            barrier.wait()
+            return _result(function_call_part)
+
+        calls = [_call("get_file_content", file_path=str(i)) for i in range(3)]
+        results = dispatch_function_calls(calls, call, max_workers=3)
+        self.assertTrue(all("result" in r.parts[0].function_response.response for r in results))
+
+    def test_writes_to_same_path_keep_order(self):
+        log = []
+
+        def call(function_call_part):
+            # The first write is slower; it must still land first
+            time.sleep(0.1 if function_call_part.args["content"] == "1" else 0)
+            log.append(function_call_part.args["content"])
+            return _result(function_call_part)
+
+        calls = [
+            _call("write_file", file_path="a.txt", content="1"),
+            _call("write_file", file_path="a.txt", content="2"),
+        ]
+        dispatch_function_calls(calls, call, max_workers=2)
+        self.assertEqual(log, ["1", "2"])
+
+    def test_timeout_reports_error_and_skips_dependents(self):
+        release = threading.Event()
+
+        def call(function_call_part):
+            if function_call_part.args.get("content") == "slow":
+                release.wait(5)
+            return _result(function_call_part)
+
+        calls = [
+            _call("write_file", file_path="a.txt", content="slow"),
+            _call("write_file", file_path="a.txt", content="next"),
+            _call("get_file_content", file_path="b.txt"),
+        ]
+        try:
+            results = dispatch_function_calls(calls, call, max_workers=2, timeout=0.2)
+        finally:
+            release.set()
+        responses = [r.parts[0].function_response.response for r in results]
+        self.assertIn("timed out", responses[0]["error"])
+        self.assertIn("Skipped", responses[1]["error"])
+        self.assertIn("result", responses[2])
+
+    def test_stuck_workers_do_not_block_the_turn(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def call(function_call_part):
+            if function_call_part.args.get("file_path") == "stuck.txt":
+                release.wait(5)
+            return _result(function_call_part)
+
+        calls = [_call("get_file_content", file_path="stuck.txt"), _call("get_file_content", file_path="b.txt")]
+        started = time.monotonic()
+        results = dispatch_function_calls(calls, call, max_workers=1, timeout=0.2)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertIn("timed out", results[0].parts[0].function_response.response["error"])
+        self.assertIn("could not start", results[1].parts[0].function_response.response["error"])
+
+    def test_next_turn_waits_for_abandoned_write(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        log = []
+
+        def call(function_call_part):
+            if function_call_part.args.get("content") == "slow":
+                release.wait(5)
+            log.append(function_call_part.args.get("content", function_call_part.args["file_path"]))
+            return _result(function_call_part)
+
+        dispatch_function_calls([_call("write_file", file_path="a.txt", content="slow")], call, timeout=0.1, scope="turns")
+        threading.Timer(0.2, release.set).start()
+        calls = [_call("write_file", file_path="a.txt", content="next"), _call("get_file_content", file_path="b.txt")]
+        results = dispatch_function_calls(calls, call, timeout=2, scope="turns")
+        self.assertIn("result", results[0].parts[0].function_response.response)
+        self.assertEqual(log, ["b.txt", "slow", "next"])
+
+    def test_exception_becomes_error_response(self):
+        def call(function_call_part):
+            raise RuntimeError("boom")
+
+        results = dispatch_function_calls([_call("get_files_info")], call)
+        self.assertIn("boom", results[0].parts[0].function_response.response["error"])
+
+
+class TestDispatchFunctionCallsAsync(unittest.TestCase):
+    def test_order_and_write_ordering(self):
+        log = []
+
+        def call(function_call_part):
+            time.sleep(0.1 if function_call_part.args.get("content") == "1" else 0)
+            log.append(function_call_part.args.get("content", function_call_part.args["file_path"]))
+            return _result(function_call_part)
+
+        calls = [
+            _call("write_file", file_path="a.txt", content="1"),
+            _call("get_file_content", file_path="b.txt"),
+            _call("write_file", file_path="a.txt", content="2"),
+        ]
+        results = asyncio.run(dispatch_function_calls_async(calls, call, max_workers=3))
+        self.assertEqual([r.parts[0].function_response.name for r in results], ["write_file", "get_file_content", "write_file"])
+        self.assertLess(log.index("1"), log.index("2"))
+        self.assertEqual(log[0], "b.txt")
+
+    def test_timeout_skips_dependents(self):
+        def call(function_call_part):
+            if function_call_part.args.get("content") == "slow":
+                time.sleep(0.5)
+            return _result(function_call_part)
+
+        calls = [
+            _call("write_file", file_path="a.txt", content="slow"),
+            _call("write_file", file_path="a.txt", content="next"),
+        ]
+        results = asyncio.run(dispatch_function_calls_async(calls, call, timeout=0.1))
+        self.assertIn("timed out", results[0].parts[0].function_response.response["error"])
+        self.assertIn("Skipped", results[1].parts[0].function_response.response["error"])
+
+    def test_stuck_workers_do_not_block_the_turn(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        running, peak = [], []
+
+        def call(function_call_part):
+            running.append(function_call_part)
+            peak.append(len(running))
+            if function_call_part.args.get("file_path") == "stuck.txt":
+                release.wait(5)
+            running.remove(function_call_part)
+            return _result(function_call_part)
+
+        calls = [_call("get_file_content", file_path="stuck.txt"), _call("get_file_content", file_path="b.txt")]
+        results = asyncio.run(dispatch_function_calls_async(calls, call, max_workers=1, timeout=0.2))
+        self.assertIn("timed out", results[0].parts[0].function_response.response["error"])
+        self.assertIn("could not start", results[1].parts[0].function_response.response["error"])
+        self.assertEqual(max(peak), 1)
+
+    def test_next_turn_waits_for_abandoned_write(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        log = []
+
+        def call(function_call_part):
+            if function_call_part.args.get("content") == "turn1":
+                release.wait(5)
+            log.append(function_call_part.args["content"])
+            return _result(function_call_part)
+
+        first = asyncio.run(dispatch_function_calls_async([_call("write_file", file_path="a.txt", content="turn1")], call, timeout=0.1, scope="async-turns"))
+        self.assertIn("timed out", first[0].parts[0].function_response.response["error"])
+        threading.Timer(0.2, release.set).start()
+        second = asyncio.run(dispatch_function_calls_async([_call("write_file", file_path="a.txt", content="turn2")], call, timeout=2, scope="async-turns"))
+        self.assertIn("result", second[0].parts[0].function_response.response)
+        self.assertEqual(log, ["turn1", "turn2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
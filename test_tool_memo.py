@@ -0,0 +1,88 @@
+# test_tool_memo.py
+
+import os
+import tempfile
+import unittest
+
+from functions.get_files_info import get_file_content, write_file
+from tool_memo import ToolMemo
+
+
+class CountingTool:
+    def __init__(self, function):
+        self.function = function
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        return self.function(**kwargs)
+
+
+class TestToolMemo(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.memo = ToolMemo()
+        self.read = CountingTool(get_file_content)
+        with open(os.path.join(self.tmp.name, "notes.txt"), "w") as f:
+            f.write("first")
+
+    def _read(self, **extra):
+        args = {"working_directory": self.tmp.name, "file_path": "notes.txt", **extra}
+        return self.memo.call("get_file_content", args, self.read)
+
+    def test_repeated_read_is_memoized(self):
+        self.assertEqual(self._read(), "first")
+        self.assertEqual(self._read(), "first")
+        self.assertEqual(self.read.calls, 1)
+        self.assertEqual((self.memo.hits, self.memo.misses), (1, 1))
+
+    def test_different_arguments_are_separate(self):
+        self._read()
+        self._read(length=2)
+        self.assertEqual(self.read.calls, 2)
+
+    def test_external_change_is_noticed(self):
+        self._read()
+        with open(os.path.join(self.tmp.name, "notes.txt"), "w") as f:
+            f.write("changed outside the agent")
+        self.assertEqual(self._read(), "changed outside the agent")
+
+    def test_write_tool_invalidates(self):
+        self._read()
+        args = {"working_directory": self.tmp.name, "file_path": "notes.txt", "content": "other"}
+        self.memo.call("write_file", args, write_file)
+        self.assertEqual(self._read(), "other")
+        self.assertEqual(self.read.calls, 2)
+
+    def test_scripts_always_run_by_default(self):
+        run = CountingTool(lambda working_directory, file_path: f"ran {file_path}")
+        for _ in range(2):
+            self.memo.call("run_python_file", {"working_directory": self.tmp.name, "file_path": "tests.py"}, run)
+        self.assertEqual(run.calls, 2)
+
+    def test_script_rerun_only_when_tree_unchanged(self):
+        self.memo = ToolMemo(tools=("get_file_content", "run_python_file"))
+        run = CountingTool(lambda working_directory, file_path: f"ran {file_path}")
+        args = {"working_directory": self.tmp.name, "file_path": "tests.py"}
+        self.memo.call("run_python_file", args, run)
+        os.makedirs(os.path.join(self.tmp.name, "__pycache__"))
+        with open(os.path.join(self.tmp.name, "__pycache__", "x.pyc"), "w") as f:
+            f.write("bytecode churn is ignored")
+        self.memo.call("run_python_file", args, run)
+        self.assertEqual(run.calls, 1)
+
+        with open(os.path.join(self.tmp.name, "helper.py"), "w") as f:
+            f.write("VALUE = 2")
+        self.memo.call("run_python_file", args, run)
+        self.assertEqual(run.calls, 2)
+
+    def test_unlisted_tools_always_run(self):
+        listing = CountingTool(lambda working_directory: "listing")
+        for _ in range(2):
+            self.memo.call("get_files_info", {"working_directory": self.tmp.name}, listing)
+        self.assertEqual(listing.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# test_tracing.py
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+from test_agent_loop import FakeModels
+from tracing import JsonlTraceSink, TraceAggregator, Tracer
+
+
+class TestTraceAggregator(unittest.TestCase):
+    def test_percentiles_per_tool(self):
+        aggregator = TraceAggregator()
+        for i in range(1, 101):
+            aggregator({"kind": "tool", "name": "get_file_content", "seconds": i / 100, "result_chars": i})
+        aggregator({"kind": "tool", "name": "run_python_file", "seconds": 2.0, "result_chars": 10})
+
+        summary = aggregator.summary()
+        self.assertEqual(summary["tool:get_file_content"], {"count": 100, "p50": 0.5, "p95": 0.95, "max": 1.0})
+        self.assertEqual(summary["tool:run_python_file"]["p95"], 2.0)
+        self.assertEqual(summary["tool:get_file_content:result_chars"]["p50"], 50)
+        self.assertIn("tool:run_python_file", aggregator.format_summary())
+
+
+class TestTracer(unittest.TestCase):
+    def test_failing_sink_is_disabled(self):
+        spans = []
+
+        def broken(span):
+            raise RuntimeError("disk full")
+
+        tracer = Tracer(broken, spans.append)
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            tracer.emit("run", "abc", iterations=1)
+            tracer.emit("run", "abc", iterations=2)
+        self.assertEqual(stderr.getvalue().count("disk full"), 1)
+        self.assertEqual([span["iterations"] for span in spans], [1, 2])
+
+    def test_jsonl_sink_writes_one_line_per_span(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.jsonl")
+            sink = JsonlTraceSink(path)
+            Tracer(sink).emit("tool", "abc", name="get_files_info", seconds=0.1)
+            sink.close()
+            with open(path, encoding="utf-8") as f:
+                spans = [json.loads(line) for line in f]
+        self.assertEqual(len(spans), 1)
+        self.assertEqual(spans[0]["name"], "get_files_info")
+
+
+class TestAgentLoopSpans(unittest.TestCase):
+    def test_spans_for_one_query(self):
+        spans = []
+        with mock.patch.object(main, "tracer", Tracer(spans.append)), \
+                mock.patch.object(main, "client", mock.Mock(models=FakeModels())), \
+                contextlib.redirect_stdout(io.StringIO()):
+            main.run_ai_query("What does main.py print?", False, [])
+
+        kinds = [span["kind"] for span in spans]
+        self.assertEqual(kinds.count("iteration"), 2)
+        self.assertEqual(kinds.count("tool"), 2)
+        self.assertEqual(kinds[-1], "run")
+        self.assertEqual(len({span["run_id"] for span in spans}), 1)
+
+        first, second = [span for span in spans if span["kind"] == "iteration"]
+        self.assertEqual(first["tool_calls"], 2)
+        self.assertEqual(second["tool_calls"], 0)
+        self.assertGreater(second["context_tokens"], first["context_tokens"])
+        self.assertEqual(
+            sorted(span["name"] for span in spans if span["kind"] == "tool"),
+            ["get_file_content", "get_files_info"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+# tool_dispatch.py
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from google.genai import types
+
+# How each tool touches the working directory, used to decide which calls in
+# one model turn may overlap. Reads never conflict with each other; writes are
+# ordered against anything touching an overlapping path. Scripts may read or
+# write anything, so they are ordered against writes and against each other.
+READ = "read"
+WRITE = "write"
+EXEC = "exec"
+
+TOOL_ACCESS = {
+    "get_files_info": (READ, "directory"),
+    "get_file_content": (READ, "file_path"),
+    "search_files": (READ, "directory"),
+    "get_python_outline": (READ, "file_path"),
+    "get_symbol_source": (READ, "file_path"),
+    "write_file": (WRITE, "file_path"),
+    "apply_patch": (WRITE, "file_path"),
+    "run_python_file": (EXEC, None),
+}
+
+
+def _access(function_call_part):
+    kind, path_arg = TOOL_ACCESS.get(function_call_part.name, (READ, None))
+    args = function_call_part.args or {}
+    path = args.get(path_arg, ".") if path_arg else "."
+    return kind, os.path.normpath(str(path))
+
+
+def _paths_overlap(a, b):
+    if a == "." or b == ".":
+        return True
+    return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def _conflicts(earlier, later):
+    (kind_a, path_a), (kind_b, path_b) = earlier, later
+    if kind_a == EXEC and kind_b == EXEC:
+        return True
+    if WRITE not in (kind_a, kind_b):
+        return False
+    return _paths_overlap(path_a, path_b)
+
+
+def plan_dependencies(function_calls):
+    """
+    Returns, for each call, the indexes of earlier calls it must wait for.
+    """
+    accesses = [_access(function_call_part) for function_call_part in function_calls]
+    return [
+        [j for j in range(i) if _conflicts(accesses[j], accesses[i])]
+        for i in range(len(accesses))
+    ]
+
+
+def _error_content(function_name, message):
+    return types.Content(
+        role="tool",
+        parts=[
+            types.Part.from_function_response(
+                name=function_name,
+                response={"error": message},
+            )
+        ],
+    )
+
+
+# Timed-out writes and scripts whose threads are still running, by dispatch
+# scope (usually the working directory), as (future, access) pairs. Later
+# calls that conflict with one are held until it has actually finished, so a
+# late write can't land after them, in this turn or the next.
+_abandoned_writes = {}
+_abandoned_writes_lock = threading.Lock()
+
+
+def _running_abandoned_writes(scope):
+    with _abandoned_writes_lock:
+        still_running = [(future, access) for future, access in _abandoned_writes.get(scope, []) if not future.done()]
+        if still_running:
+            _abandoned_writes[scope] = still_running
+        else:
+            _abandoned_writes.pop(scope, None)
+        return still_running
+
+
+def _abandon_write(scope, future, access):
+    with _abandoned_writes_lock:
+        _abandoned_writes.setdefault(scope, []).append((future, access))
+
+
+def dispatch_function_calls(function_calls, call, max_workers=4, timeout=60, scope=None):
+    """
+    Runs one turn's function calls on a thread pool and returns their results
+    in the original call order.
+
+    Calls that don't conflict run concurrently; conflicting calls (e.g. two
+    writes to the same path) start only after the earlier one has finished.
+    A call still running after `timeout` seconds is abandoned and reported as
+    an error, and any later call that depends on it is not run. A call that
+    conflicts with an abandoned write or script from an earlier turn in the
+    same scope waits for it to finish, and a call that still can't start
+    `timeout` seconds after the last one did is reported as an error too.
+
+    Args:
+        function_calls (list): The function call parts from one model response.
+        call (callable): Executes a single function call part and returns its result Content.
+        max_workers (int): Maximum number of calls running at once.
+        timeout (float): Seconds each call may run, or wait to start, before it is abandoned.
+        scope: Key shared by dispatches that touch the same files, e.g. the working directory.
+
+    Returns:
+        list: One result Content per function call, in call order.
+    """
+    function_calls = list(function_calls)
+    dependencies = plan_dependencies(function_calls)
+    accesses = [_access(function_call_part) for function_call_part in function_calls]
+    results = [None] * len(function_calls)
+    failed = set()
+    pending = list(range(len(function_calls)))
+    running = {}
+    abandoned = [] # Timed-out calls of this dispatch, each still holding a worker thread
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while pending or running:
+            abandoned = [future for future in abandoned if not future.done()]
+            blockers = _running_abandoned_writes(scope)
+            for i in list(pending):
+                deps = dependencies[i]
+                if any(results[d] is None for d in deps):
+                    continue
+                name = function_calls[i].name
+                if any(d in failed for d in deps):
+                    results[i] = _error_content(name, f"Skipped '{name}': an earlier call it depends on did not complete.")
+                    failed.add(i)
+                    pending.remove(i)
+                elif any(_conflicts(access, accesses[i]) for _, access in blockers):
+                    continue # Held until the timed-out call it conflicts with has finished
+                elif len(running) + len(abandoned) < max_workers:
+                    future = executor.submit(call, function_calls[i])
+                    running[future] = (i, time.monotonic() + timeout)
+                    pending.remove(i)
+
+            stuck = abandoned + [future for future, _ in blockers]
+            if not running:
+                if pending and not wait(stuck, timeout=timeout, return_when=FIRST_COMPLETED)[0]:
+                    # Nothing freed up in time; report the rest instead of blocking the turn
+                    for i in pending:
+                        name = function_calls[i].name
+                        results[i] = _error_content(name, f"Error: '{name}' could not start because earlier calls that timed out are still running.")
+                        failed.add(i)
+                    pending = []
+                continue
+
+            next_deadline = min(deadline for _, deadline in running.values())
+            done, _ = wait(list(running) + stuck, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future not in running:
+                    continue # An abandoned call finished, which may let a held call start
+                i, _ = running.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    name = function_calls[i].name
+                    results[i] = _error_content(name, f"Error executing function '{name}': {e}")
+                    failed.add(i)
+
+            now = time.monotonic()
+            for future, (i, deadline) in list(running.items()):
+                if deadline <= now:
+                    del running[future]
+                    abandoned.append(future)
+                    if accesses[i][0] != READ:
+                        _abandon_write(scope, future, accesses[i])
+                    name = function_calls[i].name
+                    results[i] = _error_content(name, f"Error: '{name}' timed out after {timeout} seconds.")
+                    failed.add(i)
+    finally:
+        # Don't block on abandoned calls; their threads finish in the background.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+async def dispatch_function_calls_async(function_calls, call, max_workers=4, timeout=60, scope=None):
+    """
+    Asyncio counterpart of dispatch_function_calls with the same ordering,
+    timeout and skip rules. `call` is a blocking function; each call runs in
+    a worker thread so the event loop stays free. A timed-out call keeps its
+    worker slot until its thread actually returns, so no more than
+    max_workers calls ever run at once.
+    """
+    function_calls = list(function_calls)
+    dependencies = plan_dependencies(function_calls)
+    accesses = [_access(function_call_part) for function_call_part in function_calls]
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    slots = {"live": 0, "stuck": 0} # Calls running, and abandoned calls still holding a thread
+    slot_freed = asyncio.Event()
+    tasks = []
+
+    def could_not_start(name):
+        return _error_content(name, f"Error: '{name}' could not start because earlier calls that timed out are still running."), True
+
+    async def take_slot():
+        # Like the sync loop, gives up only when the slots are all held by
+        # abandoned calls and none frees up within `timeout`
+        while slots["live"] + slots["stuck"] >= max_workers:
+            slot_freed.clear()
+            try:
+                await asyncio.wait_for(slot_freed.wait(), timeout)
+            except asyncio.TimeoutError:
+                if not slots["live"]:
+                    return False
+        slots["live"] += 1
+        return True
+
+    def release_stuck(wrapped):
+        if not wrapped.cancelled():
+            wrapped.exception() # Retrieved, so asyncio doesn't log it as lost
+        slots["stuck"] -= 1
+        slot_freed.set()
+
+    async def run(i):
+        name = function_calls[i].name
+        dep_results = await asyncio.gather(*(tasks[d] for d in dependencies[i]))
+        if any(failed for _, failed in dep_results):
+            return _error_content(name, f"Skipped '{name}': an earlier call it depends on did not complete."), True
+        blockers = [asyncio.wrap_future(future) for future, access in _running_abandoned_writes(scope) if _conflicts(access, accesses[i])]
+        if blockers:
+            # Held until the timed-out calls it conflicts with have finished
+            _, still_running = await asyncio.wait(blockers, timeout=timeout)
+            if still_running:
+                return could_not_start(name)
+        if not await take_slot():
+            return could_not_start(name)
+
+        future = executor.submit(call, function_calls[i])
+        wrapped = asyncio.wrap_future(future)
+        done, _ = await asyncio.wait([wrapped], timeout=timeout)
+        slots["live"] -= 1
+        if not done:
+            # The worker thread can't be interrupted; it finishes in the background.
+            slots["stuck"] += 1
+            wrapped.add_done_callback(release_stuck)
+            if accesses[i][0] != READ:
+                _abandon_write(scope, future, accesses[i])
+            return _error_content(name, f"Error: '{name}' timed out after {timeout} seconds."), True
+        slot_freed.set()
+        try:
+            return wrapped.result(), False
+        except Exception as e:
+            return _error_content(name, f"Error executing function '{name}': {e}"), True
+
+    try:
+        for i in range(len(function_calls)):
+            tasks.append(asyncio.ensure_future(run(i)))
+        return [result for result, _ in await asyncio.gather(*tasks)]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
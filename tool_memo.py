@@ -0,0 +1,136 @@
+# tool_memo.py
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def _file_fingerprint(function_args):
+    path = os.path.join(function_args["working_directory"], function_args["file_path"])
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _tree_fingerprint(function_args):
+    """
+    Digest of every file's path, size and mtime under the working directory.
+    Bytecode caches are skipped since running a script rewrites them.
+    """
+    digest = hashlib.sha256()
+    root = os.path.abspath(function_args["working_directory"])
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if name != "__pycache__")
+        for filename in sorted(filenames):
+            if filename.endswith(".pyc"):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f"{os.path.relpath(path, root)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+# Read-only tools that can be memoized, with the function that fingerprints the
+# file state their result depends on. A cached result is reused only while the
+# fingerprint is unchanged.
+FINGERPRINTS = {
+    "get_file_content": _file_fingerprint,
+    "run_python_file": _tree_fingerprint,
+}
+
+# Tools memoized unless ToolMemo is told otherwise. Script runs are left out:
+# a script that reads the clock, random numbers, the network or stdin gives a
+# different answer with the same files, and fingerprinting them walks the tree.
+DEFAULT_MEMOIZED_TOOLS = ("get_file_content",)
+
+# Tools that change files, with the argument naming the file they change
+WRITE_TOOLS = {
+    "write_file": "file_path",
+    "apply_patch": "file_path",
+}
+
+
+class ToolMemo:
+    """
+    Memoizes results of read-only tool calls for as long as the files they
+    depend on are unchanged.
+
+    get_file_content results are keyed on the file's size and mtime, and
+    run_python_file results, when enabled, on a snapshot of the whole working
+    tree, so a script is only skipped when nothing it could read has changed.
+    Calls through write tools drop the affected entries straight away, which
+    also covers edits too fast for the file system's mtime resolution.
+
+    Args:
+        max_entries (int): Number of results kept, least recently used dropped first.
+        tools (iterable): Names of the FINGERPRINTS tools to memoize.
+    """
+
+    def __init__(self, max_entries=256, tools=DEFAULT_MEMOIZED_TOOLS):
+        self.max_entries = max_entries
+        self.tools = frozenset(tools)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # key -> (function_name, path, fingerprint, result)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(function_name, function_args):
+        return function_name + json.dumps(function_args, sort_keys=True, default=str)
+
+    def call(self, function_name, function_args, function):
+        """
+        Returns function(**function_args), reusing an earlier result when the
+        tool is memoizable and its files are unchanged.
+        """
+        if function_name in WRITE_TOOLS:
+            try:
+                return function(**function_args)
+            finally:
+                path = function_args.get(WRITE_TOOLS[function_name])
+                self.invalidate(os.path.join(function_args["working_directory"], path) if path else None)
+
+        fingerprint_of = FINGERPRINTS.get(function_name) if function_name in self.tools else None
+        if fingerprint_of is None:
+            return function(**function_args)
+
+        key = self._key(function_name, function_args)
+        fingerprint = fingerprint_of(function_args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and fingerprint is not None and entry[2] == fingerprint:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[3]
+            self.misses += 1
+
+        result = function(**function_args)
+        if fingerprint is not None:
+            path = function_args.get("file_path") if function_name == "get_file_content" else None
+            with self._lock:
+                self._entries[key] = (
+                    function_name,
+                    os.path.abspath(os.path.join(function_args["working_directory"], path)) if path else None,
+                    fingerprint,
+                    result,
+                )
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, path=None):
+        """
+        Drops memoized reads of path and every memoized script run, or everything when path is None.
+        """
+        abs_path = os.path.abspath(path) if path else None
+        with self._lock:
+            for key, (function_name, entry_path, _, _) in list(self._entries.items()):
+                if abs_path is None or function_name == "run_python_file" or entry_path == abs_path:
+                    del self._entries[key]
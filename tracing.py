@@ -0,0 +1,121 @@
+# tracing.py
+import json
+import math
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+
+class Tracer:
+    """
+    Hands spans from the agent loop to a set of sinks.
+
+    A span is a flat JSON-serializable dict with at least "kind", "run_id"
+    and "time" (seconds since the epoch). A sink is any callable taking one
+    span; spans may be emitted from worker threads, so sinks must be thread
+    safe. A sink that raises is reported once on stderr and then ignored, so
+    tracing can never break a request.
+
+    Span kinds emitted by main.py:
+      - "iteration": model_seconds, context_tokens (local estimate),
+        prompt_tokens / response_tokens (from the response's usage metadata,
+        None when not reported), tool_calls, tools_seconds and seconds.
+      - "compaction": tokens_before, tokens_after and the compaction notes.
+      - "tool": name, seconds, result_chars and error.
+      - "run": iterations and seconds for a whole query.
+    """
+
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+        self._failed = set()
+
+    def emit(self, kind, run_id, **fields):
+        span = {"kind": kind, "run_id": run_id, "time": time.time(), **fields}
+        for sink in self.sinks:
+            if id(sink) in self._failed:
+                continue
+            try:
+                sink(span)
+            except Exception as e:
+                self._failed.add(id(sink))
+                print(f"Tracing sink {sink!r} failed and was disabled: {e}", file=sys.stderr)
+
+
+class JsonlTraceSink:
+    """
+    Appends each span as one JSON line to path. Lines are flushed as they
+    are written so the file can be tailed while requests run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, span):
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class TraceAggregator:
+    """
+    In-memory sink that keeps timing and size distributions: per tool
+    ("tool:<name>" seconds and result characters), model latency ("model")
+    and context size ("context_tokens", and "prompt_tokens" when the model
+    reports usage). summary() reports count, p50, p95 and max for each.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(list)
+
+    def __call__(self, span):
+        with self._lock:
+            if span["kind"] == "tool":
+                self._values[f"tool:{span['name']}"].append(span["seconds"])
+                self._values[f"tool:{span['name']}:result_chars"].append(span["result_chars"])
+            elif span["kind"] == "iteration":
+                self._values["model"].append(span["model_seconds"])
+                self._values["context_tokens"].append(span["context_tokens"])
+                if span.get("prompt_tokens") is not None:
+                    self._values["prompt_tokens"].append(span["prompt_tokens"])
+
+    def summary(self):
+        """Returns {metric: {"count", "p50", "p95", "max"}}, sorted by metric name."""
+        with self._lock:
+            snapshot = {metric: sorted(values) for metric, values in self._values.items()}
+        return {
+            metric: {
+                "count": len(values),
+                "p50": _percentile(values, 0.50),
+                "p95": _percentile(values, 0.95),
+                "max": values[-1],
+            }
+            for metric, values in sorted(snapshot.items())
+        }
+
+    def format_summary(self):
+        lines = [f"{'metric':<36} {'count':>6} {'p50':>10} {'p95':>10} {'max':>10}"]
+        for metric, stats in self.summary().items():
+            lines.append(
+                f"{metric:<36} {stats['count']:>6} {stats['p50']:>10.4g} {stats['p95']:>10.4g} {stats['max']:>10.4g}"
+            )
+        return "\n".join(lines)